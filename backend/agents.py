@@ -1,36 +1,38 @@
+import asyncio
 from fastapi import APIRouter, HTTPException, BackgroundTasks
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field, field_validator
 from typing import List, Optional
 import os
 import json
-from google.generativeai import GenerativeModel
-import google.generativeai as genai
-from langchain_chroma import Chroma
-from langchain_google_genai import GoogleGenerativeAIEmbeddings
+import hashlib
 from urllib.parse import unquote
-from shared_utils import get_embeddings
+from vector_store import get_vectordb_for_source
+from retrieval import search, search_many
+from concurrency import run_blocking
+import llm_client
+from llm_client import generate_content_async
+import analysis_cache
+import document_catalog
+import summaries
+import context_cache
+import tracing
 from agents_intelligence import get_industry_benchmarks, get_competitive_research
 
 router = APIRouter()
 
-# Persistent storage path
-VECTOR_DB_DIR = os.getenv("CHROMA_DB_PATH") or (
-    "/mnt/data/chroma_db" if os.path.exists("/mnt/data") else "./chroma_db"
-)
-ANALYSIS_CACHE_DIR = os.getenv("ANALYSIS_CACHE_PATH") or (
-    "/mnt/data/analyses" if os.path.exists("/mnt/data") else "./analyses"
-)
-os.makedirs(ANALYSIS_CACHE_DIR, exist_ok=True)
-
-# Configure Gemini
-genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
-model = genai.GenerativeModel('gemini-2.5-flash')
+model = llm_client.get_model('gemini-2.5-flash')
 
 class AnalysisRequest(BaseModel):
     document_id: str
     analysis_type: str  # company, market, financial, risk
     force_rerun: Optional[bool] = False
 
+class BatchAnalysisRequest(BaseModel):
+    document_id: str
+    analysis_types: List[str] = ["company", "market", "financial", "risk"]
+    force_rerun: Optional[bool] = False
+
 class Citation(BaseModel):
     text: str
     explanation: str
@@ -90,70 +92,29 @@ class RiskAnalysis(BaseModel):
     overall_risk_score: str = "Medium"
     citations: List[Citation] = []
 
-@router.post("/analyze")
-async def analyze_document(request: AnalysisRequest):
-    try:
-        document_id = unquote(request.document_id)
-        cache_filename = f"{document_id.replace(' ', '_').replace('/', '_')}_{request.analysis_type}.json"
-        cache_path = os.path.join(ANALYSIS_CACHE_DIR, cache_filename)
+# --- Shared analysis pipeline ---
 
-        # 1. Check Cache
-        if not request.force_rerun and os.path.exists(cache_path):
-            try:
-                with open(cache_path, 'r') as f:
-                    cached_data = json.load(f)
-                    print(f"DEBUG: Returning cached analysis for {document_id}")
-                    return {"analysis": cached_data, "cached": True}
-            except Exception as e:
-                print(f"DEBUG: Cache read failed: {e}")
+# Query expansion per analysis type
+ANALYSIS_QUERIES = {
+    "company": ["company overview mission value proposition", "management team founders key personnel", "products services business model"],
+    "market": ["market size TAM SAM SOM", "market growth CAGR drivers trends", "competitors competitive landscape market share"],
+    "financial": ["financial performance revenue EBITDA margins", "valuation metrics LTV CAC burn rate", "projections runway cap table"],
+    "risk": ["key risks market operational risk", "regulatory financial risk", "mitigants risk management strategy"],
+}
 
-        # 2. Extract Context (Pass 1)
-        try:
-            vectordb = Chroma(persist_directory=VECTOR_DB_DIR, embedding_function=get_embeddings())
-            
-            # --- START QUERY EXPANSION ---
-            queries = []
-            if request.analysis_type == "company":
-                queries = ["company overview mission value proposition", "management team founders key personnel", "products services business model"]
-            elif request.analysis_type == "market":
-                queries = ["market size TAM SAM SOM", "market growth CAGR drivers trends", "competitors competitive landscape market share"]
-            elif request.analysis_type == "financial":
-                queries = ["financial performance revenue EBITDA margins", "valuation metrics LTV CAC burn rate", "projections runway cap table"]
-            elif request.analysis_type == "risk":
-                queries = ["key risks market operational risk", "regulatory financial risk", "mitigants risk management strategy"]
-            else:
-                queries = [f"Detailed information about {request.analysis_type}"]
-
-            all_results = []
-            seen_content = set()
-            
-            for q in queries:
-                results = vectordb.similarity_search(
-                    query=q,
-                    k=6, # Fetch 6 per sub-query, yielding up to 18 highly relevant chunks
-                    filter={"source": document_id}
-                )
-                for doc in results:
-                    if doc.page_content not in seen_content:
-                        seen_content.add(doc.page_content)
-                        all_results.append(doc)
-            # --- END QUERY EXPANSION ---
-            
-        except Exception as e:
-            print(f"DEBUG: Search failed: {e}")
-            all_results = []
-
-        context = "\n\n".join([doc.page_content for doc in all_results])
-        if not context:
-            results = vectordb.similarity_search(f"Detailed information about {request.analysis_type}", k=10)
-            context = "\n\n".join([doc.page_content for doc in results])
-            
-        if not context:
-            raise HTTPException(status_code=404, detail="No document context found for analysis.")
-
-        # Shared prompt parts
-        generation_config = {"response_mime_type": "application/json", "temperature": 0.1}
-        system_instruction = """
+# Schema and task description per analysis type
+ANALYSIS_TASKS = {
+    "company": (CompanyAnalysis, "Analyze COMPANY OVERVIEW, TEAM, and PRODUCTS."),
+    "market": (MarketAnalysis, "Analyze MARKET SIZE (TAM/SAM/SOM), CAGR, and COMPETITION."),
+    "financial": (FinancialAnalysis, "Extract FINANCIAL PERFORMANCE and VALUATION."),
+    "risk": (RiskAnalysis, "Identify KEY RISKS and MITIGANTS."),
+}
+
+for schema, _ in ANALYSIS_TASKS.values():
+    llm_client.register_schema(schema)
+
+GENERATION_CONFIG = {"response_mime_type": "application/json", "temperature": 0.1}
+SYSTEM_INSTRUCTION = """
         You are 'PitchIQ', an elite Investment Analyst at a Tier-1 Venture Capital and Private Equity firm. 
         Your task is to analyze documents, identifying deep insights that a junior analyst might miss.
         
@@ -168,97 +129,215 @@ async def analyze_document(request: AnalysisRequest):
         5. Citations must include EXACT quotes and explain WHY that quote supports the data point.
         """
 
-        def perform_analysis(analysis_context, attempt_num=1):
-            if request.analysis_type == "company":
-                current_schema = CompanyAnalysis
-                prompt = f"{system_instruction}\n\nTASK: Analyze COMPANY OVERVIEW, TEAM, and PRODUCTS.\nCONTEXT: {analysis_context}\nReturn JSON matching CompanyAnalysis schema."
-            elif request.analysis_type == "market":
-                current_schema = MarketAnalysis
-                prompt = f"{system_instruction}\n\nTASK: Analyze MARKET SIZE (TAM/SAM/SOM), CAGR, and COMPETITION.\nCONTEXT: {analysis_context}\nReturn JSON matching MarketAnalysis schema."
-            elif request.analysis_type == "financial":
-                current_schema = FinancialAnalysis
-                prompt = f"{system_instruction}\n\nTASK: Extract FINANCIAL PERFORMANCE and VALUATION.\nCONTEXT: {analysis_context}\nReturn JSON matching FinancialAnalysis schema."
-            elif request.analysis_type == "risk":
-                current_schema = RiskAnalysis
-                prompt = f"{system_instruction}\n\nTASK: Identify KEY RISKS and MITIGANTS.\nCONTEXT: {analysis_context}\nReturn JSON matching RiskAnalysis schema."
-            else:
-                raise HTTPException(status_code=400, detail="Invalid analysis type")
-
-            response = model.generate_content(prompt, generation_config=generation_config)
-            if not response.candidates:
-                raise Exception("No AI candidates returned")
-            
-            json_text = response.text
-            if "```json" in json_text:
-                json_text = json_text.split("```json")[1].split("```")[0].strip()
-            elif "```" in json_text:
-                json_text = json_text.split("```")[1].split("```")[0].strip()
-            
-            raw_data = json.loads(json_text)
-            if isinstance(raw_data, dict):
-                if "analysis" in raw_data: raw_data = raw_data["analysis"]
-                elif "data" in raw_data: raw_data = raw_data["data"]
-            
-            # --- START ADVANCED SANITIZATION ---
-            if isinstance(raw_data, dict):
-                # Normalize keys to lowercase for internal checks
-                keys = list(raw_data.keys())
-                for key in keys:
-                    val = raw_data[key]
-                    lower_key = key.lower()
-
-                    # 1. Stringify fields that MUST be strings
-                    if lower_key in ["tam", "sam", "som", "cagr", "valuation", "overview", "business_model", "founding_year", "headquarters", "overall_risk_score"]:
-                        if not isinstance(val, str):
-                            raw_data[key] = json.dumps(val) if isinstance(val, (dict, list)) else str(val)
-
-                    # 2. Heal Lists: If a list is expected but AI wrapped it in a single-key dict
-                    # Common with 'products', 'key_management', 'competitors', etc.
-                    if lower_key in ["products", "key_management", "founders_background", "competitors", "market_drivers", "revenue_data", "key_metrics", "unit_economics", "risks", "citations"]:
-                        if isinstance(val, dict) and len(val) == 1:
-                            # Extract the first list found inside the dict
-                            inner_val = next(iter(val.values()))
-                            if isinstance(inner_val, list):
-                                raw_data[key] = inner_val
-                        elif not isinstance(val, list):
-                            # Ensure it's at least an empty list to satisfy Pydantic
-                            raw_data[key] = []
-            # --- END ADVANCED SANITIZATION ---
-            
-            if isinstance(raw_data, dict) and "reasoning" not in raw_data:
-                raw_data["reasoning"] = f"Extraction Pass {attempt_num}"
-                
-            return current_schema.model_validate(raw_data)
 
-        # 3. First Pass Analysis
-        validated_data = perform_analysis(context, 1)
+def get_analysis_queries(analysis_type: str) -> List[str]:
+    return ANALYSIS_QUERIES.get(analysis_type, [f"Detailed information about {analysis_type}"])
+
+
+def prompt_version(analysis_type: str) -> str:
+    """Version of the prompt + schema for an analysis type; changes invalidate cached results."""
+    if analysis_type not in ANALYSIS_TASKS:
+        return "invalid"
+    schema, task = ANALYSIS_TASKS[analysis_type]
+    payload = (SYSTEM_INSTRUCTION + task + json.dumps(schema.model_json_schema(), sort_keys=True)
+               + summaries.ANALYSIS_CONTEXT_MODE + str(context_cache.enabled()))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:12]
+
 
-        # 4. AI Judge Logic (Self-Correction)
-        # We judge 'Quality' by checking if key fields are missing or 'N/A' 
-        # while the reasoning suggests information should be present.
-        low_quality = False
-        if request.analysis_type == "market" and validated_data.tam == "N/A": low_quality = True
-        if request.analysis_type == "company" and validated_data.overview == "No overview available.": low_quality = True
+def analysis_cache_key(document_id: str, analysis_type: str):
+    return analysis_cache.make_key(document_id, analysis_type, prompt_version(analysis_type))
+
+
+def _dedupe_results(per_query_results) -> list:
+    """Merge per-query search results, keeping the first occurrence of each chunk ID."""
+    all_results = []
+    seen_ids = set()
+    for results in per_query_results:
+        for doc in results:
+            if doc.id not in seen_ids:
+                seen_ids.add(doc.id)
+                all_results.append(doc)
+    return all_results
+
+
+def build_analysis_prompt(analysis_type: str, analysis_context: str, prefix=None) -> str:
+    """Full prompt, or only the per-call suffix when the document prefix is reused (context_cache)."""
+    if analysis_type not in ANALYSIS_TASKS:
+        raise HTTPException(status_code=400, detail="Invalid analysis type")
+    current_schema, task = ANALYSIS_TASKS[analysis_type]
+    if prefix is not None:
+        extra = analysis_context or "None beyond the document context above."
+        return f"TASK: {task}\nADDITIONAL CONTEXT: {extra}\nReturn JSON matching {current_schema.__name__} schema."
+    return f"{SYSTEM_INSTRUCTION}\n\nTASK: {task}\nCONTEXT: {analysis_context}\nReturn JSON matching {current_schema.__name__} schema."
+
+
+async def perform_analysis(analysis_type: str, analysis_context: str, attempt_num: int = 1, prefix=None):
+    prompt = build_analysis_prompt(analysis_type, analysis_context, prefix)
+    current_schema, _ = ANALYSIS_TASKS[analysis_type]
+
+    if prefix is not None:
+        response = await context_cache.generate(model, prefix, prompt, generation_config=GENERATION_CONFIG)
+    else:
+        response = await generate_content_async(model, prompt, generation_config=GENERATION_CONFIG)
+    if not response.candidates:
+        raise Exception("No AI candidates returned")
+    
+    json_text = response.text
+    if "```json" in json_text:
+        json_text = json_text.split("```json")[1].split("```")[0].strip()
+    elif "```" in json_text:
+        json_text = json_text.split("```")[1].split("```")[0].strip()
+    
+    raw_data = json.loads(json_text)
+    if isinstance(raw_data, dict):
+        if "analysis" in raw_data: raw_data = raw_data["analysis"]
+        elif "data" in raw_data: raw_data = raw_data["data"]
+    
+    # --- START ADVANCED SANITIZATION ---
+    if isinstance(raw_data, dict):
+        # Normalize keys to lowercase for internal checks
+        keys = list(raw_data.keys())
+        for key in keys:
+            val = raw_data[key]
+            lower_key = key.lower()
+
+            # 1. Stringify fields that MUST be strings
+            if lower_key in ["tam", "sam", "som", "cagr", "valuation", "overview", "business_model", "founding_year", "headquarters", "overall_risk_score"]:
+                if not isinstance(val, str):
+                    raw_data[key] = json.dumps(val) if isinstance(val, (dict, list)) else str(val)
+
+            # 2. Heal Lists: If a list is expected but AI wrapped it in a single-key dict
+            # Common with 'products', 'key_management', 'competitors', etc.
+            if lower_key in ["products", "key_management", "founders_background", "competitors", "market_drivers", "revenue_data", "key_metrics", "unit_economics", "risks", "citations"]:
+                if isinstance(val, dict) and len(val) == 1:
+                    # Extract the first list found inside the dict
+                    inner_val = next(iter(val.values()))
+                    if isinstance(inner_val, list):
+                        raw_data[key] = inner_val
+                elif not isinstance(val, list):
+                    # Ensure it's at least an empty list to satisfy Pydantic
+                    raw_data[key] = []
+    # --- END ADVANCED SANITIZATION ---
+    
+    if isinstance(raw_data, dict) and "reasoning" not in raw_data:
+        raw_data["reasoning"] = f"Extraction Pass {attempt_num}"
         
-        if low_quality:
-            print(f"DEBUG: AI Judge detected low quality for {document_id}. Retrying with expanded context...")
+    return current_schema.model_validate(raw_data)
+
+
+# Raw chunks kept after the summary in hybrid context mode
+HYBRID_CONTEXT_CHUNKS = int(os.getenv("HYBRID_CONTEXT_CHUNKS", "6"))
+
+
+def build_analysis_context(document_id: str, analysis_type: str, results: list) -> str:
+    """Prompt context: raw chunks, or precomputed summaries in place of / ahead of them (ANALYSIS_CONTEXT_MODE)."""
+    mode = summaries.ANALYSIS_CONTEXT_MODE
+    if mode != "chunks":
+        entry = document_catalog.get_file(document_id)
+        summary = summaries.summary_context(document_id, entry["file_hash"] if entry else None, analysis_type)
+        if summary and mode == "summaries":
+            return summary
+        if summary:
+            excerpts = "\n\n".join([doc.page_content for doc in results[:HYBRID_CONTEXT_CHUNKS]])
+            return f"{summary}\n\nSUPPORTING EXCERPTS:\n{excerpts}"
+    return "\n\n".join([doc.page_content for doc in results])
+
+
+async def get_analysis_prefix(document_id: str):
+    """The document's reusable analysis prefix, or None (disabled, nothing ingested, or build failure)."""
+    try:
+        prefix = await context_cache.get_prefix(document_id, "analysis", SYSTEM_INSTRUCTION, model)
+    except Exception as e:
+        print(f"[CONTEXT_CACHE] Analysis prefix unavailable for {document_id}: {e}")
+        return None
+    return prefix if prefix is not None and prefix.core else None
+
+
+async def run_analysis(document_id: str, analysis_type: str, results: list):
+    """Generate and self-correct one analysis from already-retrieved chunks."""
+    vectordb = get_vectordb_for_source(document_id)
+
+    # Shared per-document prefix: only chunks it does not already hold are sent per call
+    with tracing.span("analyze.prefix") as current:
+        prefix = await get_analysis_prefix(document_id)
+        current.set(available=prefix is not None)
+    if prefix is not None:
+        context = "\n\n".join(doc.page_content for doc in context_cache.extra_chunks(prefix, results))
+    else:
+        context = build_analysis_context(document_id, analysis_type, results)
+    if prefix is None and not context:
+        with tracing.span("analyze.fallback_search"):
+            results = await run_blocking("chroma", vectordb.similarity_search, f"Detailed information about {analysis_type}", k=10)
+        context = "\n\n".join([doc.page_content for doc in results])
+        
+    if prefix is None and not context:
+        raise HTTPException(status_code=404, detail="No document context found for analysis.")
+
+    # 3. First Pass Analysis
+    with tracing.span("analyze.generate", analysis_type=analysis_type):
+        validated_data = await perform_analysis(analysis_type, context, 1, prefix)
+
+    # 4. AI Judge Logic (Self-Correction)
+    # We judge 'Quality' by checking if key fields are missing or 'N/A' 
+    # while the reasoning suggests information should be present.
+    low_quality = False
+    if analysis_type == "market" and validated_data.tam == "N/A": low_quality = True
+    if analysis_type == "company" and validated_data.overview == "No overview available.": low_quality = True
+    
+    if low_quality:
+        with tracing.span("analyze.judge_retry", analysis_type=analysis_type):
             # Retry with k=20 for a more holistic view
-            results_expanded = vectordb.similarity_search(
-                query=f"Detailed holistic view for {request.analysis_type} including all specific data points",
+            results_expanded = await run_blocking(
+                "chroma",
+                search,
+                f"Detailed holistic view for {analysis_type} including all specific data points",
                 k=20,
-                filter={"source": document_id}
+                where={"source": document_id}
             )
-            context_expanded = "\n\n".join([doc.page_content for doc in results_expanded])
-            validated_data = perform_analysis(context_expanded, 2)
+            context_expanded = "\n\n".join([doc.page_content for doc in context_cache.extra_chunks(prefix, results_expanded)])
+            validated_data = await perform_analysis(analysis_type, context_expanded, 2, prefix)
 
-        # 5. Save to Cache
-        try:
-            with open(cache_path, 'w') as f:
-                json.dump(validated_data.model_dump(), f)
-        except Exception as e:
-            print(f"DEBUG: Cache write failed: {e}")
+    return validated_data
+
+
+@router.post("/analyze")
+async def analyze_document(request: AnalysisRequest):
+    try:
+        document_id = unquote(request.document_id)
 
-        return {"analysis": validated_data.model_dump(), "cached": False}
+        async def compute() -> dict:
+            # 2. Extract Context (Pass 1)
+            try:
+                # --- START QUERY EXPANSION ---
+                # One batched embedding call + one multi-query Chroma request
+                with tracing.span("analyze.retrieve") as current:
+                    per_query_results = await run_blocking(
+                        "chroma",
+                        search_many,
+                        get_analysis_queries(request.analysis_type),
+                        k=6, # Fetch 6 per sub-query, yielding up to 18 highly relevant chunks
+                        where={"source": document_id}
+                    )
+                    all_results = _dedupe_results(per_query_results)
+                    current.set(chunks=len(all_results))
+                # --- END QUERY EXPANSION ---
+                
+            except Exception as e:
+                print(f"[ANALYZE] Search failed for {document_id} ({request.analysis_type}): {e}")
+                all_results = []
+
+            validated_data = await run_analysis(document_id, request.analysis_type, all_results)
+            return validated_data.model_dump()
+
+        # 1. Cache lookup; concurrent identical requests share one computation
+        with tracing.span("analyze", analysis_type=request.analysis_type, document_id=document_id) as current:
+            data, cached = await analysis_cache.get_or_compute(
+                analysis_cache_key(document_id, request.analysis_type),
+                compute,
+                force=bool(request.force_rerun),
+            )
+            current.set(cached=cached)
+        return {"analysis": data, "cached": cached}
 
     except HTTPException as he:
         raise he
@@ -266,3 +345,84 @@ async def analyze_document(request: AnalysisRequest):
         import traceback
         print(f"CRITICAL ERROR: {e}\n{traceback.format_exc()}")
         raise HTTPException(status_code=500, detail=str(e))
+
+
+async def retrieve_for_types(document_id: str, analysis_types: List[str]) -> dict:
+    """Context chunks for several analysis types from one batched search (empty lists on failure)."""
+    results_by_type = {t: [] for t in analysis_types}
+    if not analysis_types:
+        return results_by_type
+    all_queries = [q for t in analysis_types for q in get_analysis_queries(t)]
+    try:
+        with tracing.span("analyze.retrieve", queries=len(all_queries)):
+            per_query_results = await run_blocking(
+                "chroma",
+                search_many,
+                all_queries,
+                k=6,
+                where={"source": document_id}
+            )
+        offset = 0
+        for analysis_type in analysis_types:
+            count = len(get_analysis_queries(analysis_type))
+            results_by_type[analysis_type] = _dedupe_results(per_query_results[offset:offset + count])
+            offset += count
+    except Exception as e:
+        print(f"[ANALYZE] Batched search failed for {document_id}: {e}")
+    return results_by_type
+
+
+@router.post("/analyze/all")
+async def analyze_document_all(request: BatchAnalysisRequest):
+    """
+    Run several analysis types for one document in a single retrieval pass.
+    All expansion queries are embedded and searched together; each analysis
+    then generates concurrently and is streamed back as one NDJSON line as
+    soon as it finishes.
+    """
+    document_id = unquote(request.document_id)
+    analysis_types = list(dict.fromkeys(request.analysis_types))
+    invalid = [t for t in analysis_types if t not in ANALYSIS_TASKS]
+    if invalid:
+        raise HTTPException(status_code=400, detail=f"Invalid analysis type(s): {', '.join(invalid)}")
+
+    keys = {t: analysis_cache_key(document_id, t) for t in analysis_types}
+    cached = {}
+    if not request.force_rerun:
+        for analysis_type in analysis_types:
+            cached_data = analysis_cache.get(keys[analysis_type])
+            if cached_data is not None:
+                cached[analysis_type] = cached_data
+    pending = [t for t in analysis_types if t not in cached]
+
+    # One batched retrieval for every pending type's expansion queries
+    results_by_type = await retrieve_for_types(document_id, pending)
+
+    async def run_one(analysis_type: str) -> dict:
+        async def compute() -> dict:
+            validated_data = await run_analysis(document_id, analysis_type, results_by_type[analysis_type])
+            return validated_data.model_dump()
+
+        try:
+            with tracing.span("analyze", analysis_type=analysis_type, document_id=document_id, cached=False):
+                data, _ = await analysis_cache.get_or_compute(keys[analysis_type], compute, force=True)
+            return {"analysis_type": analysis_type, "analysis": data, "cached": False}
+        except HTTPException as he:
+            return {"analysis_type": analysis_type, "error": he.detail, "status_code": he.status_code}
+        except Exception as e:
+            import traceback
+            print(f"CRITICAL ERROR: {e}\n{traceback.format_exc()}")
+            return {"analysis_type": analysis_type, "error": str(e), "status_code": 500}
+
+    async def stream():
+        for analysis_type, data in cached.items():
+            yield json.dumps({"analysis_type": analysis_type, "analysis": data, "cached": True}) + "\n"
+        tasks = [asyncio.ensure_future(run_one(t)) for t in pending]
+        try:
+            for finished in asyncio.as_completed(tasks):
+                yield json.dumps(await finished) + "\n"
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
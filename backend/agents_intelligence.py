@@ -7,59 +7,23 @@ import json
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel, Field
 from typing import List, Optional
-import google.generativeai as genai
-from langchain_chroma import Chroma
-import os
 from dotenv import load_dotenv
-from shared_utils import get_embeddings
+from urllib.parse import unquote
+import industry_benchmarks
+import research_store
 
 load_dotenv()
 
-# Configure Gemini
-genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
-model = genai.GenerativeModel('gemini-2.5-flash')
-
-# Vector DB
-# Use persistent storage: env var > /mnt/data > local fallback
-VECTOR_DB_DIR = os.getenv("CHROMA_DB_PATH") or ("/mnt/data/chroma_db" if os.path.exists("/mnt/data") else "./chroma_db")
-
-# Ensure directory exists
-os.makedirs(VECTOR_DB_DIR, exist_ok=True)
-
 router = APIRouter()
 
 
 # --- Helper: Get Industry Benchmarks ---
 def get_industry_benchmarks(industry: str, query: str = None) -> str:
     """
-    Retrieve relevant industry benchmarks from the knowledge base.
+    Retrieve relevant industry benchmarks from the in-process knowledge base index.
     """
     try:
-        # Access industry knowledge collection
-        knowledge_db = Chroma(
-            persist_directory=VECTOR_DB_DIR,
-            embedding_function=get_embeddings(),
-            collection_name="industry_knowledge"
-        )
-        
-        # If no specific query, get general benchmarks
-        if not query:
-            query = f"What are the key benchmarks and metrics for {industry}?"
-        
-        # Search with industry filter
-        results = knowledge_db.similarity_search(
-            query=query,
-            k=5,
-            filter={"industry": industry.lower().replace(" ", "_")}
-        )
-        
-        if not results:
-            return "No industry benchmarks available."
-        
-        # Combine results
-        benchmarks = "\n\n".join([doc.page_content for doc in results])
-        return benchmarks
-        
+        return industry_benchmarks.lookup(industry, query)
     except Exception as e:
         print(f"Error retrieving benchmarks: {e}")
         return "Industry benchmarks unavailable."
@@ -69,26 +33,47 @@ def get_industry_benchmarks(industry: str, query: str = None) -> str:
 def get_competitive_research(document_id: str) -> Optional[str]:
     """
     Retrieve competitive research if available for this document.
+    Direct key lookup in the research store; stale reports are still returned.
     """
     try:
-        # Access main ChromaDB for research reports
-        vectordb = Chroma(persist_directory=VECTOR_DB_DIR, embedding_function=get_embeddings())
-        
-        # Search for research reports
-        results = vectordb.similarity_search(
-            query="competitive intelligence research",
-            k=2,
-            filter={"source": f"{document_id}_research"}
-        )
-        
-        if results:
-            return "\n\n".join([doc.page_content for doc in results])
-        return None
-        
+        entry = research_store.get_report(document_id)
+        return entry["report"] if entry else None
     except Exception as e:
         print(f"Error retrieving research: {e}")
         return None
 
 
+class ResearchRequest(BaseModel):
+    document_id: str
+    company_name: Optional[str] = None
+    industry: Optional[str] = None
+    force_refresh: Optional[bool] = False
+
+
+@router.post("/research")
+async def research_document(request: ResearchRequest):
+    """Research the company behind a document; reuses the stored report until it is past its TTL."""
+    document_id = unquote(request.document_id)
+    try:
+        entry = await research_store.ensure_research(
+            document_id, request.company_name, request.industry, force=bool(request.force_refresh)
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    return _research_response(entry)
+
+
+@router.get("/research/{document_id}")
+async def get_research(document_id: str):
+    entry = research_store.get_report(unquote(document_id))
+    if not entry:
+        raise HTTPException(status_code=404, detail="No research for this document.")
+    return _research_response(entry)
+
+
+def _research_response(entry: dict) -> dict:
+    return {key: entry[key] for key in ("document_id", "company_name", "industry", "report", "updated_at", "stale")}
+
+
 # Keep existing Pydantic models and /analyze endpoint code...
 # (The rest of agents.py remains the same, but prompts will be enhanced below)
@@ -0,0 +1,175 @@
+"""
+Tiered analysis-result cache.
+A bounded in-memory LRU sits in front of JSON files on disk. Keys include
+the document's content version (its file hash from the catalog) and the
+prompt/schema version, so re-ingesting a changed deck or editing a prompt
+never serves a stale analysis. Concurrent identical requests are coalesced
+into one computation (single-flight).
+"""
+
+import asyncio
+import json
+import os
+import shutil
+import threading
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+
+import document_catalog
+from shared_utils import get_data_path
+
+ANALYSIS_CACHE_DIR = get_data_path("ANALYSIS_CACHE_PATH", "analyses")
+os.makedirs(ANALYSIS_CACHE_DIR, exist_ok=True)
+
+ANALYSIS_CACHE_MAX_ITEMS = int(os.getenv("ANALYSIS_CACHE_MAX_ITEMS", "256"))
+# 0 disables time-based expiry
+ANALYSIS_CACHE_TTL_SECONDS = float(os.getenv("ANALYSIS_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+
+_memory: "OrderedDict[Tuple[str, str, str, str], dict]" = OrderedDict()
+_lock = threading.Lock()
+_in_flight: Dict[Tuple[str, str, str, str], asyncio.Task] = {}
+_stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "coalesced": 0, "evictions": 0, "expired": 0}
+
+
+def _safe_name(document_id: str) -> str:
+    return document_id.replace(' ', '_').replace('/', '_')
+
+
+def _document_dir(document_id: str) -> str:
+    return os.path.join(ANALYSIS_CACHE_DIR, _safe_name(document_id))
+
+
+def document_version(document_id: str) -> str:
+    """Content version of a document: its file hash, or 'unversioned' for pre-catalog data."""
+    entry = document_catalog.get_file(document_id)
+    return entry["file_hash"] if entry else "unversioned"
+
+
+def make_key(document_id: str, analysis_type: str, prompt_version: str) -> Tuple[str, str, str, str]:
+    return (document_id, analysis_type, document_version(document_id), prompt_version)
+
+
+def _expired(created_at: float) -> bool:
+    return ANALYSIS_CACHE_TTL_SECONDS > 0 and time.time() - created_at > ANALYSIS_CACHE_TTL_SECONDS
+
+
+def _remember(key, entry: dict):
+    with _lock:
+        _memory[key] = entry
+        _memory.move_to_end(key)
+        while len(_memory) > ANALYSIS_CACHE_MAX_ITEMS:
+            _memory.popitem(last=False)
+            _stats["evictions"] += 1
+
+
+def get(key) -> Optional[dict]:
+    """Return cached analysis data for the key, or None."""
+    with _lock:
+        entry = _memory.get(key)
+        if entry is not None:
+            if _expired(entry["created_at"]):
+                del _memory[key]
+                _stats["expired"] += 1
+            else:
+                _memory.move_to_end(key)
+                _stats["memory_hits"] += 1
+                return entry["data"]
+
+    document_id, analysis_type, version, prompt_version = key
+    path = os.path.join(_document_dir(document_id), f"{analysis_type}.json")
+    try:
+        with open(path, 'r') as f:
+            entry = json.load(f)
+    except FileNotFoundError:
+        entry = None
+    except Exception as e:
+        print(f"[ANALYSIS_CACHE] Read failed for {document_id} ({analysis_type}): {e}")
+        entry = None
+
+    if entry and entry.get("document_version") == version and entry.get("prompt_version") == prompt_version:
+        if _expired(entry["created_at"]):
+            _stats["expired"] += 1
+        else:
+            _remember(key, entry)
+            _stats["disk_hits"] += 1
+            return entry["data"]
+
+    _stats["misses"] += 1
+    return None
+
+
+def put(key, data: dict):
+    document_id, analysis_type, version, prompt_version = key
+    entry = {
+        "document_version": version,
+        "prompt_version": prompt_version,
+        "created_at": time.time(),
+        "data": data,
+    }
+    _remember(key, entry)
+    try:
+        os.makedirs(_document_dir(document_id), exist_ok=True)
+        path = os.path.join(_document_dir(document_id), f"{analysis_type}.json")
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(entry, f)
+        os.replace(tmp_path, path)
+    except Exception as e:
+        print(f"[ANALYSIS_CACHE] Write failed for {document_id} ({analysis_type}): {e}")
+
+
+async def get_or_compute(key, compute: Callable[[], Awaitable[dict]], force: bool = False) -> Tuple[dict, bool]:
+    """
+    Return (data, cached). On a miss (or when forced) run `compute` once per
+    key; concurrent callers for the same key await the same computation.
+    """
+    if not force:
+        data = get(key)
+        if data is not None:
+            return data, True
+
+    task = _in_flight.get(key)
+    if task is not None:
+        _stats["coalesced"] += 1
+    else:
+        # Its own task, so a caller going away (client disconnect) doesn't
+        # cancel the computation for the others still waiting on it
+        task = asyncio.ensure_future(_compute(key, compute))
+        _in_flight[key] = task
+        task.add_done_callback(lambda done: _finished(key, done))
+    return await asyncio.shield(task), False
+
+
+async def _compute(key, compute: Callable[[], Awaitable[dict]]) -> dict:
+    data = await compute()
+    put(key, data)
+    return data
+
+
+def _finished(key, task: asyncio.Task):
+    if _in_flight.get(key) is task:
+        del _in_flight[key]
+    # Every caller may have gone; don't log "exception never retrieved"
+    if not task.cancelled():
+        task.exception()
+
+
+def invalidate_document(document_id: str):
+    """Drop every cached analysis for a document (memory and disk)."""
+    with _lock:
+        for key in [k for k in _memory if k[0] == document_id]:
+            del _memory[key]
+    shutil.rmtree(_document_dir(document_id), ignore_errors=True)
+
+
+def stats() -> dict:
+    lookups = _stats["memory_hits"] + _stats["disk_hits"] + _stats["misses"]
+    return {
+        **_stats,
+        "hit_rate": round((_stats["memory_hits"] + _stats["disk_hits"]) / lookups, 4) if lookups else 0.0,
+        "memory_items": len(_memory),
+        "max_items": ANALYSIS_CACHE_MAX_ITEMS,
+        "ttl_seconds": ANALYSIS_CACHE_TTL_SECONDS,
+        "in_flight": len(_in_flight),
+    }
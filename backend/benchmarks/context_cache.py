@@ -0,0 +1,137 @@
+"""
+Benchmark: legacy prompts vs reused document prefixes (CONTEXT_CACHE_MODE).
+Runs the four analyses and a few chat turns for one ingested document against
+a local fake Gemini model, so no API quota is used. The fake bills and delays
+by input tokens (~4 chars each). Tokens served from an explicit cache, or a
+repeated leading prefix of at least IMPLICIT_MIN_TOKENS (Gemini's implicit
+caching), are billed at CACHED_TOKEN_DISCOUNT and cost no prefill time.
+Reports input tokens and latency per call for each mode.
+
+Retrieval uses the configured embedding backend. Usage (from backend/):
+    python -m benchmarks.context_cache --document-id deck.pdf
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import time
+from types import SimpleNamespace
+
+import agents
+import chat
+import context_cache
+
+BASE_LATENCY_S = 0.05
+PREFILL_S_PER_TOKEN = 0.00002
+CACHED_TOKEN_DISCOUNT = 0.25
+IMPLICIT_MIN_TOKENS = 1024
+MODES = ["off", "prefix", "auto"]
+
+calls = []
+seen_prompts = []
+
+
+def implicit_cached_tokens(prompt: str) -> int:
+    """Longest leading prefix shared with an earlier prompt, if long enough to be cached implicitly."""
+    shared = max((len(os.path.commonprefix([prompt, seen])) for seen in seen_prompts), default=0)
+    seen_prompts.append(prompt)
+    tokens = shared // 4
+    return tokens if tokens >= IMPLICIT_MIN_TOKENS else 0
+
+
+class FakeModel:
+    """Stands in for genai.GenerativeModel; optionally bound to a fake cached prefix."""
+
+    def __init__(self, cached_tokens: int = 0):
+        self.model_name = "models/fake-gemini"
+        self.cached_tokens = cached_tokens
+
+    async def generate_content_async(self, prompt, stream=False, **kwargs):
+        tokens = len(prompt) // 4
+        cached = self.cached_tokens + implicit_cached_tokens(prompt)
+        uncached = tokens + self.cached_tokens - cached
+        await asyncio.sleep(BASE_LATENCY_S + uncached * PREFILL_S_PER_TOKEN)
+        calls.append(uncached + cached * CACHED_TOKEN_DISCOUNT)
+        text = json.dumps({"reasoning": "fake", "overview": "Fake overview.", "tam": "$1B"})
+        if stream:
+            return _chunks([SimpleNamespace(text=text)])
+        return SimpleNamespace(
+            text=text,
+            candidates=[1],
+            usage_metadata=SimpleNamespace(prompt_token_count=tokens + self.cached_tokens,
+                                           cached_content_token_count=cached),
+        )
+
+
+async def _chunks(chunks):
+    for chunk in chunks:
+        yield chunk
+
+
+class FakeCachedContent:
+    def __init__(self, instruction: str, core: str):
+        self.tokens = (len(instruction) + len(core)) // 4
+
+    def update(self, **kwargs):
+        pass
+
+    def delete(self):
+        pass
+
+
+def install_fakes():
+    agents.model = chat.model = FakeModel()
+    context_cache._create_cached_content = lambda model_name, display_name, instruction, core: FakeCachedContent(instruction, core)
+    context_cache._model_from_cached_content = lambda cached: FakeModel(cached.tokens)
+    context_cache.CONTEXT_CACHE_MIN_TOKENS = 0
+
+
+async def run_mode(document_id: str, turns: int):
+    calls.clear()
+    seen_prompts.clear()
+    latencies = []
+    results_by_type = await agents.retrieve_for_types(document_id, list(agents.ANALYSIS_TASKS))
+    for analysis_type, results in results_by_type.items():
+        start = time.perf_counter()
+        await agents.run_analysis(document_id, analysis_type, results)
+        latencies.append(time.perf_counter() - start)
+
+    questions = ["What is the business model?", "How large is the market?", "What are the key risks?",
+                 "Who is on the management team?", "What are the revenue projections?"]
+    for i in range(turns):
+        question = questions[i % len(questions)]
+        request = chat.ChatRequest(document_id=document_id, messages=[chat.ChatMessage(role="user", content=question)])
+        start = time.perf_counter()
+        vector = await chat.embed_question(question)
+        results = await chat.retrieve_context(document_id, question, vector)
+        prefix = await chat.get_chat_prefix(document_id) if results else None
+        context = chat.build_turn_context(document_id, results, prefix)
+        prompt = chat.build_chat_prompt(request, context, question, prefix)
+        if prefix is not None:
+            await context_cache.generate(chat.model, prefix, prompt)
+        else:
+            await chat.model.generate_content_async(prompt)
+        latencies.append(time.perf_counter() - start)
+    return calls[:], latencies
+
+
+async def run(document_id: str, turns: int):
+    install_fakes()
+    print(f"{'mode':<8} {'calls':>6} {'billed input tok/call':>22} {'p50 s':>7} {'total s':>8}")
+    for mode in MODES:
+        context_cache.CONTEXT_CACHE_MODE = mode
+        context_cache._prefixes.clear()
+        billed, latencies = await run_mode(document_id, turns)
+        print(f"{mode:<8} {len(billed):>6} {statistics.mean(billed):>22.0f} "
+              f"{statistics.median(latencies):>7.2f} {sum(latencies):>8.2f}")
+    print(context_cache.stats())
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--document-id", required=True)
+    parser.add_argument("--turns", type=int, default=5, help="chat turns per mode")
+    args = parser.parse_args()
+    asyncio.run(run(args.document_id, args.turns))
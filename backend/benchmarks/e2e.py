@@ -0,0 +1,370 @@
+"""
+End-to-end benchmark: ingest -> documents -> retrieve -> analyze -> chat -> export.
+Drives the real ASGI app in-process (httpx ASGITransport, lifespan included)
+with LLM_BACKEND=fake and a local embedding backend, against a throwaway data
+directory, so runs need no network or API key. Ingestion goes through the
+job queue and embedded worker pool as in production. Retrieval has no
+endpoint of its own and is timed in-process.
+
+Each stage reports requests, errors, throughput, p50/p95/p99 latency and peak
+RSS (this process plus ingestion workers). Results are written to
+benchmarks/results/<commit>.json; --compare an earlier file to print
+per-stage changes and exit non-zero when a stage regressed past --threshold.
+
+Usage (from backend/):
+    python -m benchmarks.e2e --decks 4 --pages 20
+    python -m benchmarks.e2e --compare benchmarks/results/<older-commit>.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import resource
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from typing import Awaitable, Callable, Dict, List
+
+from benchmarks.load_test import percentile
+from benchmarks.synthetic_pdf import generate_pitch_deck
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+STAGES = ["ingest", "documents", "retrieve", "analyze", "chat", "export"]
+ANALYSIS_TYPES = ["company", "market", "financial", "risk"]
+QUESTIONS = [
+    "What is the business model?", "How large is the addressable market?", "Who are the founders?",
+    "What are the revenue projections?", "Who are the main competitors?", "What are the key risks?",
+    "How much is the company raising?", "What is the go-to-market strategy?",
+]
+# Lower is better for these; throughput is the only higher-is-better metric compared
+COMPARED_METRICS = ["p50_ms", "p95_ms", "p99_ms", "peak_rss_mb", "throughput_rps"]
+# Tail percentiles of small samples are mostly noise; only flag them from this many requests
+TAIL_MIN_REQUESTS = 100
+
+
+def configure_environment(data_dir: str, args):
+    """Point every store at data_dir and select the offline backends. Must run before importing the app."""
+    os.environ.update({
+        "LLM_BACKEND": "fake",
+        "FAKE_LLM_LATENCY_MS": str(args.llm_latency_ms),
+        "EMBEDDING_BACKEND": args.embeddings,
+        "GOOGLE_API_KEY": os.getenv("GOOGLE_API_KEY", "offline"),
+        "CHROMA_DB_PATH": os.path.join(data_dir, "chroma_db"),
+        "JOB_DB_PATH": os.path.join(data_dir, "jobs.sqlite3"),
+        "UPLOAD_DIR": os.path.join(data_dir, "uploads"),
+        "EMBEDDING_CACHE_PATH": os.path.join(data_dir, "embedding_cache.sqlite3"),
+        "ANALYSIS_CACHE_PATH": os.path.join(data_dir, "analyses"),
+        "CATALOG_DB_PATH": os.path.join(data_dir, "catalog.sqlite3"),
+        "BM25_DB_PATH": os.path.join(data_dir, "keyword_index.sqlite3"),
+        "METRICS_DIR": os.path.join(data_dir, "metrics"),
+        "TRACE_LOG_PATH": os.path.join(data_dir, "traces.jsonl"),
+        "INGEST_WORKERS": str(args.workers),
+        "INGEST_EMBEDDED_WORKERS": "1",
+        "INGEST_POLL_INTERVAL_SECONDS": "0.05",
+        "INGEST_PRECOMPUTE_ANALYSES": "0",
+        "INGEST_PRECOMPUTE_RESEARCH": "0",
+        "INGEST_BUILD_SUMMARIES": "0",
+        "GEMINI_REQUESTS_PER_MINUTE": "0",
+    })
+    os.makedirs(os.environ["UPLOAD_DIR"], exist_ok=True)
+
+
+# --- Memory ---
+
+def _rss_bytes(pid: int) -> int:
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return 0
+
+
+def _descendants(pid: int) -> List[int]:
+    children = []
+    try:
+        for task in os.listdir(f"/proc/{pid}/task"):
+            with open(f"/proc/{pid}/task/{task}/children") as f:
+                children.extend(int(c) for c in f.read().split())
+    except OSError:
+        return []
+    return children + [d for child in children for d in _descendants(child)]
+
+
+class RssSampler(threading.Thread):
+    """Peak resident memory of this process and its children, sampled every `interval` seconds."""
+
+    def __init__(self, interval: float = 0.05):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.peak = 0
+        self._stop_event = threading.Event()
+
+    def sample(self) -> int:
+        pid = os.getpid()
+        if not os.path.exists(f"/proc/{pid}/status"):
+            # No procfs (macOS): this process's high-water mark only
+            scale = 1 if sys.platform == "darwin" else 1024
+            return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale
+        return sum(_rss_bytes(p) for p in [pid] + _descendants(pid))
+
+    def reset(self):
+        self.peak = self.sample()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            self.peak = max(self.peak, self.sample())
+
+    def stop(self):
+        self._stop_event.set()
+
+
+# --- Stages ---
+
+async def run_stage(name: str, calls: List[Callable[[], Awaitable]], concurrency: int, sampler: RssSampler) -> dict:
+    """Run the calls with `concurrency` clients; a call fails by raising."""
+    latencies: List[float] = []
+    errors = 0
+    pending = list(reversed(calls))
+
+    async def client():
+        nonlocal errors
+        while pending:
+            call = pending.pop()
+            start = time.perf_counter()
+            try:
+                await call()
+            except Exception as e:
+                errors += 1
+                print(f"[{name}] {type(e).__name__}: {e}")
+            latencies.append(time.perf_counter() - start)
+
+    sampler.reset()
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    sampler.peak = max(sampler.peak, sampler.sample())
+    return {
+        "requests": len(calls),
+        "errors": errors,
+        "concurrency": concurrency,
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round(len(calls) / elapsed, 3) if elapsed else 0.0,
+        "p50_ms": round(statistics.median(latencies) * 1000, 2) if latencies else None,
+        "p95_ms": round(percentile(latencies, 95) * 1000, 2) if latencies else None,
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2) if latencies else None,
+        "peak_rss_mb": round(sampler.peak / 2 ** 20, 1),
+    }
+
+
+def _checked(response):
+    if response.status_code >= 400:
+        raise RuntimeError(f"{response.request.method} {response.request.url.path} -> {response.status_code}: {response.text[:200]}")
+    return response
+
+
+async def ingest(client, path: str, timeout: float):
+    with open(path, "rb") as f:
+        response = _checked(await client.post(
+            "/api/ingest",
+            files={"file": (os.path.basename(path), f.read(), "application/pdf")},
+            data={"industry": "SaaS", "geography": "North America", "deal_type": "Series A"},
+        ))
+    job_id = response.json()["job_id"]
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        status = _checked(await client.get(f"/api/ingest/status/{job_id}")).json()
+        if status["status"] == "done":
+            return status["result"]
+        if status["status"] in ("error", "cancelled"):
+            raise RuntimeError(f"ingest {os.path.basename(path)}: {status['error']}")
+        await asyncio.sleep(0.05)
+    raise TimeoutError(f"ingest {os.path.basename(path)} did not finish in {timeout}s")
+
+
+async def run(args) -> dict:
+    data_dir = tempfile.mkdtemp(prefix="pitchiq-e2e-")
+    try:
+        configure_environment(data_dir, args)
+        sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        import httpx
+        import main
+        import retrieval
+        from concurrency import run_blocking
+
+        decks = [generate_pitch_deck(os.path.join(data_dir, f"deck-{i:03d}.pdf"), args.pages, seed=i,
+                                     company=f"Synthetica {i}") for i in range(args.decks)]
+        warmup_deck = generate_pitch_deck(os.path.join(data_dir, "warmup.pdf"), 1, seed=999)
+        document_ids = [os.path.basename(path) for path in decks]
+        analyses: Dict[str, dict] = {doc: {} for doc in document_ids}
+
+        sampler = RssSampler()
+        sampler.start()
+        stages = {}
+        transport = httpx.ASGITransport(app=main.app)
+        async with main.app.router.lifespan_context(main.app):
+            async with httpx.AsyncClient(transport=transport, base_url="http://e2e", timeout=args.timeout) as client:
+                # Worker processes start with the app; don't bill their startup to the first deck
+                await ingest(client, warmup_deck, args.timeout)
+
+                stages["ingest"] = await run_stage(
+                    "ingest", [lambda p=p: ingest(client, p, args.timeout) for p in decks], args.workers, sampler)
+                elapsed = stages["ingest"]["elapsed_s"]
+                stages["ingest"]["pages_per_s"] = round(args.decks * args.pages / elapsed, 2) if elapsed else 0.0
+
+                async def documents(path):
+                    _checked(await client.get(path))
+
+                stages["documents"] = await run_stage(
+                    "documents", [lambda p=p: documents(p) for _ in range(args.repeat)
+                                  for p in ("/api/documents", "/api/documents/stats")],
+                    args.concurrency, sampler)
+
+                async def retrieve(doc, question):
+                    results = await run_blocking("chroma", retrieval.search, question, k=8, where={"source": doc})
+                    if not results:
+                        raise RuntimeError(f"no results for {doc}")
+
+                stages["retrieve"] = await run_stage(
+                    "retrieve", [lambda d=d, q=q: retrieve(d, q) for d in document_ids for q in QUESTIONS],
+                    args.concurrency, sampler)
+
+                async def analyze(doc, analysis_type):
+                    response = _checked(await client.post("/api/analyze", json={
+                        "document_id": doc, "analysis_type": analysis_type, "force_rerun": True}))
+                    analyses[doc][analysis_type] = response.json()["analysis"]
+
+                stages["analyze"] = await run_stage(
+                    "analyze", [lambda d=d, t=t: analyze(d, t) for d in document_ids for t in ANALYSIS_TYPES],
+                    args.concurrency, sampler)
+
+                async def chat(doc, question):
+                    _checked(await client.post("/api/chat", json={
+                        "document_id": doc, "messages": [{"role": "user", "content": question}]}))
+
+                stages["chat"] = await run_stage(
+                    "chat", [lambda d=d, i=i: chat(d, QUESTIONS[i % len(QUESTIONS)])
+                             for d in document_ids for i in range(args.chat_turns)],
+                    args.concurrency, sampler)
+
+                async def export(doc, kind):
+                    # Export takes one text block per section
+                    sections = {t: json.dumps(a, indent=2) for t, a in analyses[doc].items()}
+                    response = _checked(await client.post(f"/api/export/{kind}", json={
+                        "document_id": doc, "analysis_data": sections}))
+                    if not response.content:
+                        raise RuntimeError(f"empty {kind} export for {doc}")
+
+                stages["export"] = await run_stage(
+                    "export", [lambda d=d, k=k: export(d, k) for d in document_ids for k in ("pptx", "docx")],
+                    args.concurrency, sampler)
+        sampler.stop()
+        sampler.join()
+    finally:
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+    return {
+        **_revision(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "environment": {"python": platform.python_version(), "platform": platform.platform(), "cpus": os.cpu_count()},
+        "config": {
+            "decks": args.decks, "pages": args.pages, "chat_turns": args.chat_turns, "repeat": args.repeat,
+            "concurrency": args.concurrency, "workers": args.workers, "embeddings": args.embeddings,
+            "llm_latency_ms": args.llm_latency_ms,
+        },
+        "stages": stages,
+    }
+
+
+# --- Reporting ---
+
+def _revision() -> dict:
+    def git(*cmd) -> str:
+        try:
+            return subprocess.run(["git", *cmd], capture_output=True, text=True, check=True).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return ""
+    return {"commit": git("rev-parse", "--short", "HEAD") or "unknown",
+            "dirty": bool(git("status", "--porcelain", "--untracked-files=no"))}
+
+
+def print_report(result: dict):
+    config = result["config"]
+    print(f"commit {result['commit']}{' (dirty)' if result['dirty'] else ''}: {config['decks']} decks x {config['pages']} pages, "
+          f"embeddings={config['embeddings']}, fake LLM {config['llm_latency_ms']} ms, concurrency {config['concurrency']}")
+    print(f"{'stage':<10} {'reqs':>5} {'errors':>6} {'req/s':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'peak RSS MB':>12}")
+    for name in STAGES:
+        s = result["stages"].get(name)
+        if s:
+            print(f"{name:<10} {s['requests']:>5} {s['errors']:>6} {s['throughput_rps']:>8.2f} {s['p50_ms']:>9.1f} "
+                  f"{s['p95_ms']:>9.1f} {s['p99_ms']:>9.1f} {s['peak_rss_mb']:>12.1f}")
+
+
+def compare(result: dict, baseline: dict, threshold: float) -> List[str]:
+    """Print per-stage changes against a baseline run and return the regressions beyond `threshold`."""
+    if result["config"] != baseline["config"]:
+        print(f"warning: configs differ, baseline {baseline['config']}")
+    print(f"\nvs {baseline['commit']}{' (dirty)' if baseline.get('dirty') else ''} ({baseline['timestamp']})")
+    regressions = []
+    for name in STAGES:
+        current, previous = result["stages"].get(name), baseline["stages"].get(name)
+        if not current or not previous:
+            continue
+        changes = []
+        for metric in COMPARED_METRICS:
+            before, after = previous.get(metric), current.get(metric)
+            if not before or after is None:
+                continue
+            change = (after - before) / before
+            worse = -change if metric == "throughput_rps" else change
+            noisy = metric in ("p95_ms", "p99_ms") and current["requests"] < TAIL_MIN_REQUESTS
+            flag = " !" if worse > threshold and not noisy else ""
+            if flag:
+                regressions.append(f"{name}.{metric} {change:+.0%}")
+            changes.append(f"{metric} {change:+.0%}{flag}")
+        print(f"{name:<10} " + "  ".join(changes))
+    return regressions
+
+
+def default_output(result: dict) -> str:
+    return os.path.join(RESULTS_DIR, f"{result['commit']}{'-dirty' if result['dirty'] else ''}.json")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--decks", type=int, default=4)
+    parser.add_argument("--pages", type=int, default=20, help="pages per synthetic deck")
+    parser.add_argument("--chat-turns", type=int, default=8, help="chat questions per deck")
+    parser.add_argument("--repeat", type=int, default=20, help="document listing requests per endpoint")
+    parser.add_argument("--concurrency", type=int, default=4, help="concurrent clients (ingest uses --workers)")
+    parser.add_argument("--workers", type=int, default=2, help="ingestion worker processes")
+    parser.add_argument("--embeddings", choices=["hashing", "onnx", "huggingface"], default="hashing")
+    parser.add_argument("--llm-latency-ms", type=float, default=300.0, help="fake LLM base latency")
+    parser.add_argument("--timeout", type=float, default=600.0)
+    parser.add_argument("--output", help="result file (default benchmarks/results/<commit>.json)")
+    parser.add_argument("--compare", help="earlier result file to compare against")
+    parser.add_argument("--threshold", type=float, default=0.2, help="relative change counted as a regression")
+    args = parser.parse_args()
+
+    result = asyncio.run(run(args))
+    print_report(result)
+    output = args.output or default_output(result)
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(result, f, indent=2)
+    print(f"saved {output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(result, json.load(f), args.threshold)
+        if regressions:
+            print("regressions: " + ", ".join(regressions))
+            sys.exit(1)
@@ -0,0 +1,58 @@
+"""
+Benchmark: embedding throughput per EMBEDDING_BACKEND.
+Embeds the chunks of a synthetic deck (the same splitter as ingestion) with
+each requested backend, bypassing the embedding cache, and reports chunks/s
+for batched document embedding plus single-query latency.
+
+The gemini backend needs GOOGLE_API_KEY; onnx downloads Chroma's MiniLM
+export on first use. Usage (from backend/):
+    python -m benchmarks.embedding_throughput --backends gemini,onnx --pages 40
+    ONNX_QUANTIZE=0 python -m benchmarks.embedding_throughput --backends onnx
+"""
+
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+import embedding_backends
+from benchmarks.synthetic_pdf import generate_pitch_deck
+from pdf_pipeline import extract_chunks
+
+
+def run(backends, pages: int, queries: int):
+    with tempfile.TemporaryDirectory() as tmp:
+        chunks, _ = extract_chunks(generate_pitch_deck(os.path.join(tmp, "deck.pdf"), pages), workers=1)
+    texts = [doc.page_content for doc in chunks]
+    print(f"{len(texts)} chunks from a {pages}-page deck")
+    print(f"{'backend':<12} {'load s':>7} {'dim':>5} {'chunks/s':>9} {'query p50 ms':>13} {'query p95 ms':>13}")
+
+    for backend in backends:
+        start = time.perf_counter()
+        embeddings = embedding_backends.create_embeddings(backend)
+        embeddings.embed_query("warmup")
+        load_s = time.perf_counter() - start
+
+        start = time.perf_counter()
+        vectors = embeddings.embed_documents(texts)
+        throughput = len(texts) / (time.perf_counter() - start)
+
+        latencies = []
+        for i in range(queries):
+            start = time.perf_counter()
+            embeddings.embed_query(f"What is the revenue growth in year {i}?")
+            latencies.append((time.perf_counter() - start) * 1000)
+        latencies.sort()
+        p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+        print(f"{backend:<12} {load_s:>7.1f} {len(vectors[0]):>5} {throughput:>9.1f} "
+              f"{statistics.median(latencies):>13.1f} {p95:>13.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backends", default="gemini,onnx", help="comma-separated: gemini, huggingface, onnx")
+    parser.add_argument("--pages", type=int, default=40)
+    parser.add_argument("--queries", type=int, default=20)
+    args = parser.parse_args()
+    run([b.strip() for b in args.backends.split(",") if b.strip()], args.pages, args.queries)
@@ -0,0 +1,84 @@
+"""
+Benchmark: vector-only vs BM25-only vs hybrid (RRF) retrieval.
+Known-item search over one ingested document: each sampled chunk yields a
+query built from a short span of its own text, preferring spans with figures
+("ARR of $4.2M", "23% margin") that are typical of analyst questions.
+Reports hit@k, MRR and per-query latency for each mode.
+
+Requires the configured embedding backend. Usage (from backend/):
+    python -m benchmarks.hybrid_retrieval --document-id deck.pdf --queries 50
+"""
+
+import argparse
+import random
+import statistics
+import time
+
+import bm25_index
+import retrieval
+import vector_store
+
+MODES = ["vector", "bm25", "hybrid"]
+
+
+def make_queries(document_id: str, count: int, span: int, seed: int):
+    """Sample (chunk_id, query) pairs; each query is a token span of its chunk, biased toward numbers."""
+    rng = random.Random(seed)
+    stored = vector_store.get_vectordb()._collection.get(where={"source": document_id}, include=["documents"])
+    pairs = []
+    for chunk_id, text in zip(stored["ids"], stored["documents"]):
+        tokens = bm25_index.tokenize(text or "")
+        if len(tokens) < span:
+            continue
+        numeric = [i for i, t in enumerate(tokens) if any(c.isdigit() for c in t)]
+        center = rng.choice(numeric) if numeric else rng.randrange(len(tokens))
+        start = max(0, min(center - span // 2, len(tokens) - span))
+        pairs.append((chunk_id, " ".join(tokens[start:start + span])))
+    rng.shuffle(pairs)
+    return pairs[:count]
+
+
+def rank_ids(mode: str, query: str, k: int, document_id: str):
+    if mode == "bm25":
+        return [chunk_id for chunk_id, _ in bm25_index.search(query, k=k, source=document_id)]
+    retrieval.RETRIEVAL_MODE = "hybrid" if mode == "hybrid" else "vector"
+    return [doc.id for doc in retrieval.search(query, k, where={"source": document_id})]
+
+
+def run(document_id: str, count: int, k: int, span: int, seed: int):
+    pairs = make_queries(document_id, count, span, seed)
+    if not pairs:
+        print(f"No chunks for '{document_id}'. Ingest it first (and run `python bm25_index.py --rebuild` for older data).")
+        return
+
+    print(f"{len(pairs)} known-item queries, k={k}, span={span} tokens")
+    print(f"{'mode':<8} {'hit@1':>7} {f'hit@{k}':>7} {'MRR':>7} {'p50 ms':>8} {'p95 ms':>8}")
+    for mode in MODES:
+        hits_1 = hits_k = 0
+        reciprocal_ranks, latencies = [], []
+        for chunk_id, query in pairs:
+            start = time.perf_counter()
+            ranked = rank_ids(mode, query, k, document_id)
+            latencies.append((time.perf_counter() - start) * 1000)
+            if chunk_id in ranked:
+                rank = ranked.index(chunk_id) + 1
+                hits_1 += rank == 1
+                hits_k += 1
+                reciprocal_ranks.append(1 / rank)
+            else:
+                reciprocal_ranks.append(0.0)
+        latencies.sort()
+        p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+        print(f"{mode:<8} {hits_1 / len(pairs):>7.2f} {hits_k / len(pairs):>7.2f} "
+              f"{statistics.mean(reciprocal_ranks):>7.3f} {statistics.median(latencies):>8.1f} {p95:>8.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--document-id", required=True)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--k", type=int, default=8)
+    parser.add_argument("--span", type=int, default=6, help="query length in tokens")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+    run(args.document_id, args.queries, args.k, args.span, args.seed)
@@ -0,0 +1,112 @@
+"""
+Concurrency load test for the PitchIQ API.
+Fires the same request at increasing client concurrency against a running
+server and reports throughput, so a blocked event loop shows up as flat
+requests/sec instead of scaling with the number of clients.
+
+Usage (from backend/):
+    uvicorn main:app --port 8002
+    python -m benchmarks.load_test --endpoint chat --document-id deck.pdf --concurrency 1,2,4,8
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+from typing import List
+
+import httpx
+
+
+def build_request(endpoint: str, document_id: str):
+    if endpoint == "chat":
+        return "POST", "/api/chat", {
+            "document_id": document_id,
+            "messages": [{"role": "user", "content": "What is the business model?"}],
+        }
+    if endpoint == "analyze":
+        return "POST", "/api/analyze", {
+            "document_id": document_id,
+            "analysis_type": "company",
+            "force_rerun": True,
+        }
+    if endpoint == "documents":
+        return "GET", "/api/documents", None
+    return "GET", "/api/health", None
+
+
+def percentile(values: List[float], pct: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+async def run_level(client: httpx.AsyncClient, method: str, path: str, body, concurrency: int, total: int) -> dict:
+    latencies: List[float] = []
+    errors = 0
+    queue: asyncio.Queue = asyncio.Queue()
+    for _ in range(total):
+        queue.put_nowait(None)
+
+    async def worker():
+        nonlocal errors
+        while True:
+            try:
+                queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            start = time.perf_counter()
+            try:
+                response = await client.request(method, path, json=body)
+                if response.status_code >= 400:
+                    errors += 1
+            except httpx.HTTPError:
+                errors += 1
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    return {
+        "concurrency": concurrency,
+        "requests": total,
+        "errors": errors,
+        "elapsed_s": elapsed,
+        "throughput_rps": total / elapsed if elapsed else 0.0,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:8002")
+    parser.add_argument("--endpoint", choices=["chat", "analyze", "documents", "health"], default="health")
+    parser.add_argument("--document-id", default="test_pitchbook.pdf")
+    parser.add_argument("--concurrency", default="1,2,4,8,16")
+    parser.add_argument("--requests-per-client", type=int, default=4)
+    parser.add_argument("--timeout", type=float, default=300.0)
+    args = parser.parse_args()
+
+    method, path, body = build_request(args.endpoint, args.document_id)
+    levels = [int(c) for c in args.concurrency.split(",")]
+
+    async with httpx.AsyncClient(base_url=args.url, timeout=args.timeout) as client:
+        results = []
+        for concurrency in levels:
+            result = await run_level(client, method, path, body, concurrency, concurrency * args.requests_per_client)
+            results.append(result)
+
+    baseline = results[0]["throughput_rps"] or 1.0
+    print(f"{args.endpoint} @ {args.url}")
+    print(f"{'clients':>8} {'reqs':>6} {'errors':>7} {'req/s':>9} {'scale':>7} {'p50 ms':>9} {'p95 ms':>9}")
+    for r in results:
+        print(
+            f"{r['concurrency']:>8} {r['requests']:>6} {r['errors']:>7} {r['throughput_rps']:>9.2f} "
+            f"{r['throughput_rps'] / baseline:>6.2f}x {r['p50_ms']:>9.1f} {r['p95_ms']:>9.1f}"
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,64 @@
+"""
+Benchmark: sequential PyPDFLoader + splitter vs page-range-parallel parsing.
+Generates synthetic multi-hundred-page decks, checks that both paths yield
+identical chunks in the same order, and reports wall-clock speedup.
+
+Usage (from backend/):
+    python -m benchmarks.pdf_parsing --pages 100,200,300 --workers 4
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+from langchain_community.document_loaders import PyPDFLoader
+
+from benchmarks.synthetic_pdf import generate_pitch_deck
+
+
+def sequential_chunks(path: str):
+    from pdf_pipeline import make_text_splitter
+    pages = PyPDFLoader(path).load()
+    return make_text_splitter().split_documents(pages)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", default="100,200,300")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 2)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    # The parse pool is sized from PDF_PARSE_WORKERS when pdf_pipeline is imported
+    os.environ["PDF_PARSE_WORKERS"] = str(args.workers)
+    from pdf_pipeline import extract_chunks, shutdown_pool
+
+    print(f"{'pages':>6} {'chunks':>7} {'sequential s':>13} {'parallel s':>11} {'speedup':>8} {'identical':>10}")
+    with tempfile.TemporaryDirectory() as tmp:
+        # Warm the process pool so spawn cost is not charged to the first size
+        warm = generate_pitch_deck(os.path.join(tmp, "warm.pdf"), 64)
+        extract_chunks(warm, workers=args.workers)
+
+        for pages in [int(p) for p in args.pages.split(",")]:
+            path = generate_pitch_deck(os.path.join(tmp, f"deck_{pages}.pdf"), pages)
+
+            seq_best = par_best = float("inf")
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                expected = sequential_chunks(path)
+                seq_best = min(seq_best, time.perf_counter() - start)
+
+                start = time.perf_counter()
+                actual, _ = extract_chunks(path, workers=args.workers)
+                par_best = min(par_best, time.perf_counter() - start)
+
+            identical = [(d.page_content, d.metadata["page"]) for d in expected] == \
+                        [(d.page_content, d.metadata["page"]) for d in actual]
+            print(f"{pages:>6} {len(actual):>7} {seq_best:>13.3f} {par_best:>11.3f} {seq_best / par_best:>7.2f}x {str(identical):>10}")
+
+    shutdown_pool()
+
+
+if __name__ == "__main__":
+    main()
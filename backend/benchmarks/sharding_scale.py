@@ -0,0 +1,87 @@
+"""
+Benchmark: one global collection + `source` filter vs per-document shards.
+Builds synthetic corpora of N documents (random unit vectors, fixed chunks
+per document) in a temporary Chroma store for each layout, then measures
+cold and warm deck-scoped query latency and recall@k against exact brute-force search
+within the deck.
+
+Usage (from backend/):
+    python -m benchmarks.sharding_scale --docs 10,100,1000,10000 --chunks 20
+"""
+
+import argparse
+import statistics
+import tempfile
+import time
+
+import chromadb
+import numpy as np
+
+
+def build(client, layout: str, vectors: np.ndarray, docs: int, chunks: int):
+    if layout == "global":
+        collection = client.create_collection("global", metadata={"hnsw:space": "cosine"})
+        ids = [f"{d}-{c}" for d in range(docs) for c in range(chunks)]
+        metadatas = [{"source": f"doc{d}"} for d in range(docs) for _ in range(chunks)]
+        for start in range(0, len(ids), 5000):
+            collection.add(ids=ids[start:start + 5000], embeddings=vectors[start:start + 5000].tolist(),
+                           metadatas=metadatas[start:start + 5000])
+        return lambda d: (collection, {"source": f"doc{d}"})
+    shards = {}
+    for d in range(docs):
+        shard = client.create_collection(f"doc-{d:06d}", metadata={"hnsw:space": "cosine"})
+        shard.add(ids=[f"{d}-{c}" for c in range(chunks)], embeddings=vectors[d * chunks:(d + 1) * chunks].tolist(),
+                  metadatas=[{"source": f"doc{d}"}] * chunks)
+        shards[d] = shard
+    return lambda d: (shards[d], None)
+
+
+def run(doc_counts, chunks: int, dim: int, queries: int, k: int, seed: int):
+    print(f"{chunks} chunks/document, dim={dim}, k={k}, {queries} queries")
+    print(f"{'docs':>6} {'layout':<13} {'build s':>8} {'cold p50':>8} {'warm p50':>8} {'warm p95':>8} {'recall@k':>9}")
+    rng = np.random.default_rng(seed)
+    for docs in doc_counts:
+        vectors = rng.standard_normal((docs * chunks, dim)).astype(np.float32)
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+        probes = [(int(rng.integers(docs)), rng.standard_normal(dim).astype(np.float32)) for _ in range(queries)]
+
+        for layout in ("global", "per_document"):
+            with tempfile.TemporaryDirectory() as tmp:
+                client = chromadb.PersistentClient(path=tmp)
+                start = time.perf_counter()
+                target = build(client, layout, vectors, docs, chunks)
+                build_s = time.perf_counter() - start
+
+                # First pass opens segments (cold), second pass is served from memory (warm)
+                passes = []
+                for _ in range(2):
+                    latencies, recalls = [], []
+                    for d, query in probes:
+                        collection, where = target(d)
+                        start = time.perf_counter()
+                        result = collection.query(query_embeddings=[query.tolist()], n_results=k, where=where, include=[])
+                        latencies.append((time.perf_counter() - start) * 1000)
+                        deck = vectors[d * chunks:(d + 1) * chunks]
+                        exact = {f"{d}-{c}" for c in np.argsort(-(deck @ (query / np.linalg.norm(query))))[:k]}
+                        recalls.append(len(exact & set(result["ids"][0])) / len(exact))
+                    passes.append(sorted(latencies))
+                cold, warm = passes
+                p95 = warm[min(len(warm) - 1, int(len(warm) * 0.95))]
+                print(f"{docs:>6} {layout:<13} {build_s:>8.1f} {statistics.median(cold):>8.2f} "
+                      f"{statistics.median(warm):>8.2f} {p95:>8.2f} {statistics.mean(recalls):>9.3f}")
+                if hasattr(client, "close"):
+                    client.close()
+                else:
+                    client.clear_system_cache()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--docs", default="10,100,1000", help="comma-separated document counts")
+    parser.add_argument("--chunks", type=int, default=20)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--k", type=int, default=8)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+    run([int(n) for n in args.docs.split(",")], args.chunks, args.dim, args.queries, args.k, args.seed)
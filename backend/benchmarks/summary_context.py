@@ -0,0 +1,78 @@
+"""
+Benchmark: raw-chunk prompts vs precomputed-summary prompts for /analyze.
+For one ingested document, compares prompt tokens, generation latency and a
+simple answer-quality score across ANALYSIS_CONTEXT_MODE settings.
+Quality = share of schema fields holding a real value (not N/A / defaults /
+empty lists) plus the number of citations returned.
+
+Requires GOOGLE_API_KEY. Usage (from backend/):
+    python -m benchmarks.summary_context --document-id deck.pdf --build
+"""
+
+import argparse
+import asyncio
+import time
+
+import agents
+import document_catalog
+import summaries
+from vector_store import get_vectordb, search_many
+
+MODES = ["chunks", "hybrid", "summaries"]
+EMPTY_VALUES = {"N/A", "TBD", "No overview available.", "Verification in progress.", "", None}
+
+
+def quality(data: dict) -> tuple:
+    fields = [k for k in data if k not in ("reasoning", "citations")]
+    filled = sum(1 for k in fields if data[k] not in EMPTY_VALUES and data[k] != [])
+    return filled / len(fields) if fields else 0.0, len(data.get("citations") or [])
+
+
+async def run(document_id: str, analysis_types, build: bool):
+    entry = document_catalog.get_file(document_id)
+    file_hash = entry["file_hash"] if entry else None
+
+    if build:
+        start = time.perf_counter()
+        await summaries.build_document_summaries(document_id, file_hash, get_vectordb()._collection)
+        print(f"Summaries ready in {time.perf_counter() - start:.1f}s")
+    if not summaries.summary_context(document_id, file_hash):
+        print("No summaries for this document; run with --build or ingest with INGEST_BUILD_SUMMARIES=1.")
+        return
+
+    per_query = search_many(
+        [q for t in analysis_types for q in agents.get_analysis_queries(t)], k=6, where={"source": document_id}
+    )
+    results_by_type, offset = {}, 0
+    for t in analysis_types:
+        count = len(agents.get_analysis_queries(t))
+        results_by_type[t] = agents._dedupe_results(per_query[offset:offset + count])
+        offset += count
+
+    print(f"{'type':<10} {'mode':<10} {'prompt tokens':>14} {'latency s':>10} {'filled':>7} {'citations':>10}")
+    for analysis_type in analysis_types:
+        for mode in MODES:
+            summaries.ANALYSIS_CONTEXT_MODE = mode
+            context = agents.build_analysis_context(document_id, analysis_type, results_by_type[analysis_type])
+            prompt = agents.build_analysis_prompt(analysis_type, context)
+            tokens = agents.model.count_tokens(prompt).total_tokens
+
+            start = time.perf_counter()
+            data = (await agents.perform_analysis(analysis_type, context)).model_dump()
+            latency = time.perf_counter() - start
+
+            filled, citations = quality(data)
+            print(f"{analysis_type:<10} {mode:<10} {tokens:>14} {latency:>10.2f} {filled:>7.0%} {citations:>10}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--document-id", required=True)
+    parser.add_argument("--types", default="company,market,financial,risk")
+    parser.add_argument("--build", action="store_true", help="build summaries first if missing")
+    args = parser.parse_args()
+    asyncio.run(run(args.document_id, args.types.split(","), args.build))
+
+
+if __name__ == "__main__":
+    main()
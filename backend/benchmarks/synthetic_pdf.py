@@ -0,0 +1,104 @@
+"""
+Synthetic pitch-deck PDF generator for benchmarks.
+Writes plain text-only PDFs (Helvetica, one content stream per page) with no
+third-party dependencies, so decks of any size can be produced on demand.
+"""
+
+import random
+from typing import List
+
+SECTIONS = [
+    ("Company Overview", "{name} was founded in {year} and is headquartered in {city}. The company provides {product} to mid-market customers across {region}."),
+    ("Management Team", "The founding team previously scaled {product} businesses at leading firms. The CEO has {years} years of operating experience."),
+    ("Market Size", "The total addressable market (TAM) is estimated at ${tam}B, with a serviceable market (SAM) of ${sam}B and a CAGR of {cagr}%."),
+    ("Competition", "Key competitors include {comp1}, {comp2} and {comp3}. {name} differentiates on price, integrations and time-to-value."),
+    ("Financial Performance", "Revenue grew to ${revenue}M in FY{fy} with EBITDA margins of {ebitda}%. Monthly burn rate is ${burn}M with {runway} months of runway."),
+    ("Unit Economics", "LTV is ${ltv}K against a CAC of ${cac}K, giving an LTV/CAC ratio of {ratio}x. Net revenue retention stands at {nrr}%."),
+    ("Valuation", "The company is raising ${raise}M at a pre-money valuation of ${valuation}M. Proceeds fund go-to-market expansion."),
+    ("Key Risks", "Risks include customer concentration, regulatory change in {region}, and execution risk on the product roadmap. Mitigants are described below."),
+]
+CITIES = ["New York", "London", "Singapore", "Berlin", "Austin", "Toronto"]
+REGIONS = ["North America", "EMEA", "APAC", "LATAM"]
+PRODUCTS = ["payments infrastructure", "revenue analytics", "clinical workflow software", "B2B marketplace tooling"]
+COMPETITORS = ["Acme Corp", "Globex", "Initech", "Umbrella", "Hooli", "Stark Industries", "Wayne Enterprises"]
+
+
+def _page_lines(rng: random.Random, name: str, page_number: int) -> List[str]:
+    title, template = SECTIONS[page_number % len(SECTIONS)]
+    values = {
+        "name": name, "year": rng.randint(2008, 2022), "city": rng.choice(CITIES),
+        "region": rng.choice(REGIONS), "product": rng.choice(PRODUCTS), "years": rng.randint(8, 25),
+        "tam": rng.randint(5, 90), "sam": rng.randint(1, 5), "cagr": rng.randint(6, 35),
+        "comp1": rng.choice(COMPETITORS), "comp2": rng.choice(COMPETITORS), "comp3": rng.choice(COMPETITORS),
+        "revenue": rng.randint(2, 400), "fy": rng.randint(20, 25), "ebitda": rng.randint(-30, 40),
+        "burn": round(rng.uniform(0.2, 4.0), 1), "runway": rng.randint(6, 36),
+        "ltv": rng.randint(20, 300), "cac": rng.randint(5, 60), "ratio": round(rng.uniform(1.5, 6.0), 1),
+        "nrr": rng.randint(90, 140), "raise": rng.randint(5, 150), "valuation": rng.randint(30, 2000),
+    }
+    lines = [f"{title} - Page {page_number + 1}", ""]
+    for _ in range(rng.randint(14, 22)):
+        lines.append(template.format(**values))
+    return lines
+
+
+def _escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def _wrap(line: str, width: int = 95) -> List[str]:
+    words, out, current = line.split(), [], ""
+    for word in words:
+        if current and len(current) + len(word) + 1 > width:
+            out.append(current)
+            current = word
+        else:
+            current = f"{current} {word}".strip()
+    out.append(current)
+    return out
+
+
+def generate_pitch_deck(path: str, pages: int, seed: int = 7, company: str = "Synthetica Inc") -> str:
+    """Write a `pages`-page synthetic pitch deck to `path` and return the path."""
+    rng = random.Random(seed)
+    objects: List[bytes] = []
+
+    def add(obj: bytes) -> int:
+        objects.append(obj)
+        return len(objects)
+
+    catalog_id = add(b"")  # placeholder, filled once the page tree exists
+    pages_id = add(b"")
+    font_id = add(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+
+    page_ids = []
+    for page_number in range(pages):
+        text_ops = ["BT", "/F1 10 Tf", "12 TL", "50 760 Td"]
+        for line in _page_lines(rng, company, page_number):
+            for wrapped in _wrap(line):
+                text_ops.append(f"({_escape(wrapped)}) '")
+        text_ops.append("ET")
+        stream = "\n".join(text_ops).encode("latin-1")
+        content_id = add(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+        page_ids.append(add(
+            b"<< /Type /Page /Parent %d 0 R /MediaBox [0 0 612 792] "
+            b"/Resources << /Font << /F1 %d 0 R >> >> /Contents %d 0 R >>" % (pages_id, font_id, content_id)
+        ))
+
+    kids = b" ".join(b"%d 0 R" % pid for pid in page_ids)
+    objects[pages_id - 1] = b"<< /Type /Pages /Kids [" + kids + b"] /Count %d >>" % len(page_ids)
+    objects[catalog_id - 1] = b"<< /Type /Catalog /Pages %d 0 R >>" % pages_id
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % number + body + b"\nendobj\n"
+    xref_at = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    for offset in offsets:
+        out += b"%010d 00000 n \n" % offset
+    out += b"trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, catalog_id, xref_at)
+
+    with open(path, "wb") as f:
+        f.write(out)
+    return path
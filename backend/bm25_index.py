@@ -0,0 +1,185 @@
+"""
+Local BM25 keyword index over ingested chunks.
+An inverted index in SQLite, kept next to the Chroma collection and updated
+incrementally at ingest time. Postings are keyed by (source, term) so a
+deck-scoped search only reads that deck's postings. Exact terms and figures ("EBITDA", "LTV",
+"23.5%") that dense embeddings tend to blur are matched lexically, then
+fused with vector results in retrieval.py.
+
+Rebuild for data ingested before the index existed:
+    python bm25_index.py --rebuild
+"""
+
+import argparse
+import math
+import os
+import re
+import threading
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+from shared_utils import connect_sqlite, get_data_path
+
+BM25_DB_PATH = get_data_path("BM25_DB_PATH", "keyword_index.sqlite3")
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+(?:[.,][0-9]+)*%?")
+_STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "has", "have", "in", "is", "it",
+    "its", "of", "on", "or", "that", "the", "their", "this", "to", "was", "were", "will", "with",
+}
+
+_conn = None
+_conn_pid = None
+_lock = threading.Lock()
+
+
+def tokenize(text: str) -> List[str]:
+    return [t for t in _TOKEN_RE.findall(text.lower()) if t not in _STOPWORDS]
+
+
+def _get_conn():
+    global _conn, _conn_pid
+    if _conn is None or _conn_pid != os.getpid():
+        _conn = connect_sqlite(BM25_DB_PATH)
+        _conn.execute(
+            "CREATE TABLE IF NOT EXISTS chunks (chunk_id TEXT PRIMARY KEY, source TEXT NOT NULL, length INTEGER NOT NULL)"
+        )
+        _migrate_postings(_conn)
+        _conn.execute(
+            "CREATE TABLE IF NOT EXISTS postings (source TEXT NOT NULL, term TEXT NOT NULL, chunk_id TEXT NOT NULL,"
+            " tf INTEGER NOT NULL, PRIMARY KEY (source, term, chunk_id)) WITHOUT ROWID"
+        )
+        _conn.execute("CREATE INDEX IF NOT EXISTS idx_chunks_source ON chunks (source)")
+        _conn.execute("CREATE INDEX IF NOT EXISTS idx_postings_term ON postings (term)")
+        _conn.execute("CREATE INDEX IF NOT EXISTS idx_postings_chunk ON postings (chunk_id)")
+        _conn.commit()
+        _conn_pid = os.getpid()
+    return _conn
+
+
+def _migrate_postings(conn):
+    """Copy postings of an index built before they carried their chunk's source."""
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        columns = [row[1] for row in conn.execute("PRAGMA table_info(postings)")]
+        if columns and "source" not in columns:
+            conn.execute(
+                "CREATE TABLE postings_by_source (source TEXT NOT NULL, term TEXT NOT NULL, chunk_id TEXT NOT NULL,"
+                " tf INTEGER NOT NULL, PRIMARY KEY (source, term, chunk_id)) WITHOUT ROWID"
+            )
+            conn.execute(
+                "INSERT INTO postings_by_source (source, term, chunk_id, tf)"
+                " SELECT c.source, p.term, p.chunk_id, p.tf FROM postings p JOIN chunks c ON c.chunk_id = p.chunk_id"
+            )
+            conn.execute("DROP TABLE postings")
+            conn.execute("ALTER TABLE postings_by_source RENAME TO postings")
+            print("[BM25] Migrated postings to per-source keys")
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+
+
+def add_chunks(docs) -> int:
+    """Index (or re-index) LangChain Documents that carry an `id` and a `source` metadata field."""
+    rows_chunks, rows_postings, ids = [], [], []
+    for doc in docs:
+        terms = Counter(tokenize(doc.page_content))
+        source = doc.metadata.get("source", "")
+        ids.append(doc.id)
+        rows_chunks.append((doc.id, source, sum(terms.values())))
+        rows_postings.extend((source, term, doc.id, tf) for term, tf in terms.items())
+    if not ids:
+        return 0
+    with _lock:
+        conn = _get_conn()
+        _delete(conn, ids)
+        conn.executemany("INSERT INTO chunks (chunk_id, source, length) VALUES (?, ?, ?)", rows_chunks)
+        conn.executemany("INSERT INTO postings (source, term, chunk_id, tf) VALUES (?, ?, ?, ?)", rows_postings)
+        conn.commit()
+    return len(ids)
+
+
+def _delete(conn, ids: List[str]):
+    for start in range(0, len(ids), 500):
+        batch = ids[start:start + 500]
+        placeholders = ",".join("?" * len(batch))
+        conn.execute(f"DELETE FROM postings WHERE chunk_id IN ({placeholders})", batch)
+        conn.execute(f"DELETE FROM chunks WHERE chunk_id IN ({placeholders})", batch)
+
+
+def delete_chunks(ids: List[str]):
+    if not ids:
+        return
+    with _lock:
+        conn = _get_conn()
+        _delete(conn, list(ids))
+        conn.commit()
+
+
+def search(query: str, k: int = 10, source: Optional[str] = None) -> List[Tuple[str, float]]:
+    """Top-k (chunk_id, BM25 score) for a query, optionally restricted to one source document."""
+    terms = list(dict.fromkeys(tokenize(query)))
+    if not terms:
+        return []
+    scope = " WHERE source = ?" if source else ""
+    scope_params = [source] if source else []
+    postings_scope = " AND p.source = ?" if source else ""
+
+    with _lock:
+        conn = _get_conn()
+        total, avg_length = conn.execute(f"SELECT COUNT(*), AVG(length) FROM chunks{scope}", scope_params).fetchone()
+        if not total:
+            return []
+        placeholders = ",".join("?" * len(terms))
+        rows = conn.execute(
+            f"SELECT p.term, p.chunk_id, p.tf, c.length FROM postings p JOIN chunks c ON c.chunk_id = p.chunk_id"
+            f" WHERE p.term IN ({placeholders}){postings_scope}",
+            [*terms, *scope_params],
+        ).fetchall()
+
+    document_frequency: Counter = Counter(term for term, _, _, _ in rows)
+    scores: Dict[str, float] = {}
+    for term, chunk_id, tf, length in rows:
+        idf = math.log(1 + (total - document_frequency[term] + 0.5) / (document_frequency[term] + 0.5))
+        norm = tf + BM25_K1 * (1 - BM25_B + BM25_B * length / (avg_length or 1))
+        scores[chunk_id] = scores.get(chunk_id, 0.0) + idf * tf * (BM25_K1 + 1) / norm
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+
+
+def rebuild_from_collection(collection, page_size: int = 2000) -> int:
+    """Re-index every chunk in a Chroma collection."""
+    from langchain_core.documents import Document
+
+    indexed, offset = 0, 0
+    while True:
+        batch = collection.get(include=["documents", "metadatas"], limit=page_size, offset=offset)
+        if not batch["ids"]:
+            break
+        indexed += add_chunks([
+            Document(id=chunk_id, page_content=text or "", metadata=meta or {})
+            for chunk_id, text, meta in zip(batch["ids"], batch["documents"], batch["metadatas"])
+        ])
+        offset += len(batch["ids"])
+    return indexed
+
+
+def rebuild() -> int:
+    """Re-index the main collection and every per-document shard stored for the current embedding model."""
+    from vector_store import DEFAULT_COLLECTION, collection_exists, get_vectordb, shard_collections
+    # Shards may predate (or outlive) a switch of VECTOR_STORAGE_MODE, so index whatever is stored
+    names = [name for name in [DEFAULT_COLLECTION] if collection_exists(name)] + shard_collections()
+    indexed = sum(rebuild_from_collection(get_vectordb(name)._collection) for name in names)
+    print(f"[BM25] Indexed {indexed} chunks from {len(names)} collection(s) into {BM25_DB_PATH}")
+    return indexed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Maintain the BM25 keyword index")
+    parser.add_argument("--rebuild", action="store_true",
+                        help="re-index every chunk in the main collection and the per-document shards")
+    args = parser.parse_args()
+    if args.rebuild:
+        rebuild()
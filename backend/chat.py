@@ -1,27 +1,27 @@
-import os
 import re
+import json
+import time
 from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from typing import List
-import google.generativeai as genai
-from langchain_chroma import Chroma
+import retrieval
 from shared_utils import get_embeddings
+import chat_cache
+import document_catalog
+import summaries
+import context_cache
+import tracing
+import llm_client
+from concurrency import run_blocking
+from llm_client import generate_content_async, stream_content_async
 from dotenv import load_dotenv
 
 load_dotenv()
 
 router = APIRouter()
 
-# Configure Gemini
-genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
-model = genai.GenerativeModel('gemini-2.5-flash')
-
-# Embeddings for ChromaDB (lazy loaded)
-# Use persistent storage: env var > /mnt/data > local fallback
-VECTOR_DB_DIR = os.getenv("CHROMA_DB_PATH") or ("/mnt/data/chroma_db" if os.path.exists("/mnt/data") else "./chroma_db")
-
-# Ensure directory exists
-os.makedirs(VECTOR_DB_DIR, exist_ok=True)
+model = llm_client.get_model('gemini-2.5-flash')
 
 class ChatMessage(BaseModel):
     role: str
@@ -62,49 +62,67 @@ def check_guardrails(user_message: str) -> tuple[bool, str]:
     
     return True, "OK"
 
-@router.post("/chat")
-async def chat_with_document(request: ChatRequest):
-    try:
-        if not request.messages:
-            raise HTTPException(status_code=400, detail="No messages provided")
-        
-        # Get last user message
-        user_messages = [msg for msg in request.messages if msg.role == "user"]
-        if not user_messages:
-            raise HTTPException(status_code=400, detail="No user message found")
-        
-        last_user_message = user_messages[-1].content
-        
-        # 1. Guardrails check
-        is_safe, reason = check_guardrails(last_user_message)
-        if not is_safe:
-            raise HTTPException(status_code=400, detail=f"Security check failed: {reason}")
-        
-        # 2. Retrieve context from ChromaDB
-        vectordb = Chroma(persist_directory=VECTOR_DB_DIR, embedding_function=get_embeddings())
-        
-        # Search for relevant context
-        results = vectordb.similarity_search(
-            query=last_user_message,
+NO_CONTEXT_RESPONSE = "I don't have any information about this document in my database. Please make sure the document has been ingested first."
+HALLUCINATION_PHRASES = ["I think", "probably", "might be", "I'm not sure but", "based on general knowledge"]
+HALLUCINATION_DISCLAIMER = "\n\n⚠️ Note: Some parts of this response may be uncertain. Please verify critical information."
+
+
+def get_last_user_message(request: ChatRequest) -> str:
+    if not request.messages:
+        raise HTTPException(status_code=400, detail="No messages provided")
+    
+    # Get last user message
+    user_messages = [msg for msg in request.messages if msg.role == "user"]
+    if not user_messages:
+        raise HTTPException(status_code=400, detail="No user message found")
+    
+    last_user_message = user_messages[-1].content
+    
+    # Guardrails check
+    is_safe, reason = check_guardrails(last_user_message)
+    if not is_safe:
+        raise HTTPException(status_code=400, detail=f"Security check failed: {reason}")
+    return last_user_message
+
+
+async def embed_question(question: str) -> list:
+    """Embed the question once; the vector serves both the answer cache and retrieval."""
+    with tracing.span("chat.embed"):
+        return await run_blocking("embeddings", get_embeddings().embed_query, question)
+
+
+async def retrieve_context(document_id: str, question: str, question_vector: list) -> list:
+    """Retrieve the chunks of one document most relevant to the question (vector + keyword)."""
+    with tracing.span("chat.retrieve") as current:
+        per_query = await run_blocking(
+            "chroma",
+            retrieval.search_by_vectors,
+            [question],
+            [question_vector],
             k=8,  # Increased from 3 to 8 for better coverage
-            filter={"source": request.document_id}
+            where={"source": document_id}
         )
-        
-        context = "\n\n".join([doc.page_content for doc in results])
-        
-        if not context:
-            return {
-                "response": "I don't have any information about this document in my database. Please make sure the document has been ingested first.",
-                "sources": []
-            }
-        
-        # 3. Build conversation history for context
-        conversation_history = ""
-        for msg in request.messages[-5:]:  # Last 5 messages for context
-            conversation_history += f"{msg.role.upper()}: {msg.content}\n"
-        
-        # 4. Create enhanced prompt with better retrieval instructions
-        system_prompt = f"""You are an expert investment analyst AI assistant reviewing pitch decks and investment documents.
+        current.set(chunks=len(per_query[0]))
+    return per_query[0]
+
+
+def build_chat_context(document_id: str, results: list) -> str:
+    """Excerpts for the prompt, optionally led by the precomputed document summary (CHAT_CONTEXT_MODE)."""
+    mode = summaries.CHAT_CONTEXT_MODE
+    if mode != "chunks" and results:
+        entry = document_catalog.get_file(document_id)
+        document_summaries = summaries.get_summaries(document_id, entry["file_hash"] if entry else None)
+        overview = document_summaries.get("document", {}).get("overview")
+        if overview and mode == "summaries":
+            topics = "\n\n".join(f"{t.upper()} SUMMARY:\n{s}" for t, s in document_summaries.get("topic", {}).items())
+            return f"DOCUMENT SUMMARY:\n{overview}\n\n{topics}"
+        if overview:
+            excerpts = "\n\n".join([doc.page_content for doc in results[:4]])
+            return f"DOCUMENT SUMMARY:\n{overview}\n\n{excerpts}"
+    return "\n\n".join([doc.page_content for doc in results])
+
+
+CHAT_INSTRUCTIONS = """You are an expert investment analyst AI assistant reviewing pitch decks and investment documents.
 
 CRITICAL INSTRUCTIONS FOR RETRIEVAL:
 The excerpts below are from different sections of the pitch deck. They may be partial or spread across sections.
@@ -121,36 +139,193 @@ RESPONSE GUIDELINES:
 3. Be comprehensive - use all relevant information from different excerpts
 4. Always provide citations to specific excerpts
 5. If truly missing info, explicitly state what's not in the excerpts
-6. Format your response clearly with bullet points or paragraphs as appropriate
+6. Format your response clearly with bullet points or paragraphs as appropriate"""
 
-EXCERPTS FROM PITCH DECK:
-{context}
 
-PREVIOUS CONVERSATION:
+def build_chat_turn(request: ChatRequest, last_user_message: str) -> str:
+    # Build conversation history for context
+    conversation_history = ""
+    for msg in request.messages[-5:]:  # Last 5 messages for context
+        conversation_history += f"{msg.role.upper()}: {msg.content}\n"
+
+    return f"""PREVIOUS CONVERSATION:
 {conversation_history}
 
 USER QUESTION: {last_user_message}
 
 Based on the excerpts above, provide a comprehensive and well-synthesized answer:"""
+
+
+def build_chat_prompt(request: ChatRequest, context: str, last_user_message: str, prefix=None) -> str:
+    """Full prompt, or only the per-turn suffix when the document prefix is reused (context_cache)."""
+    if prefix is not None:
+        additional = f"ADDITIONAL EXCERPTS FROM PITCH DECK:\n{context}\n\n" if context else ""
+        return additional + build_chat_turn(request, last_user_message)
+    # Create enhanced prompt with better retrieval instructions
+    return f"""{CHAT_INSTRUCTIONS}
+
+EXCERPTS FROM PITCH DECK:
+{context}
+
+{build_chat_turn(request, last_user_message)}"""
+
+
+async def get_chat_prefix(document_id: str):
+    """The document's reusable chat prefix, or None (disabled, nothing ingested, or build failure)."""
+    try:
+        with tracing.span("chat.prefix"):
+            prefix = await context_cache.get_prefix(document_id, "chat", CHAT_INSTRUCTIONS, model)
+    except Exception as e:
+        print(f"[CHAT] Context prefix unavailable for {document_id}: {e}")
+        return None
+    return prefix if prefix is not None and prefix.core else None
+
+
+def build_turn_context(document_id: str, results: list, prefix) -> str:
+    if prefix is not None:
+        return "\n\n".join(doc.page_content for doc in context_cache.extra_chunks(prefix, results))
+    return build_chat_context(document_id, results)
+
+
+def lookup_answer(document_id: str, question_vector: list, history: str):
+    with tracing.span("chat.cache_lookup") as current:
+        cached_answer = chat_cache.lookup(document_id, question_vector, history)
+        current.set(hit=cached_answer is not None)
+    return cached_answer
+
+
+def needs_disclaimer(response_text: str) -> bool:
+    """Post-processing check for hallucination indicators."""
+    return any(phrase.lower() in response_text.lower() for phrase in HALLUCINATION_PHRASES)
+
+
+def extract_sources(results: list) -> list:
+    return [{"page": doc.metadata.get("page", "unknown")} for doc in results]
+
+
+@router.post("/chat")
+async def chat_with_document(request: ChatRequest):
+    try:
+        started = time.perf_counter()
+
+        # 1. Validate + guardrails
+        last_user_message = get_last_user_message(request)
+
+        # 2. Semantic answer cache (same deck, near-identical question, same conversation window)
+        question_vector = await embed_question(last_user_message)
+        history = chat_cache.history_key(request.messages)
+        cached_answer = lookup_answer(request.document_id, question_vector, history)
+        if cached_answer:
+            return {"response": cached_answer["response"], "sources": cached_answer["sources"], "cached": True}
+        
+        # 3. Retrieve context from ChromaDB
+        results = await retrieve_context(request.document_id, last_user_message, question_vector)
+        
+        prefix = await get_chat_prefix(request.document_id) if results else None
+        context = build_turn_context(request.document_id, results, prefix)
+        
+        if not context and prefix is None:
+            return {
+                "response": NO_CONTEXT_RESPONSE,
+                "sources": [],
+                "cached": False
+            }
+        
+        # 4. Build prompt with conversation history
+        system_prompt = build_chat_prompt(request, context, last_user_message, prefix)
         
         # 5. Call Gemini
-        response = model.generate_content(system_prompt)
+        with tracing.span("chat.generate", prefix=prefix is not None):
+            if prefix is not None:
+                response = await context_cache.generate(model, prefix, system_prompt)
+            else:
+                response = await generate_content_async(model, system_prompt)
         
         # 6. Post-processing check for hallucination indicators
         response_text = response.text
-        hallucination_phrases = ["I think", "probably", "might be", "I'm not sure but", "based on general knowledge"]
-        
-        if any(phrase.lower() in response_text.lower() for phrase in hallucination_phrases):
-            # Add disclaimer
-            response_text += "\n\n⚠️ Note: Some parts of this response may be uncertain. Please verify critical information."
-        
-        # Extract source pages from context
-        sources = [{"page": doc.metadata.get("page", "unknown")} for doc in results]
+        if needs_disclaimer(response_text):
+            response_text += HALLUCINATION_DISCLAIMER
         
-        return {
+        answer = {
             "response": response_text,
-            "sources": sources
+            "sources": extract_sources(results)
         }
+        chat_cache.store(request.document_id, question_vector, history, answer, (time.perf_counter() - started) * 1000)
+        return {**answer, "cached": False}
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+@router.post("/chat/stream")
+async def chat_with_document_stream(request: ChatRequest):
+    """
+    Server-Sent Events variant of /chat.
+    Emits `sources` first, then one `token` event per generated chunk, and
+    finishes with `done` carrying the full response after the hallucination
+    post-check. Failures mid-stream are reported as an `error` event.
+    """
+    last_user_message = get_last_user_message(request)
+
+    async def event_stream():
+        started = time.perf_counter()
+        try:
+            question_vector = await embed_question(last_user_message)
+            history = chat_cache.history_key(request.messages)
+            cached_answer = lookup_answer(request.document_id, question_vector, history)
+            if cached_answer:
+                yield _sse("sources", {"sources": cached_answer["sources"]})
+                yield _sse("token", {"text": cached_answer["response"]})
+                yield _sse("done", {"response": cached_answer["response"], "cached": True,
+                                    "total_ms": (time.perf_counter() - started) * 1000})
+                return
+
+            results = await retrieve_context(request.document_id, last_user_message, question_vector)
+            prefix = await get_chat_prefix(request.document_id) if results else None
+            context = build_turn_context(request.document_id, results, prefix)
+            yield _sse("sources", {"sources": extract_sources(results)})
+
+            if not context and prefix is None:
+                yield _sse("done", {"response": NO_CONTEXT_RESPONSE, "disclaimer": False, "cached": False})
+                return
+
+            system_prompt = build_chat_prompt(request, context, last_user_message, prefix)
+            generation_started = time.perf_counter()
+            first_token_at = None
+            parts = []
+            tokens = context_cache.stream(model, prefix, system_prompt) if prefix is not None else stream_content_async(model, system_prompt)
+            with tracing.span("chat.generate", prefix=prefix is not None, stream=True) as current:
+                async for text in tokens:
+                    if first_token_at is None:
+                        first_token_at = time.perf_counter()
+                        current.set(ttft_ms=round((first_token_at - generation_started) * 1000, 1))
+                    parts.append(text)
+                    yield _sse("token", {"text": text})
+
+            response_text = "".join(parts)
+            disclaimer = needs_disclaimer(response_text)
+            if disclaimer:
+                response_text += HALLUCINATION_DISCLAIMER
+                yield _sse("token", {"text": HALLUCINATION_DISCLAIMER})
+
+            finished = time.perf_counter()
+            ttft_ms = (first_token_at - generation_started) * 1000 if first_token_at else None
+            total_ms = (finished - started) * 1000
+            print(f"[CHAT] stream document={request.document_id} ttft_ms={ttft_ms if ttft_ms is None else round(ttft_ms, 1)} total_ms={round(total_ms, 1)}")
+            chat_cache.store(request.document_id, question_vector, history,
+                             {"response": response_text, "sources": extract_sources(results)}, total_ms)
+            yield _sse("done", {"response": response_text, "disclaimer": disclaimer, "cached": False, "ttft_ms": ttft_ms, "total_ms": total_ms})
+
+        except Exception as e:
+            print(f"[CHAT] stream error: {e}")
+            yield _sse("error", {"detail": str(e)})
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
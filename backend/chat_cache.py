@@ -0,0 +1,118 @@
+"""
+Semantic answer cache for /chat.
+Scoped per document: a new question reuses a prior answer when its
+embedding (the one already computed for retrieval) is close enough to a
+cached question asked with the same preceding conversation window.
+"""
+
+import hashlib
+import os
+import threading
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+
+import analysis_cache
+
+CHAT_CACHE_ENABLED = os.getenv("CHAT_CACHE_ENABLED", "1") != "0"
+CHAT_CACHE_SIMILARITY = float(os.getenv("CHAT_CACHE_SIMILARITY", "0.95"))
+CHAT_CACHE_MAX_PER_DOCUMENT = int(os.getenv("CHAT_CACHE_MAX_PER_DOCUMENT", "200"))
+CHAT_CACHE_TTL_SECONDS = float(os.getenv("CHAT_CACHE_TTL_SECONDS", str(24 * 3600)))
+
+
+class _DocumentEntries:
+    """Cached answers for one document version, with a stacked matrix of normalized question vectors."""
+
+    def __init__(self, version: str):
+        self.version = version
+        self.entries: List[dict] = []
+        self.matrix: Optional[np.ndarray] = None
+
+    def rebuild(self):
+        self.matrix = np.stack([e["vector"] for e in self.entries]) if self.entries else None
+
+
+_documents: Dict[str, _DocumentEntries] = {}
+_lock = threading.Lock()
+_stats = {"lookups": 0, "hits": 0, "stores": 0, "saved_latency_ms": 0.0}
+
+
+def history_key(messages: list) -> str:
+    """Hash of the conversation window preceding the final question (empty for a first turn)."""
+    window = messages[-5:]
+    prior = window[:-1] if window and window[-1].role == "user" else window
+    text = "\n".join(f"{m.role}:{m.content}" for m in prior)
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def _normalize(vector) -> np.ndarray:
+    array = np.asarray(vector, dtype=np.float32)
+    norm = np.linalg.norm(array)
+    return array / norm if norm else array
+
+
+def _entries_for(document_id: str) -> _DocumentEntries:
+    # A re-ingested deck starts with an empty cache
+    version = analysis_cache.document_version(document_id)
+    entries = _documents.get(document_id)
+    if entries is None or entries.version != version:
+        entries = _DocumentEntries(version)
+        _documents[document_id] = entries
+    return entries
+
+
+def lookup(document_id: str, question_vector, history: str) -> Optional[dict]:
+    """Return the best cached answer above the similarity threshold, or None."""
+    if not CHAT_CACHE_ENABLED:
+        return None
+    query = _normalize(question_vector)
+    now = time.time()
+    with _lock:
+        _stats["lookups"] += 1
+        entries = _entries_for(document_id)
+        live = [e for e in entries.entries if now - e["created_at"] <= CHAT_CACHE_TTL_SECONDS]
+        if len(live) != len(entries.entries):
+            entries.entries = live
+            entries.rebuild()
+        if entries.matrix is None or entries.matrix.shape[1] != query.shape[0]:
+            return None
+
+        scores = entries.matrix @ query
+        for index in np.argsort(-scores):
+            if scores[index] < CHAT_CACHE_SIMILARITY:
+                break
+            entry = entries.entries[index]
+            if entry["history"] == history:
+                _stats["hits"] += 1
+                _stats["saved_latency_ms"] += entry["latency_ms"]
+                return {**entry["answer"], "similarity": float(scores[index])}
+    return None
+
+
+def store(document_id: str, question_vector, history: str, answer: dict, latency_ms: float):
+    if not CHAT_CACHE_ENABLED:
+        return
+    with _lock:
+        entries = _entries_for(document_id)
+        entries.entries.append({
+            "vector": _normalize(question_vector),
+            "history": history,
+            "answer": answer,
+            "latency_ms": latency_ms,
+            "created_at": time.time(),
+        })
+        if len(entries.entries) > CHAT_CACHE_MAX_PER_DOCUMENT:
+            entries.entries = entries.entries[-CHAT_CACHE_MAX_PER_DOCUMENT:]
+        entries.rebuild()
+        _stats["stores"] += 1
+
+
+def stats() -> dict:
+    return {
+        **_stats,
+        "hit_rate": round(_stats["hits"] / _stats["lookups"], 4) if _stats["lookups"] else 0.0,
+        "avg_saved_latency_ms": round(_stats["saved_latency_ms"] / _stats["hits"], 1) if _stats["hits"] else 0.0,
+        "documents": len(_documents),
+        "threshold": CHAT_CACHE_SIMILARITY,
+    }
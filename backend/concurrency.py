@@ -0,0 +1,170 @@
+"""
+Async execution layer for blocking backends.
+Routes await Chroma and embeddings through these helpers (Gemini through
+llm_client, which builds on them) so a slow call never stalls the uvicorn
+event loop. Each backend gets its own bounded thread pool and an asyncio
+semaphore sized from the environment.
+"""
+
+import asyncio
+import contextvars
+import functools
+import os
+import random
+import threading
+import time
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from typing import Any, Callable, Dict, Optional
+
+# Max in-flight calls per backend (configurable per deployment)
+BACKEND_LIMITS: Dict[str, int] = {
+    "gemini": int(os.getenv("GEMINI_MAX_CONCURRENCY", "8")),
+    "chroma": int(os.getenv("CHROMA_MAX_CONCURRENCY", "4")),
+    "embeddings": int(os.getenv("EMBEDDINGS_MAX_CONCURRENCY", "4")),
+    "research": int(os.getenv("RESEARCH_MAX_CONCURRENCY", "2")),  # companies researched at once
+}
+DEFAULT_LIMIT = 4
+
+# Shared Gemini request budget (token bucket) and 429 retry policy
+GEMINI_REQUESTS_PER_MINUTE = float(os.getenv("GEMINI_REQUESTS_PER_MINUTE", "600"))  # 0 disables
+GEMINI_BURST = int(os.getenv("GEMINI_BURST", "10"))
+GEMINI_MAX_RETRIES = int(os.getenv("GEMINI_MAX_RETRIES", "3"))
+GEMINI_RETRY_BASE_SECONDS = float(os.getenv("GEMINI_RETRY_BASE_SECONDS", "1.0"))
+
+_executors: Dict[str, ThreadPoolExecutor] = {}
+_executor_lock = threading.Lock()
+# Semaphores are bound to the loop that first uses them
+_semaphores: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, asyncio.Semaphore]]" = weakref.WeakKeyDictionary()
+_thread_loops = threading.local()
+
+
+def get_limit(backend: str) -> int:
+    return BACKEND_LIMITS.get(backend, DEFAULT_LIMIT)
+
+
+def get_executor(backend: str) -> ThreadPoolExecutor:
+    executor = _executors.get(backend)
+    if executor is None:
+        with _executor_lock:
+            executor = _executors.get(backend)
+            if executor is None:
+                executor = ThreadPoolExecutor(
+                    max_workers=get_limit(backend),
+                    thread_name_prefix=f"{backend}-pool",
+                )
+                _executors[backend] = executor
+    return executor
+
+
+def _get_semaphore(backend: str) -> asyncio.Semaphore:
+    loop = asyncio.get_running_loop()
+    per_loop = _semaphores.setdefault(loop, {})
+    semaphore = per_loop.get(backend)
+    if semaphore is None:
+        semaphore = asyncio.Semaphore(get_limit(backend))
+        per_loop[backend] = semaphore
+    return semaphore
+
+
+@asynccontextmanager
+async def limit(backend: str):
+    """Hold one of the backend's concurrency slots for the duration of the block."""
+    async with _get_semaphore(backend):
+        yield
+
+
+async def run_blocking(backend: str, fn: Callable[..., Any], *args, **kwargs) -> Any:
+    """Run a synchronous call on the backend's thread pool without blocking the loop."""
+    loop = asyncio.get_running_loop()
+    ctx = contextvars.copy_context()
+    call = functools.partial(ctx.run, fn, *args, **kwargs)
+    async with limit(backend):
+        return await loop.run_in_executor(get_executor(backend), call)
+
+
+def run_sync(coro) -> Any:
+    """
+    Run a coroutine to completion from synchronous code (job handlers in
+    worker processes). Unlike asyncio.run, each thread keeps one loop across
+    calls: the Gemini SDK's cached async client is a gRPC-aio channel bound to
+    the loop that first used it, so closing the loop after one job would break
+    every later job's Gemini calls in the same worker.
+    """
+    loop = getattr(_thread_loops, "loop", None)
+    if loop is None or loop.is_closed():
+        loop = _thread_loops.loop = asyncio.new_event_loop()
+    return loop.run_until_complete(coro)
+
+
+class TokenBucket:
+    """
+    Process-wide request budget: `rate` tokens per second, up to `capacity`
+    banked. Shared by every event loop and thread in the process.
+    """
+
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = max(1, capacity)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _reserve(self) -> float:
+        """Take one token, returning how long the caller must wait for it."""
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= 1
+            return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+    async def acquire(self):
+        if self.rate <= 0:
+            return
+        wait = self._reserve()
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+
+gemini_bucket = TokenBucket(GEMINI_REQUESTS_PER_MINUTE / 60.0, GEMINI_BURST)
+
+
+def is_rate_limited(error: Exception) -> bool:
+    """True for quota / 429 errors from the Gemini SDK."""
+    try:
+        from google.api_core.exceptions import ResourceExhausted
+        if isinstance(error, ResourceExhausted):
+            return True
+    except ImportError:
+        pass
+    return getattr(error, "code", None) == 429 or "429" in str(error)
+
+
+async def with_rate_limit_retry(call: Callable[[], Any], retries: Optional[int] = None,
+                                base_delay: Optional[float] = None,
+                                retryable: Callable[[Exception], bool] = is_rate_limited) -> Any:
+    """Await `call()` under the shared token bucket, retrying 429s (or any `retryable` error) with full-jitter exponential backoff."""
+    retries = GEMINI_MAX_RETRIES if retries is None else retries
+    base_delay = GEMINI_RETRY_BASE_SECONDS if base_delay is None else base_delay
+    for attempt in range(retries + 1):
+        await gemini_bucket.acquire()
+        try:
+            return await call()
+        except Exception as e:
+            if attempt >= retries or not retryable(e):
+                raise
+            delay = random.uniform(0, base_delay * (2 ** attempt))
+            reason = "Rate limited" if is_rate_limited(e) else type(e).__name__
+            print(f"[GEMINI] {reason}, retry {attempt + 1}/{retries} in {delay:.1f}s")
+            await asyncio.sleep(delay)
+
+
+def shutdown():
+    """Stop all backend pools (called at application shutdown)."""
+    with _executor_lock:
+        executors = list(_executors.values())
+        _executors.clear()
+    for executor in executors:
+        executor.shutdown(wait=False, cancel_futures=True)
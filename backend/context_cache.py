@@ -0,0 +1,278 @@
+"""
+Per-document prompt prefix reuse for analysis and chat.
+Every /analyze type and every /chat turn for a deck resends the same
+instruction block and largely the same excerpts. Here each (document, purpose)
+gets one stable prefix: the instruction plus the document's core context
+(precomputed summaries when present, then the union of the chunks the four
+analyses retrieve, in page order). Calls send only a short suffix on top.
+
+CONTEXT_CACHE_MODE:
+  auto    Gemini explicit context caching (CachedContent) when the prefix is
+          large enough, else the prefix is sent inline; any caching error falls
+          back to the inline prefix
+  prefix  always inline, laid out so Gemini's implicit prefix caching applies
+  off     legacy prompts
+Entries are keyed by document version, expire after CONTEXT_CACHE_TTL_SECONDS
+(explicit caches are extended while in use) and are deleted on re-ingest.
+"""
+
+import asyncio
+import datetime
+import hashlib
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, Optional, Set
+
+import analysis_cache
+import document_catalog
+import summaries
+import llm_client
+from concurrency import run_blocking
+from llm_client import generate_content_async, stream_content_async
+
+CONTEXT_CACHE_MODE = os.getenv("CONTEXT_CACHE_MODE", "auto").lower()  # auto | prefix | off
+CONTEXT_CACHE_TTL_SECONDS = int(os.getenv("CONTEXT_CACHE_TTL_SECONDS", "3600"))
+# Explicit caches below this size are rejected by the API (and not worth it)
+CONTEXT_CACHE_MIN_TOKENS = int(os.getenv("CONTEXT_CACHE_MIN_TOKENS", "2048"))
+CONTEXT_CACHE_MAX_CHUNKS = int(os.getenv("CONTEXT_CACHE_MAX_CHUNKS", "40"))
+# Extend an explicit cache when a call lands this close to its expiry
+REFRESH_MARGIN_SECONDS = 300
+DISPLAY_NAME_PREFIX = "pitchiq-"
+
+
+@dataclass
+class DocumentPrefix:
+    document_id: str
+    purpose: str
+    text: str                      # instruction + core context, sent inline when not cached
+    instruction: str
+    core: str
+    chunk_ids: Set[str] = field(default_factory=set)
+    expires_at: float = 0.0
+    cached: Any = None             # caching.CachedContent when explicit caching is active
+    cached_model: Any = None
+
+    @property
+    def explicit(self) -> bool:
+        return self.cached is not None
+
+
+_prefixes: Dict[tuple, DocumentPrefix] = {}
+_in_flight: Dict[tuple, asyncio.Task] = {}
+_lock = threading.Lock()
+_stats = {
+    "calls": {"explicit": 0, "prefix": 0},
+    "prompt_tokens": {"explicit": 0, "prefix": 0},
+    "cached_tokens": 0,
+    "latency_ms": {"explicit": 0.0, "prefix": 0.0},
+    "explicit_created": 0,
+    "explicit_failures": 0,
+}
+
+
+def enabled() -> bool:
+    return CONTEXT_CACHE_MODE in ("auto", "prefix")
+
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // 4
+
+
+def _display_name(document_id: str, purpose: str) -> str:
+    return f"{DISPLAY_NAME_PREFIX}{hashlib.sha256(document_id.encode('utf-8')).hexdigest()[:16]}-{purpose}"
+
+
+async def core_chunks(document_id: str) -> list:
+    """The chunks every analysis type retrieves for a deck, deduplicated and in page order."""
+    import agents  # Deferred: agents builds its prompts on top of this module
+
+    results_by_type = await agents.retrieve_for_types(document_id, list(agents.ANALYSIS_TASKS))
+    chunks = agents._dedupe_results(results_by_type.values())[:CONTEXT_CACHE_MAX_CHUNKS]
+    return sorted(chunks, key=lambda doc: (int(doc.metadata.get("page", 0) or 0), doc.id))
+
+
+def _core_text(document_id: str, chunks: list) -> str:
+    parts = []
+    entry = document_catalog.get_file(document_id)
+    summary = summaries.summary_context(document_id, entry["file_hash"] if entry else None)
+    if summary:
+        parts.append(summary)
+    parts.extend(f"[Excerpt {i}, page {doc.metadata.get('page', 'unknown')}]\n{doc.page_content}" for i, doc in enumerate(chunks, 1))
+    return "\n\n".join(parts)
+
+
+async def get_prefix(document_id: str, purpose: str, instruction: str, base_model) -> Optional[DocumentPrefix]:
+    """Return (building once, concurrently shared) the prefix for a document and purpose."""
+    if not enabled():
+        return None
+    key = (document_id, purpose, analysis_cache.document_version(document_id),
+           hashlib.sha256(instruction.encode("utf-8")).hexdigest()[:12])
+    prefix = _prefixes.get(key)
+    if prefix is not None and time.time() < prefix.expires_at:
+        if prefix.explicit and prefix.expires_at - time.time() < REFRESH_MARGIN_SECONDS:
+            await _extend(prefix)
+        return prefix
+
+    task = _in_flight.get(key)
+    if task is None:
+        # Its own task, so a caller going away doesn't cancel the build for the others
+        task = asyncio.ensure_future(_build_prefix(key, document_id, purpose, instruction, base_model))
+        _in_flight[key] = task
+        task.add_done_callback(lambda done: _finished(key, done))
+    return await asyncio.shield(task)
+
+
+async def _build_prefix(key: tuple, document_id: str, purpose: str, instruction: str, base_model) -> DocumentPrefix:
+    chunks = await core_chunks(document_id)
+    core = _core_text(document_id, chunks)
+    prefix = DocumentPrefix(
+        document_id=document_id,
+        purpose=purpose,
+        text=f"{instruction.strip()}\n\nDOCUMENT CONTEXT:\n{core}\n\n",
+        instruction=instruction,
+        core=core,
+        chunk_ids={doc.id for doc in chunks},
+        expires_at=time.time() + CONTEXT_CACHE_TTL_SECONDS,
+    )
+    if CONTEXT_CACHE_MODE == "auto" and core and estimate_tokens(prefix.text) >= CONTEXT_CACHE_MIN_TOKENS:
+        await _create_explicit(prefix, base_model)
+    with _lock:
+        for stale_key in [k for k in _prefixes if k[:2] == key[:2] and k != key]:
+            _discard(_prefixes.pop(stale_key))
+        _prefixes[key] = prefix
+    return prefix
+
+
+def _finished(key: tuple, task: asyncio.Task):
+    if _in_flight.get(key) is task:
+        del _in_flight[key]
+    # Every caller may have gone; don't log "exception never retrieved"
+    if not task.cancelled():
+        task.exception()
+
+
+def _create_cached_content(model_name: str, display_name: str, instruction: str, core: str):
+    return llm_client.create_cached_content(model_name, display_name, instruction, [core], CONTEXT_CACHE_TTL_SECONDS)
+
+
+def _model_from_cached_content(cached):
+    return llm_client.model_from_cached_content(cached)
+
+
+async def _create_explicit(prefix: DocumentPrefix, base_model):
+    """Upload the prefix as a Gemini CachedContent; on any failure the prefix stays inline."""
+    try:
+        prefix.cached = await run_blocking(
+            "gemini", _create_cached_content, base_model.model_name,
+            _display_name(prefix.document_id, prefix.purpose), prefix.instruction, prefix.core,
+        )
+        prefix.cached_model = _model_from_cached_content(prefix.cached)
+        _stats["explicit_created"] += 1
+    except Exception as e:
+        prefix.cached = prefix.cached_model = None
+        _stats["explicit_failures"] += 1
+        print(f"[CONTEXT_CACHE] Explicit caching unavailable for {prefix.document_id} ({prefix.purpose}): {e}")
+
+
+async def _extend(prefix: DocumentPrefix):
+    try:
+        await run_blocking("gemini", prefix.cached.update, ttl=datetime.timedelta(seconds=CONTEXT_CACHE_TTL_SECONDS))
+        prefix.expires_at = time.time() + CONTEXT_CACHE_TTL_SECONDS
+    except Exception as e:
+        print(f"[CONTEXT_CACHE] Could not extend cache for {prefix.document_id}: {e}")
+        _drop_explicit(prefix)
+
+
+def _drop_explicit(prefix: DocumentPrefix):
+    prefix.cached = prefix.cached_model = None
+
+
+def _discard(prefix: DocumentPrefix):
+    if prefix.explicit:
+        cached = prefix.cached
+        _drop_explicit(prefix)
+        threading.Thread(target=_delete_quietly, args=(cached,), daemon=True).start()
+
+
+def _delete_quietly(cached):
+    try:
+        cached.delete()
+    except Exception:
+        pass
+
+
+def _record(mode: str, response, started: float):
+    _stats["calls"][mode] += 1
+    _stats["latency_ms"][mode] += (time.perf_counter() - started) * 1000
+    usage = getattr(response, "usage_metadata", None)
+    if usage is not None:
+        _stats["prompt_tokens"][mode] += getattr(usage, "prompt_token_count", 0) or 0
+        _stats["cached_tokens"] += getattr(usage, "cached_content_token_count", 0) or 0
+
+
+async def generate(base_model, prefix: Optional[DocumentPrefix], suffix: str, **kwargs):
+    """generate_content_async with the document prefix served from cache (explicit) or inline."""
+    started = time.perf_counter()
+    if prefix is not None and prefix.explicit:
+        cached_model = prefix.cached_model
+        try:
+            response = await generate_content_async(cached_model, suffix, **kwargs)
+            _record("explicit", response, started)
+            return response
+        except Exception as e:
+            # Expired or deleted server-side: fall back to the inline prefix from now on
+            print(f"[CONTEXT_CACHE] Cached call failed for {prefix.document_id}, sending prefix inline: {e}")
+            _drop_explicit(prefix)
+            started = time.perf_counter()
+    response = await generate_content_async(base_model, (prefix.text if prefix else "") + suffix, **kwargs)
+    _record("prefix", response, started)
+    return response
+
+
+def stream(base_model, prefix: Optional[DocumentPrefix], suffix: str, **kwargs):
+    """stream_content_async counterpart of generate (no mid-stream fallback)."""
+    if prefix is not None and prefix.explicit:
+        _stats["calls"]["explicit"] += 1
+        return stream_content_async(prefix.cached_model, suffix, **kwargs)
+    _stats["calls"]["prefix"] += 1
+    return stream_content_async(base_model, (prefix.text if prefix else "") + suffix, **kwargs)
+
+
+def extra_chunks(prefix: Optional[DocumentPrefix], results: list) -> list:
+    """Retrieved chunks not already part of the prefix."""
+    if prefix is None:
+        return results
+    return [doc for doc in results if doc.id not in prefix.chunk_ids]
+
+
+def invalidate_document(document_id: str):
+    """Forget a document's prefixes and delete its explicit caches, including ones made by other processes."""
+    with _lock:
+        for key in [k for k in _prefixes if k[0] == document_id]:
+            _discard(_prefixes.pop(key))
+    if CONTEXT_CACHE_MODE != "auto":
+        return
+    try:
+        marker = _display_name(document_id, "")
+        for cached in llm_client.list_cached_contents():
+            if (cached.display_name or "").startswith(marker):
+                cached.delete()
+    except Exception as e:
+        print(f"[CONTEXT_CACHE] Could not delete remote caches for {document_id}: {e}")
+
+
+def stats() -> dict:
+    calls = _stats["calls"]
+    return {
+        "mode": CONTEXT_CACHE_MODE,
+        "prefixes": len(_prefixes),
+        "explicit_active": sum(1 for p in _prefixes.values() if p.explicit),
+        "explicit_created": _stats["explicit_created"],
+        "explicit_failures": _stats["explicit_failures"],
+        "calls": dict(calls),
+        "avg_prompt_tokens": {m: round(_stats["prompt_tokens"][m] / calls[m], 1) if calls[m] else None for m in calls},
+        "avg_latency_ms": {m: round(_stats["latency_ms"][m] / calls[m], 1) if calls[m] else None for m in calls},
+        "cached_tokens": _stats["cached_tokens"],
+    }
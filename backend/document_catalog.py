@@ -0,0 +1,195 @@
+"""
+Document catalog.
+SQLite index written at ingest time, holding:
+- files: content hash and the content-addressed chunk IDs each file
+  produced, so re-ingesting an unchanged file is a no-op and a changed file
+  only touches the chunks that differ.
+- documents: per-document metadata, chunk counts and upload dates, so
+  listing, filtering and dashboard stats never scan the vector store.
+"""
+
+import datetime
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Dict, List, Optional
+
+from shared_utils import connect_sqlite, get_data_path
+
+CATALOG_DB_PATH = get_data_path("CATALOG_DB_PATH", "catalog.sqlite3")
+
+_conn = None
+_conn_pid = None
+_lock = threading.Lock()
+
+
+def _get_conn():
+    global _conn, _conn_pid
+    if _conn is None or _conn_pid != os.getpid():
+        _conn = connect_sqlite(CATALOG_DB_PATH)
+        _conn.execute(
+            "CREATE TABLE IF NOT EXISTS files ("
+            " source TEXT PRIMARY KEY, file_hash TEXT NOT NULL, metadata TEXT NOT NULL,"
+            " chunk_ids TEXT NOT NULL, updated_at REAL NOT NULL)"
+        )
+        _conn.execute(
+            "CREATE TABLE IF NOT EXISTS documents ("
+            " source TEXT PRIMARY KEY, name TEXT NOT NULL, industry TEXT, geography TEXT, deal_type TEXT,"
+            " upload_date TEXT, chunk_count INTEGER NOT NULL DEFAULT 0, page_count INTEGER,"
+            " file_hash TEXT, updated_at REAL NOT NULL)"
+        )
+        for column in ("industry", "geography", "deal_type", "upload_date"):
+            _conn.execute(f"CREATE INDEX IF NOT EXISTS idx_documents_{column} ON documents ({column})")
+        _conn.commit()
+        _conn_pid = os.getpid()
+    return _conn
+
+
+def hash_file(file_path: str) -> str:
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+# Competitive research for a document is stored under source f"{document_id}{RESEARCH_SOURCE_SUFFIX}"
+RESEARCH_SOURCE_SUFFIX = "_research"
+
+
+def chunk_id(source: str, page, text: str) -> str:
+    """Content-addressed chunk ID: identical text on the same page of the same document maps to the same ID."""
+    return hashlib.sha256(f"{source}\x00{page}\x00{text}".encode("utf-8")).hexdigest()
+
+
+def get_file(source: str) -> Optional[dict]:
+    with _lock:
+        row = _get_conn().execute(
+            "SELECT source, file_hash, metadata, chunk_ids, updated_at FROM files WHERE source = ?", (source,)
+        ).fetchone()
+    if row is None:
+        return None
+    return {
+        "source": row[0],
+        "file_hash": row[1],
+        "metadata": json.loads(row[2]),
+        "chunk_ids": json.loads(row[3]),
+        "updated_at": row[4],
+    }
+
+
+def record_file(source: str, file_hash: str, metadata: dict, chunk_ids: List[str]):
+    with _lock:
+        conn = _get_conn()
+        conn.execute(
+            "INSERT OR REPLACE INTO files (source, file_hash, metadata, chunk_ids, updated_at) VALUES (?, ?, ?, ?, ?)",
+            (source, file_hash, json.dumps(metadata, sort_keys=True), json.dumps(chunk_ids), time.time()),
+        )
+        conn.commit()
+
+
+# --- Document catalog ---
+
+_DOCUMENT_COLUMNS = [
+    "source", "name", "industry", "geography", "deal_type", "upload_date",
+    "chunk_count", "page_count", "file_hash", "updated_at",
+]
+_FILTERS = ("industry", "geography", "deal_type")
+
+
+def upsert_document(source: str, industry: Optional[str], geography: Optional[str], deal_type: Optional[str],
+                    chunk_count: int, page_count: Optional[int] = None, file_hash: Optional[str] = None,
+                    upload_date: Optional[str] = None, name: Optional[str] = None):
+    upload_date = upload_date or datetime.date.today().isoformat()
+    with _lock:
+        conn = _get_conn()
+        conn.execute(
+            f"INSERT OR REPLACE INTO documents ({', '.join(_DOCUMENT_COLUMNS)}) VALUES ({', '.join('?' * len(_DOCUMENT_COLUMNS))})",
+            (source, name or source, industry, geography, deal_type, upload_date,
+             chunk_count, page_count, file_hash, time.time()),
+        )
+        conn.commit()
+
+
+def _where(filters: Dict[str, Optional[str]]):
+    clauses, params = [], []
+    for column in _FILTERS:
+        value = filters.get(column)
+        if value:
+            clauses.append(f"{column} = ?")
+            params.append(value)
+    return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+
+def get_document(source: str) -> Optional[dict]:
+    with _lock:
+        row = _get_conn().execute(
+            f"SELECT {', '.join(_DOCUMENT_COLUMNS)} FROM documents WHERE source = ?", (source,)
+        ).fetchone()
+    return dict(zip(_DOCUMENT_COLUMNS, row)) if row else None
+
+
+def list_documents(limit: Optional[int] = None, offset: int = 0, **filters) -> List[dict]:
+    """Catalog entries, newest first, optionally filtered by industry/geography/deal_type."""
+    where, params = _where(filters)
+    sql = f"SELECT {', '.join(_DOCUMENT_COLUMNS)} FROM documents{where} ORDER BY updated_at DESC"
+    if limit is not None:
+        sql += " LIMIT ? OFFSET ?"
+        params += [limit, offset]
+    with _lock:
+        rows = _get_conn().execute(sql, params).fetchall()
+    return [dict(zip(_DOCUMENT_COLUMNS, row)) for row in rows]
+
+
+def count_documents(**filters) -> int:
+    where, params = _where(filters)
+    with _lock:
+        return _get_conn().execute(f"SELECT COUNT(*) FROM documents{where}", params).fetchone()[0]
+
+
+def stats() -> dict:
+    with _lock:
+        conn = _get_conn()
+        total, chunks = conn.execute("SELECT COUNT(*), COALESCE(SUM(chunk_count), 0) FROM documents").fetchone()
+        industries = conn.execute(
+            "SELECT COUNT(DISTINCT industry) FROM documents WHERE industry IS NOT NULL AND industry != 'Unknown'"
+        ).fetchone()[0]
+    return {"total_documents": total, "industries_covered": industries, "total_chunks": chunks}
+
+
+def backfill_from_collection(collection, page_size: int = 5000) -> int:
+    """
+    One-time import of documents ingested before the catalog existed.
+    Pages through chunk metadata only (no documents or embeddings). Runs
+    only while the catalog is empty. Returns the number of documents added.
+    """
+    if count_documents() > 0:
+        return 0
+    found: Dict[str, dict] = {}
+    offset = 0
+    while True:
+        batch = collection.get(include=["metadatas"], limit=page_size, offset=offset)
+        metadatas = batch.get("metadatas") or []
+        if not metadatas:
+            break
+        for meta in metadatas:
+            source = (meta or {}).get("source")
+            if not source or source.endswith(RESEARCH_SOURCE_SUFFIX):
+                continue  # Research reports share the collection but are not documents
+            entry = found.setdefault(source, {"meta": meta, "chunk_count": 0})
+            entry["chunk_count"] += 1
+        offset += len(metadatas)
+    for source, entry in found.items():
+        meta = entry["meta"]
+        upsert_document(
+            source,
+            industry=meta.get("industry", "Unknown"),
+            geography=meta.get("geography", "Unknown"),
+            deal_type=meta.get("deal_type", "Unknown"),
+            chunk_count=entry["chunk_count"],
+            file_hash=meta.get("file_hash"),
+            upload_date=meta.get("upload_date", "Recently"),
+        )
+    return len(found)
@@ -1,10 +1,9 @@
 
-import os
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Query, Response
 from pydantic import BaseModel
 from typing import List, Optional
-from langchain_chroma import Chroma
-from shared_utils import get_embeddings
+import document_catalog
+from concurrency import run_blocking
 from dotenv import load_dotenv
 import datetime
 
@@ -12,13 +11,6 @@ load_dotenv()
 
 router = APIRouter()
 
-# Use open-source embeddings (lazy loaded)
-# Use persistent storage: env var > /mnt/data > local fallback
-VECTOR_DB_DIR = os.getenv("CHROMA_DB_PATH") or ("/mnt/data/chroma_db" if os.path.exists("/mnt/data") else "./chroma_db")
-
-# Ensure directory exists
-os.makedirs(VECTOR_DB_DIR, exist_ok=True)
-
 class Document(BaseModel):
     id: str
     name: str
@@ -33,14 +25,23 @@ class DashboardStats(BaseModel):
     avg_deal_size: str # Placeholder for now
     risk_flags: int # Placeholder for now
 
+def _to_document(entry: dict) -> Document:
+    return Document(
+        id=entry["source"],
+        name=entry["name"],
+        date=entry["upload_date"] or 'Recently',
+        industry=entry["industry"] or 'Unknown',
+        geography=entry["geography"] or 'Unknown',
+        deal_type=entry["deal_type"] or 'Unknown'
+    )
+
 @router.get("/documents/stats", response_model=DashboardStats)
 async def get_stats():
     try:
-        docs = await get_documents()
-        unique_industries = set(d.industry for d in docs if d.industry != 'Unknown')
+        stats = await run_blocking("catalog", document_catalog.stats)
         return DashboardStats(
-            total_documents=len(docs),
-            industries_covered=len(unique_industries),
+            total_documents=stats["total_documents"],
+            industries_covered=stats["industries_covered"],
             avg_deal_size="$--M",
             risk_flags=0
         )
@@ -49,27 +50,20 @@ async def get_stats():
         return DashboardStats(total_documents=0, industries_covered=0, avg_deal_size="-", risk_flags=0)
 
 @router.get("/documents", response_model=List[Document])
-async def get_documents():
+async def get_documents(
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=1000),
+    offset: int = Query(0, ge=0),
+    industry: Optional[str] = None,
+    geography: Optional[str] = None,
+    deal_type: Optional[str] = None,
+):
+    """List ingested documents from the catalog, newest first. Total matches are returned in X-Total-Count."""
     try:
-        vectordb = Chroma(persist_directory=VECTOR_DB_DIR, embedding_function=get_embeddings())
-        collection_data = vectordb.get()
-        metadatas = collection_data['metadatas']
-
-        unique_docs = {}
-        for meta in metadatas:
-            if not meta: continue
-            source = meta.get('source')
-            if source and source not in unique_docs:
-                unique_docs[source] = Document(
-                    id=source,
-                    name=source,
-                    date=meta.get('upload_date', 'Recently'),
-                    industry=meta.get('industry', 'Unknown'),
-                    geography=meta.get('geography', 'Unknown'),
-                    deal_type=meta.get('deal_type', 'Unknown')
-                )
-
-        return list(unique_docs.values())
+        filters = {"industry": industry, "geography": geography, "deal_type": deal_type}
+        entries = await run_blocking("catalog", document_catalog.list_documents, limit=limit, offset=offset, **filters)
+        response.headers["X-Total-Count"] = str(await run_blocking("catalog", document_catalog.count_documents, **filters))
+        return [_to_document(entry) for entry in entries]
 
     except Exception as e:
         print(f"Error fetching documents: {e}")
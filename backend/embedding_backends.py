@@ -0,0 +1,174 @@
+"""
+Embedding backends, selected per deployment with EMBEDDING_BACKEND:
+  gemini       remote models/gemini-embedding-001 (default, matches existing data)
+  huggingface  all-MiniLM-L6-v2 through sentence-transformers
+  onnx         the same MiniLM through onnxruntime on the CPU, optionally
+               int8-quantized, with dynamic padding and batched inference
+  hashing      feature-hashed bag of words; no model or network, for offline
+               benchmarks and development (lexical similarity only)
+Each backend reports a model id; it namespaces the embedding cache and tags
+the Chroma collections built with it (see vector_store.get_vectordb).
+"""
+
+import hashlib
+import os
+import threading
+from pathlib import Path
+from typing import List
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "gemini").lower()
+GEMINI_EMBEDDING_MODEL = "models/gemini-embedding-001"
+LOCAL_EMBEDDING_MODEL = "all-MiniLM-L6-v2"
+
+# Chroma's bundled MiniLM export (downloaded by chromadb's default embedding function)
+ONNX_MODEL_DIR = os.getenv("ONNX_MODEL_DIR") or str(Path.home() / ".cache" / "chroma" / "onnx_models" / LOCAL_EMBEDDING_MODEL / "onnx")
+ONNX_QUANTIZE = os.getenv("ONNX_QUANTIZE", "1").lower() in ("1", "true", "yes")
+ONNX_THREADS = int(os.getenv("ONNX_THREADS", "0"))  # 0 = onnxruntime default (one per core)
+ONNX_MAX_TOKENS = 256
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "32"))
+HASHING_DIMENSIONS = 384
+
+BACKENDS = ("gemini", "huggingface", "onnx", "hashing")
+
+
+def model_id(backend: str = None) -> str:
+    """Identifier of the vector space a backend produces; both local backends share MiniLM's space."""
+    backend = backend or EMBEDDING_BACKEND
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown EMBEDDING_BACKEND '{backend}' (expected one of {', '.join(BACKENDS)})")
+    if backend == "hashing":
+        return f"hashing-{HASHING_DIMENSIONS}"
+    return GEMINI_EMBEDDING_MODEL if backend == "gemini" else LOCAL_EMBEDDING_MODEL
+
+
+class OnnxMiniLMEmbeddings(Embeddings):
+    """
+    all-MiniLM-L6-v2 on onnxruntime. Texts are sorted by length and padded
+    per batch rather than to the 256-token maximum, tokenization runs in
+    parallel inside `tokenizers`, and onnxruntime spreads each batch over
+    ONNX_THREADS intra-op threads. Output matches sentence-transformers:
+    attention-masked mean pooling followed by L2 normalization.
+    """
+
+    def __init__(self, model_dir: str = ONNX_MODEL_DIR, quantize: bool = ONNX_QUANTIZE,
+                 threads: int = ONNX_THREADS, batch_size: int = EMBEDDING_BATCH_SIZE):
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        model_path = os.path.join(model_dir, "model.onnx")
+        if not os.path.exists(model_path):
+            _download_chroma_model()
+        if quantize:
+            model_path = _quantized_model(model_path)
+
+        self.tokenizer = Tokenizer.from_file(os.path.join(model_dir, "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length=ONNX_MAX_TOKENS)
+        self.tokenizer.enable_padding(pad_id=0, pad_token="[PAD]")
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = ort.InferenceSession(model_path, options, providers=["CPUExecutionProvider"])
+        self.input_names = {i.name for i in self.session.get_inputs()}
+        self.model_path = model_path
+        self.batch_size = batch_size
+
+    def _forward(self, texts: List[str]) -> np.ndarray:
+        encoded = self.tokenizer.encode_batch(texts)
+        input_ids = np.array([e.ids for e in encoded], dtype=np.int64)
+        attention_mask = np.array([e.attention_mask for e in encoded], dtype=np.int64)
+        feeds = {"input_ids": input_ids, "attention_mask": attention_mask}
+        if "token_type_ids" in self.input_names:
+            feeds["token_type_ids"] = np.zeros_like(input_ids)
+        hidden = self.session.run(None, feeds)[0]
+        mask = attention_mask[..., None].astype(np.float32)
+        pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+        norms = np.linalg.norm(pooled, axis=1, keepdims=True)
+        return pooled / np.clip(norms, 1e-12, None)
+
+    def embed_documents(self, texts: List[str], **kwargs) -> List[List[float]]:
+        # Task types (RETRIEVAL_QUERY etc.) are a Gemini concept; MiniLM embeds both sides alike
+        if not texts:
+            return []
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        vectors = np.empty((len(texts), 0), dtype=np.float32)
+        for start in range(0, len(order), self.batch_size):
+            batch = order[start:start + self.batch_size]
+            result = self._forward([texts[i] for i in batch])
+            if vectors.shape[1] == 0:
+                vectors = np.empty((len(texts), result.shape[1]), dtype=np.float32)
+            vectors[batch] = result
+        return vectors.tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+
+class HashingEmbeddings(Embeddings):
+    """Word counts hashed into a fixed-size, L2-normalized vector (deterministic across processes)."""
+
+    def __init__(self, dimensions: int = HASHING_DIMENSIONS):
+        self.dimensions = dimensions
+
+    def _embed(self, text: str) -> List[float]:
+        from bm25_index import tokenize
+        vector = np.zeros(self.dimensions, dtype=np.float32)
+        for term in tokenize(text):
+            digest = hashlib.blake2b(term.encode(), digest_size=8).digest()
+            index = int.from_bytes(digest[:4], "little") % self.dimensions
+            vector[index] += 1.0 if digest[4] & 1 else -1.0
+        norm = np.linalg.norm(vector)
+        return (vector / norm if norm else vector).tolist()
+
+    def embed_documents(self, texts: List[str], **kwargs) -> List[List[float]]:
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed(text)
+
+
+_quantize_lock = threading.Lock()
+
+
+def _quantized_model(model_path: str) -> str:
+    """Dynamic int8 quantization of the MiniLM weights, done once and kept next to the original."""
+    quantized_path = model_path.replace(".onnx", ".int8.onnx")
+    with _quantize_lock:
+        if os.path.exists(quantized_path):
+            return quantized_path
+        try:
+            from onnxruntime.quantization import QuantType, quantize_dynamic
+            quantize_dynamic(model_path, quantized_path, weight_type=QuantType.QInt8)
+            print(f"[EMBEDDINGS] Quantized {model_path} -> {quantized_path}")
+            return quantized_path
+        except Exception as e:
+            # Needs the `onnx` package and a writable model dir; fp32 still works
+            print(f"[EMBEDDINGS] Quantization unavailable ({e}); using fp32 model")
+            return model_path
+
+
+def _download_chroma_model():
+    from chromadb.utils.embedding_functions import ONNXMiniLM_L6_V2
+    ONNXMiniLM_L6_V2()._download_model_if_not_exists()
+
+
+def create_embeddings(backend: str = None) -> Embeddings:
+    """Instantiate the (uncached) LangChain embeddings for a backend."""
+    backend = backend or EMBEDDING_BACKEND
+    model_id(backend)  # validates the name
+    if backend == "onnx":
+        return OnnxMiniLMEmbeddings()
+    if backend == "hashing":
+        return HashingEmbeddings()
+    if backend == "huggingface":
+        from langchain_community.embeddings import HuggingFaceEmbeddings
+        return HuggingFaceEmbeddings(model_name=LOCAL_EMBEDDING_MODEL, encode_kwargs={"batch_size": EMBEDDING_BATCH_SIZE})
+    from langchain_google_genai import GoogleGenerativeAIEmbeddings
+    return GoogleGenerativeAIEmbeddings(
+        model=GEMINI_EMBEDDING_MODEL,
+        google_api_key=os.getenv("GOOGLE_API_KEY"),
+    )
@@ -0,0 +1,157 @@
+"""
+Persistent embedding cache.
+Wraps any LangChain embeddings backend so identical strings are only ever
+embedded once per model: an in-memory LRU sits in front of a SQLite store of
+float32 vectors keyed by model name + text hash.
+"""
+
+import hashlib
+import os
+import threading
+import time
+from array import array
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+from langchain_core.embeddings import Embeddings
+from shared_utils import connect_sqlite, get_data_path
+
+EMBEDDING_CACHE_ENABLED = os.getenv("EMBEDDING_CACHE_ENABLED", "1") != "0"
+EMBEDDING_CACHE_MAX_ITEMS = int(os.getenv("EMBEDDING_CACHE_MAX_ITEMS", "20000"))
+
+
+def _pack(vector: List[float]) -> bytes:
+    return array("f", vector).tobytes()
+
+
+def _unpack(blob: bytes) -> List[float]:
+    vector = array("f")
+    vector.frombytes(blob)
+    return vector.tolist()
+
+
+class EmbeddingCache:
+    """Two-tier (memory LRU + SQLite) store of embedding vectors."""
+
+    def __init__(self, db_path: str, max_items: int = EMBEDDING_CACHE_MAX_ITEMS):
+        self.db_path = db_path
+        self.max_items = max_items
+        self._memory: "OrderedDict[str, List[float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn = connect_sqlite(db_path)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            " key TEXT PRIMARY KEY, model TEXT NOT NULL, dim INTEGER NOT NULL,"
+            " vector BLOB NOT NULL, created_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(model_name: str, kind: str, text: str) -> str:
+        digest = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        return f"{model_name}:{kind}:{digest}"
+
+    def get_many(self, keys: List[str]) -> Dict[str, List[float]]:
+        found: Dict[str, List[float]] = {}
+        with self._lock:
+            missing = []
+            for key in keys:
+                vector = self._memory.get(key)
+                if vector is not None:
+                    self._memory.move_to_end(key)
+                    found[key] = vector
+                    self.memory_hits += 1
+                else:
+                    missing.append(key)
+
+            if missing:
+                placeholders = ",".join("?" * len(missing))
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", missing
+                ).fetchall()
+                for key, blob in rows:
+                    vector = _unpack(blob)
+                    found[key] = vector
+                    self._remember(key, vector)
+                    self.disk_hits += 1
+                self.misses += len(missing) - len(rows)
+        return found
+
+    def put_many(self, model_name: str, items: Dict[str, List[float]]):
+        if not items:
+            return
+        now = time.time()
+        with self._lock:
+            for key, vector in items.items():
+                self._remember(key, vector)
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, model, dim, vector, created_at) VALUES (?, ?, ?, ?, ?)",
+                [(key, model_name, len(vector), _pack(vector), now) for key, vector in items.items()],
+            )
+            self._conn.commit()
+
+    def _remember(self, key: str, vector: List[float]):
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_items:
+            self._memory.popitem(last=False)
+
+    def stats(self) -> dict:
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        return {
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": round((self.memory_hits + self.disk_hits) / lookups, 4) if lookups else 0.0,
+            "memory_items": len(self._memory),
+            "max_items": self.max_items,
+        }
+
+
+class CachedEmbeddings(Embeddings):
+    """LangChain embeddings wrapper that consults an EmbeddingCache before the backend."""
+
+    def __init__(self, base: Embeddings, model_name: str, cache: EmbeddingCache):
+        self.base = base
+        self.model_name = model_name
+        self.cache = cache
+
+    def _embed(self, texts: List[str], kind: str, compute) -> List[List[float]]:
+        keys = [self.cache.make_key(self.model_name, kind, text) for text in texts]
+        found = self.cache.get_many(keys)
+
+        # Embed each distinct missing text once, preserving input order
+        pending: Dict[str, str] = {}
+        for key, text in zip(keys, texts):
+            if key not in found and key not in pending:
+                pending[key] = text
+        if pending:
+            vectors = compute(list(pending.values()))
+            computed = dict(zip(pending.keys(), vectors))
+            self.cache.put_many(self.model_name, computed)
+            found.update(computed)
+
+        return [found[key] for key in keys]
+
+    def embed_documents(self, texts: List[str], **kwargs) -> List[List[float]]:
+        kind = kwargs.get("task_type") or "document"
+        return self._embed(texts, kind, lambda missing: self.base.embed_documents(missing, **kwargs))
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed([text], "query", lambda missing: [self.base.embed_query(missing[0])])[0]
+
+
+_cache: Optional[EmbeddingCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_cache() -> EmbeddingCache:
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = EmbeddingCache(get_data_path("EMBEDDING_CACHE_PATH", "embedding_cache.sqlite3"))
+    return _cache
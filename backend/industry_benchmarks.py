@@ -0,0 +1,178 @@
+"""
+In-process industry benchmark index.
+The knowledge base is a handful of small markdown files
+(industry_knowledge/<industry>/benchmarks.md). They are chunked and embedded
+once with the configured embedding backend, so queries and chunks always share
+one vector space, and searched with a numpy dot product instead of a Chroma
+round trip. Results are memoized per (industry, query); the index rebuilds
+itself when a markdown file changes.
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from shared_utils import get_embeddings, embed_queries
+
+INDUSTRY_KNOWLEDGE_DIR = os.getenv("INDUSTRY_KNOWLEDGE_DIR") or os.path.join(os.path.dirname(os.path.abspath(__file__)), "industry_knowledge")
+# How often lookups re-check file modification times
+INDUSTRY_REFRESH_CHECK_SECONDS = float(os.getenv("INDUSTRY_REFRESH_CHECK_SECONDS", "30"))
+INDUSTRY_MEMO_SIZE = int(os.getenv("INDUSTRY_MEMO_SIZE", "512"))
+NO_BENCHMARKS = "No industry benchmarks available."
+
+
+def simple_chunk_text(text: str, chunk_size: int = 1000, overlap: int = 200) -> list:
+    """Simple text chunking without external dependencies."""
+    chunks = []
+    # Split by double newlines (paragraphs) first
+    paragraphs = text.split('\n\n')
+
+    current_chunk = ""
+    for para in paragraphs:
+        if len(current_chunk) + len(para) < chunk_size:
+            current_chunk += para + "\n\n"
+        else:
+            if current_chunk:
+                chunks.append(current_chunk.strip())
+            current_chunk = para + "\n\n"
+
+    if current_chunk:
+        chunks.append(current_chunk.strip())
+
+    return chunks
+
+
+def iter_knowledge_files(root: str = INDUSTRY_KNOWLEDGE_DIR):
+    """Yield (industry, file_name, path) for every markdown file; industry is the parent directory."""
+    for dirpath, _, files in sorted(os.walk(root)):
+        for name in sorted(files):
+            if name.endswith(".md"):
+                yield os.path.basename(dirpath), name, os.path.join(dirpath, name)
+
+
+def normalize_industry(industry: str) -> str:
+    return industry.lower().strip().replace("-", "").replace(" ", "_").replace("&", "and")
+
+
+def default_query(industry: str) -> str:
+    return f"What are the key benchmarks and metrics for {industry}?"
+
+
+class _Index:
+    def __init__(self, root: str):
+        self.mtimes: Dict[str, float] = {}
+        self.chunks: List[Tuple[str, str]] = []  # (industry, text)
+        for industry, _, path in iter_knowledge_files(root):
+            self.mtimes[path] = os.path.getmtime(path)
+            with open(path, "r", encoding="utf-8") as f:
+                self.chunks.extend((industry, chunk) for chunk in simple_chunk_text(f.read()))
+        self.industries = sorted({industry for industry, _ in self.chunks})
+        self.rows: Dict[str, np.ndarray] = {
+            industry: np.array([i for i, (ind, _) in enumerate(self.chunks) if ind == industry])
+            for industry in self.industries
+        }
+        self.matrix = _normalize(get_embeddings().embed_documents([text for _, text in self.chunks])) if self.chunks else None
+
+    def resolve(self, industry: str) -> Optional[str]:
+        """Exact directory name, else the closest one ("SaaS" -> "saas_tech")."""
+        key = normalize_industry(industry)
+        if not key:
+            # "".startswith would match the first industry
+            return None
+        if key in self.rows:
+            return key
+        for name in self.industries:
+            if name.startswith(key) or key.startswith(name) or key.split("_")[0] in name.split("_"):
+                return name
+        return None
+
+    def search(self, industry: str, query_vector: np.ndarray, k: int) -> List[str]:
+        rows = self.rows[industry]
+        scores = self.matrix[rows] @ query_vector
+        top = rows[np.argsort(-scores)[:k]]
+        return [self.chunks[i][1] for i in top]
+
+    def changed(self, root: str) -> bool:
+        current = {path: os.path.getmtime(path) for _, _, path in iter_knowledge_files(root)}
+        return current != self.mtimes
+
+
+def _normalize(vectors) -> np.ndarray:
+    matrix = np.asarray(vectors, dtype=np.float32)
+    if matrix.ndim == 1:
+        return matrix / max(float(np.linalg.norm(matrix)), 1e-12)
+    return matrix / np.clip(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12, None)
+
+
+_index: Optional[_Index] = None
+_checked_at = 0.0
+_memo: "OrderedDict[Tuple[str, str, int], str]" = OrderedDict()
+_lock = threading.RLock()
+
+
+def load(root: str = INDUSTRY_KNOWLEDGE_DIR) -> int:
+    """(Re)build the index and precompute the default lookup per industry. Returns the chunk count."""
+    global _index, _checked_at
+    if not os.path.isdir(root):
+        # The directory is excluded from some deployment images (.dockerignore)
+        print(f"[BENCHMARKS] No knowledge base at {root}; benchmarks disabled")
+        index = None
+    else:
+        index = _Index(root)
+    with _lock:
+        _index = index
+        _checked_at = time.monotonic()
+        _memo.clear()
+    if index:
+        for industry in index.industries:
+            lookup(industry)
+        print(f"[BENCHMARKS] Indexed {len(index.chunks)} chunks across {len(index.industries)} industries")
+    return len(index.chunks) if index else 0
+
+
+def _refresh_if_changed():
+    global _checked_at
+    with _lock:
+        if time.monotonic() - _checked_at < INDUSTRY_REFRESH_CHECK_SECONDS:
+            return
+        _checked_at = time.monotonic()
+        index = _index
+    try:
+        stale = index.changed(INDUSTRY_KNOWLEDGE_DIR) if index else os.path.isdir(INDUSTRY_KNOWLEDGE_DIR)
+    except OSError:
+        stale = True
+    if stale:
+        print("[BENCHMARKS] Knowledge base changed, reindexing")
+        load()
+
+
+def lookup(industry: str, query: Optional[str] = None, k: int = 5) -> str:
+    """Benchmarks text for an industry, most relevant chunks first."""
+    if _index is None and _checked_at == 0.0:
+        load()
+    _refresh_if_changed()
+    index = _index
+    if index is None:
+        return NO_BENCHMARKS
+    name = index.resolve(industry)
+    if name is None:
+        return NO_BENCHMARKS
+    query = query or default_query(name)
+
+    memo_key = (name, query, k)
+    with _lock:
+        if memo_key in _memo:
+            _memo.move_to_end(memo_key)
+            return _memo[memo_key]
+
+    result = "\n\n".join(index.search(name, _normalize(embed_queries([query])[0]), k))
+    with _lock:
+        if index is _index:
+            _memo[memo_key] = result
+            while len(_memo) > INDUSTRY_MEMO_SIZE:
+                _memo.popitem(last=False)
+    return result
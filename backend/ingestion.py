@@ -1,37 +1,35 @@
 import os
 import shutil
-import tempfile
 import uuid
 import time
 import json
 from typing import Optional
-from fastapi import APIRouter, UploadFile, File, Form, HTTPException, BackgroundTasks
-
-import google.generativeai as genai
-from langchain_chroma import Chroma
-from langchain_core.documents import Document
-from langchain_community.document_loaders import PyPDFLoader
-from langchain_text_splitters import RecursiveCharacterTextSplitter
-from shared_utils import get_embeddings
+from fastapi import APIRouter, UploadFile, File, Form, HTTPException
+
+from pdf_pipeline import count_pages, iter_range_chunks
+from vector_store import VECTOR_DB_DIR, get_vectordb_for_source, mark_written
+from shared_utils import EMBEDDING_MODEL
+from embedding_backends import GEMINI_EMBEDDING_MODEL
+import embedding_cache
+import job_queue
+import bm25_index
+import document_catalog
+import analysis_cache
+import chat_cache
+import context_cache
+import llm_client
+import summaries
+import precompute
+import tracing
+from concurrency import run_sync
 from dotenv import load_dotenv
 
 load_dotenv()
 
 router = APIRouter()
 
-# Configure Gemini
-genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
-model = genai.GenerativeModel('gemini-2.5-flash')
-
-# Persistent storage path
-VECTOR_DB_DIR = os.getenv("CHROMA_DB_PATH") or (
-    "/mnt/data/chroma_db" if os.path.exists("/mnt/data") else "./chroma_db"
-)
-os.makedirs(VECTOR_DB_DIR, exist_ok=True)
-
-# In-memory job status store
-# Format: { job_id: { "status": "pending|processing|done|error", "result": {...}, "error": "..." } }
-JOB_STORE: dict = {}
+# Chunks embedded and upserted per batch during ingestion
+INGEST_EMBED_BATCH_SIZE = int(os.getenv("INGEST_EMBED_BATCH_SIZE", "64"))
 
 
 @router.get("/health")
@@ -43,120 +41,233 @@ async def health_check():
         "status": "ok",
         "chroma_path": chroma_path,
         "chroma_exists": exists,
-        "contents": os.listdir(chroma_path) if exists else []
+        "contents": os.listdir(chroma_path) if exists else [],
+        "embedding_cache": embedding_cache.get_cache().stats() if embedding_cache.EMBEDDING_CACHE_ENABLED else None,
+        "analysis_cache": analysis_cache.stats(),
+        "chat_cache": chat_cache.stats(),
+        "context_cache": context_cache.stats(),
+        "llm": llm_client.stats(),
     }
 
 
-def _run_ingestion(job_id: str, tmp_path: str, filename: str, industry: str, geography: str, deal_type: Optional[str]):
-    """Background task: does the heavy lifting after the HTTP response is sent."""
-    try:
-        JOB_STORE[job_id]["status"] = "processing"
-        JOB_STORE[job_id]["step"] = "Parsing PDF..."
-
-        # Step 1: Load PDF deterministically
-        loader = PyPDFLoader(tmp_path)
-        pages = loader.load()
-
-        if not pages:
-            raise ValueError("Could not extract any text from the PDF file.")
-
-        JOB_STORE[job_id]["step"] = "Chunking text..."
-
-        # Step 2: Split text with overlap to preserve context
-        text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=1500,
-            chunk_overlap=300,
-            length_function=len,
-            is_separator_regex=False,
-        )
-        
-        documents = text_splitter.split_documents(pages)
-
-        # Step 3: Enrich with Metadata
-        for doc in documents:
-            doc.metadata.update({
-                "source": filename,
-                "industry": industry,
-                "geography": geography,
-                "deal_type": deal_type or "N/A"
-            })
-
-        JOB_STORE[job_id]["step"] = "Storing embeddings..."
-
-        # Step 4: Store in ChromaDB
-        Chroma.from_documents(
-            documents=documents,
-            embedding=get_embeddings(),
-            persist_directory=VECTOR_DB_DIR,
-        )
-
-        # Cleanup temp file
-        try:
-            os.unlink(tmp_path)
-        except Exception:
-            pass
-
-        JOB_STORE[job_id]["status"] = "done"
-        JOB_STORE[job_id]["step"] = "Complete"
-        JOB_STORE[job_id]["result"] = {
-            "filename": filename,
-            "status": "Ingested successfully",
-            "chunks_created": len(documents),
-            "metadata": {"industry": industry, "geography": geography},
-        }
+def _iter_batches(file_path: str, total_pages: int, metadata: dict):
+    """Stream enriched chunks with content-addressed IDs in fixed-size batches, yielding (batch, pages_done)."""
+    batch = []
+    pages_done = 0
+    seen_ids = set()
+    for range_end, range_chunks in iter_range_chunks(file_path, total_pages):
+        for doc in range_chunks:
+            doc.metadata.update(metadata)
+            doc.id = document_catalog.chunk_id(metadata["source"], doc.metadata.get("page"), doc.page_content)
+            if doc.id in seen_ids:
+                continue  # Repeated text on the same page
+            seen_ids.add(doc.id)
+            batch.append(doc)
+            if len(batch) >= INGEST_EMBED_BATCH_SIZE:
+                yield batch, pages_done
+                batch = []
+        pages_done = range_end
+    if batch:
+        yield batch, pages_done
+
 
+def _build_summaries(job_id: str, filename: str, file_hash: str, vectordb) -> str:
+    """Optional post-ingest stage. The document is already searchable, so failures here never fail the job."""
+    def on_progress(done: int, total: int):
+        job_queue.update_job(job_id, step=f"Building summaries ({done}/{total})...", summaries_done=done, summaries_total=total)
+
+    try:
+        run_sync(summaries.build_document_summaries(filename, file_hash, vectordb._collection, on_progress))
+        return "built"
+    except job_queue.JobCancelled:
+        return "cancelled"
     except Exception as e:
-        import traceback
-        trace = traceback.format_exc()
-        print(f"[Job {job_id}] Ingestion error: {e}\n{trace}")
-        JOB_STORE[job_id]["status"] = "error"
-        JOB_STORE[job_id]["error"] = str(e)
-        try:
-            os.unlink(tmp_path)
-        except Exception:
-            pass
+        print(f"[Job {job_id}] Summary stage failed: {e}")
+        return "failed"
+
+
+def _run_ingestion(job_id: str, file_path: str, filename: str, industry: str, geography: str, deal_type: Optional[str]) -> dict:
+    """
+    Ingestion job body, executed by an ingestion worker process.
+    Pages stream through the splitter into fixed-size batches; each batch is
+    embedded and upserted as soon as it is ready, so memory stays flat and the
+    document becomes searchable while the rest is still being processed.
+    Chunk IDs are content-addressed: re-ingesting an unchanged file is a no-op
+    and a changed file only embeds the chunks that differ.
+    Raises on failure so the queue can retry.
+    """
+    metadata = {
+        "source": filename,
+        "industry": industry,
+        "geography": geography,
+        "deal_type": deal_type or "N/A"
+    }
+    result = {
+        "filename": filename,
+        "status": "Ingested successfully",
+        "metadata": {"industry": industry, "geography": geography},
+    }
+
+    with tracing.span("ingest.hash"):
+        file_hash = document_catalog.hash_file(file_path)
+    file_metadata = {**metadata, "embedding_model": EMBEDDING_MODEL}
+    previous = document_catalog.get_file(filename)
+    if previous and previous["file_hash"] == file_hash and previous["metadata"] == file_metadata:
+        job_queue.update_job(job_id, step="Unchanged, skipping...", progress=1.0)
+        return {**result, "status": "Already ingested (unchanged)", "chunks_created": 0, "chunks_total": len(previous["chunk_ids"])}
+
+    # Chunks embedded by another model live in that model's collection and must be embedded again
+    same_model = previous and previous["metadata"].get("embedding_model", GEMINI_EMBEDDING_MODEL) == EMBEDDING_MODEL
+    previous_ids = set(previous["chunk_ids"]) if same_model else set()
+    chunk_metadata = {**metadata, "file_hash": file_hash}
+
+    total_pages = count_pages(file_path)
+    job_queue.update_job(job_id, step="Parsing PDF...", progress=0.0, pages_done=0, pages_total=total_pages, chunks_done=0)
+
+    vectordb = get_vectordb_for_source(filename)
+    all_ids = []
+    inserted_ids = []
+    # Readers reopen Chroma on every marker move, so it is touched once per
+    # job (after the last write) rather than per batch
+    try:
+        # Parsing is lazy; "ingest.parse" times producing each batch
+        for batch, pages_done in tracing.traced_iter("ingest.parse", _iter_batches(file_path, total_pages, chunk_metadata)):
+            all_ids.extend(doc.id for doc in batch)
+            new_docs = [doc for doc in batch if doc.id not in previous_ids]
+            kept_docs = [doc for doc in batch if doc.id in previous_ids]
+
+            # Embed + upsert only chunks we have not stored before
+            if new_docs:
+                with tracing.span("ingest.embed_upsert", chunks=len(new_docs)):
+                    inserted_ids.extend(vectordb.add_documents(new_docs, ids=[doc.id for doc in new_docs]))
+            # Unchanged text keeps its vector; only its metadata is refreshed
+            if kept_docs:
+                with tracing.span("ingest.metadata_update", chunks=len(kept_docs)):
+                    vectordb._collection.update(ids=[doc.id for doc in kept_docs], metadatas=[doc.metadata for doc in kept_docs])
+            # Keyword index is cheap to rewrite, which also backfills chunks stored before it existed
+            with tracing.span("ingest.keyword_index", chunks=len(batch)):
+                bm25_index.add_chunks(batch)
+
+            job_queue.update_job(
+                job_id,
+                step=f"Embedding chunks ({len(all_ids)} processed, page {pages_done}/{total_pages})...",
+                progress=pages_done / total_pages if total_pages else 1.0,
+                pages_done=pages_done,
+                chunks_done=len(all_ids),
+                chunks_new=len(inserted_ids),
+            )
+    except BaseException:
+        # Don't leave a half-ingested version behind
+        if inserted_ids:
+            try:
+                vectordb.delete(ids=inserted_ids)
+                bm25_index.delete_chunks(inserted_ids)
+            except Exception as e:
+                print(f"[Job {job_id}] Failed to remove partial chunks: {e}")
+        if all_ids:
+            mark_written()
+        raise
+
+    if not all_ids:
+        raise ValueError("Could not extract any text from the PDF file.")
+
+    # Drop chunks that only existed in the previous version of this file
+    stale_ids = list(previous_ids - set(all_ids))
+    if stale_ids:
+        vectordb.delete(ids=stale_ids)
+        bm25_index.delete_chunks(stale_ids)
+    mark_written()
+
+    document_catalog.record_file(filename, file_hash, file_metadata, all_ids)
+    document_catalog.upsert_document(
+        filename,
+        industry=industry,
+        geography=geography,
+        deal_type=metadata["deal_type"],
+        chunk_count=len(all_ids),
+        page_count=total_pages,
+        file_hash=file_hash,
+    )
+    # Analyses and prompt prefixes of the previous version are keyed to its hash; reclaim their space
+    if previous:
+        analysis_cache.invalidate_document(filename)
+        context_cache.invalidate_document(filename)
+    job_queue.update_job(job_id, step="Finalizing...", progress=1.0, chunks_total=len(all_ids))
+
+    if summaries.INGEST_BUILD_SUMMARIES:
+        with tracing.span("ingest.summaries"):
+            result["summaries"] = _build_summaries(job_id, filename, file_hash, vectordb)
+
+    # Warm the analysis cache in the background; the document is usable now
+    if precompute.INGEST_PRECOMPUTE_ANALYSES:
+        result["precompute_job_id"] = precompute.enqueue_for(filename, job_id)
+
+    return {
+        **result,
+        "pages": total_pages,
+        "chunks_created": len(inserted_ids),
+        "chunks_removed": len(stale_ids),
+        "chunks_total": len(all_ids),
+    }
 
 
 @router.post("/ingest")
 async def ingest_document(
-    background_tasks: BackgroundTasks,
     file: UploadFile = File(...),
     industry: str = Form(...),
     geography: str = Form(...),
     deal_type: Optional[str] = Form(None),
 ):
     """
-    Accepts the upload, saves the file, kicks off a background job,
+    Accepts the upload, saves the file, queues a durable ingestion job,
     and immediately returns a job_id for the client to poll.
     """
     if not file.filename or not file.filename.lower().endswith(".pdf"):
         raise HTTPException(status_code=400, detail="Please upload a PDF file.")
 
-    # Save file to temp location before returning
-    with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp:
-        shutil.copyfileobj(file.file, tmp)
-        tmp_path = tmp.name
-
+    # Save file where every ingestion worker (and a retry after restart) can read it
     job_id = str(uuid.uuid4())
-    JOB_STORE[job_id] = {"status": "pending", "step": "Queued", "result": None, "error": None}
+    file_path = os.path.join(job_queue.UPLOAD_DIR, f"{job_id}.pdf")
+    with open(file_path, "wb") as out:
+        shutil.copyfileobj(file.file, out)
 
-    background_tasks.add_task(
-        _run_ingestion, job_id, tmp_path, file.filename, industry, geography, deal_type
+    job_queue.enqueue(
+        "ingest",
+        {
+            "file_path": file_path,
+            "filename": file.filename,
+            "industry": industry,
+            "geography": geography,
+            "deal_type": deal_type,
+        },
+        job_id=job_id,
     )
 
-    return {"job_id": job_id, "status": "pending"}
+    return {"job_id": job_id, "status": job_queue.PENDING}
 
 
 @router.get("/ingest/status/{job_id}")
 async def ingest_status(job_id: str):
     """Poll this endpoint to check ingestion progress."""
-    job = JOB_STORE.get(job_id)
+    job = job_queue.get_job(job_id)
     if not job:
         raise HTTPException(status_code=404, detail="Job not found.")
     return {
         "job_id": job_id,
-        "status": job["status"],        # pending | processing | done | error
-        "step": job.get("step", ""),
-        "result": job.get("result"),
-        "error": job.get("error"),
+        "status": job["status"],        # pending | processing | done | error | cancelled
+        "step": job["step"] or "",
+        "progress": job["progress"],
+        "details": job["details"],
+        "attempts": job["attempts"],
+        "result": job["result"],
+        "error": job["error"],
     }
+
+
+@router.post("/ingest/cancel/{job_id}")
+async def ingest_cancel(job_id: str):
+    """Cancel a queued job, or ask a running one to stop at its next step."""
+    status = job_queue.request_cancel(job_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail="Job not found.")
+    return {"job_id": job_id, "status": status}
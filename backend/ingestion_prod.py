@@ -1,17 +1,16 @@
 # Simplified ingestion for production deployment (no ChromaDB)
 # Documents are stored in-memory only
 
-import os
-import google.generativeai as genai
+import asyncio
 from fastapi import APIRouter, UploadFile, File, Form, HTTPException
 from typing import Optional
 import json
+import llm_client
+from concurrency import run_blocking
+from llm_client import generate_content_async
 
 router = APIRouter()
 
-# Configure Gemini
-genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
-
 # In-memory storage (will reset on deployment restart)
 DOCUMENTS_STORE = {}
 
@@ -23,13 +22,12 @@ async def upload_pdf(
 ):
     try:
         # Upload to Gemini
-        uploaded_file = genai.upload_file(file.file, mime_type=file.content_type)
+        uploaded_file = await run_blocking("gemini", llm_client.upload_file, file.file, mime_type=file.content_type)
         
-        # Wait for processing
-        import time
+        # Wait for processing without blocking the event loop
         while uploaded_file.state.name == "PROCESSING":
-            time.sleep(2)
-            uploaded_file = genai.get_file(uploaded_file.name)
+            await asyncio.sleep(2)
+            uploaded_file = await run_blocking("gemini", llm_client.get_file, uploaded_file.name)
         
         if uploaded_file.state.name == "FAILED":
             raise ValueError("File processing failed")
@@ -38,8 +36,8 @@ async def upload_pdf(
         document_id = uploaded_file.name.split('/')[-1]
         
         # Extract text using Gemini
-        model = genai.GenerativeModel('gemini-2.0-flash')
-        response = model.generate_content([
+        model = llm_client.get_model('gemini-2.0-flash')
+        response = await generate_content_async(model, [
             uploaded_file,
             "Extract all text content from this pitch deck document. Preserve structure and formatting."
         ])
@@ -0,0 +1,191 @@
+"""
+Ingestion worker pool.
+Claims jobs from the SQLite job queue and runs them in separate processes,
+so PDF parsing and embedding never compete with API request handling.
+
+Run standalone (recommended with several uvicorn workers):
+    python ingestion_worker.py --workers 2
+or let the API start an embedded pool (INGEST_EMBEDDED_WORKERS=1, default).
+"""
+
+import argparse
+import multiprocessing
+import os
+import signal
+import socket
+import threading
+import traceback
+from contextlib import contextmanager
+from typing import List, Optional
+
+import job_queue
+import tracing
+
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", "2"))
+INGEST_EMBEDDED_WORKERS = os.getenv("INGEST_EMBEDDED_WORKERS", "1") != "0"
+POLL_INTERVAL_SECONDS = float(os.getenv("INGEST_POLL_INTERVAL_SECONDS", "1.0"))
+# How often the pool checks for dead workers and orphaned jobs
+SUPERVISE_INTERVAL_SECONDS = float(os.getenv("INGEST_SUPERVISE_INTERVAL_SECONDS", "5.0"))
+
+
+def _handle_ingest(job: dict) -> dict:
+    from ingestion import _run_ingestion
+    return _run_ingestion(job["id"], **job["payload"])
+
+
+def _handle_precompute(job: dict) -> dict:
+    from precompute import run_precompute_job
+    return run_precompute_job(job)
+
+
+# Job kind -> handler(job) returning the result dict
+JOB_HANDLERS = {
+    "ingest": _handle_ingest,
+    "precompute": _handle_precompute,
+}
+
+
+@contextmanager
+def _heartbeat(job_id: str):
+    """Keep the job's heartbeat fresh while it runs, even through long steps without progress updates."""
+    done = threading.Event()
+
+    def beat():
+        while not done.wait(job_queue.JOB_HEARTBEAT_SECONDS):
+            try:
+                job_queue.heartbeat(job_id)
+            except Exception as e:
+                print(f"[Job {job_id}] Heartbeat failed: {e}")
+
+    thread = threading.Thread(target=beat, name=f"heartbeat-{job_id}", daemon=True)
+    thread.start()
+    try:
+        yield
+    finally:
+        done.set()
+        thread.join()
+
+
+def run_job(job: dict):
+    """Execute one claimed job and record its outcome in the queue."""
+    job_id = job["id"]
+    final = True
+    trace = job["payload"].pop("_trace", None)
+    try:
+        with _heartbeat(job_id), tracing.continue_trace(trace), \
+                tracing.span(f"job.{job['kind']}", job_id=job_id, attempt=job["attempts"]):
+            result = JOB_HANDLERS[job["kind"]](job)
+        job_queue.complete(job_id, result)
+    except job_queue.JobCancelled:
+        print(f"[Job {job_id}] Cancelled")
+        job_queue.mark_cancelled(job_id)
+    except Exception as e:
+        print(f"[Job {job_id}] {job['kind']} error (attempt {job['attempts']}): {e}\n{traceback.format_exc()}")
+        final = job_queue.fail(job_id, str(e)) != job_queue.PENDING
+    finally:
+        # Keep the upload around while a retry is still scheduled
+        file_path = job["payload"].get("file_path")
+        if final and file_path:
+            try:
+                os.unlink(file_path)
+            except Exception:
+                pass
+        tracing.flush_metrics()
+
+
+def worker_loop(worker_name: str, stop_event=None):
+    stop_event = stop_event or threading.Event()
+    print(f"[WORKER] {worker_name} started")
+    while not stop_event.is_set():
+        job = job_queue.claim_next(worker_name, kinds=list(JOB_HANDLERS))
+        if job is None:
+            stop_event.wait(POLL_INTERVAL_SECONDS)
+            continue
+        run_job(job)
+    print(f"[WORKER] {worker_name} stopped")
+
+
+def _process_main(worker_name: str, stop_event):
+    # Let the parent coordinate shutdown through stop_event
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    worker_loop(worker_name, stop_event)
+
+
+_processes: List[multiprocessing.Process] = []
+_stop_event = None
+_supervisor: Optional[threading.Thread] = None
+
+
+def _spawn(ctx, worker_name: str, index: int) -> multiprocessing.Process:
+    process = ctx.Process(
+        target=_process_main,
+        args=(worker_name, _stop_event),
+        name=f"ingestion-worker-{index}",
+        # Not daemonic: workers run their own PDF parsing process pool
+        daemon=False,
+    )
+    process.start()
+    return process
+
+
+def _requeue_stale(worker: Optional[str] = None):
+    requeued = job_queue.requeue_stale(worker)
+    if requeued:
+        print(f"[WORKER] Requeued {requeued} stale job(s){f' of {worker}' if worker else ''}")
+
+
+def _supervise(ctx, names: List[str]):
+    """Replace worker processes that exit (OOM, crash) and return orphaned jobs to the queue."""
+    while not _stop_event.wait(SUPERVISE_INTERVAL_SECONDS):
+        for i, process in enumerate(_processes):
+            if process.is_alive() or _stop_event.is_set():
+                continue
+            print(f"[WORKER] {names[i]} exited with code {process.exitcode}, restarting")
+            _requeue_stale(names[i])
+            _processes[i] = _spawn(ctx, names[i], i)
+        # Jobs of workers lost elsewhere (another host or a killed pool) stop heartbeating
+        _requeue_stale()
+
+
+def start_workers(count: int = INGEST_WORKERS) -> List[multiprocessing.Process]:
+    """Start `count` worker processes (the bounded ingestion concurrency), kept running by a supervisor thread."""
+    global _stop_event, _supervisor
+    _requeue_stale()
+    ctx = multiprocessing.get_context("spawn")
+    _stop_event = ctx.Event()
+    prefix = f"{socket.gethostname()}-{os.getpid()}"
+    names = [f"{prefix}-w{i}" for i in range(count)]
+    _processes[:] = [_spawn(ctx, name, i) for i, name in enumerate(names)]
+    _supervisor = threading.Thread(target=_supervise, args=(ctx, names), name="ingestion-supervisor", daemon=True)
+    _supervisor.start()
+    return _processes
+
+
+def stop_workers(timeout: Optional[float] = 10.0):
+    """Ask workers to finish their current job, then terminate stragglers."""
+    if _stop_event is not None:
+        _stop_event.set()
+    if _supervisor is not None:
+        _supervisor.join()
+    for process in _processes:
+        process.join(timeout)
+        if process.is_alive():
+            process.terminate()
+    _processes.clear()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run PitchIQ ingestion workers")
+    parser.add_argument("--workers", type=int, default=INGEST_WORKERS)
+    args = parser.parse_args()
+
+    start_workers(args.workers)
+    try:
+        _supervisor.join()
+    except KeyboardInterrupt:
+        print("[WORKER] Shutting down...")
+        stop_workers()
+
+
+if __name__ == "__main__":
+    main()
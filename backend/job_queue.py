@@ -0,0 +1,244 @@
+"""
+Durable job queue backed by SQLite.
+API workers enqueue jobs and read their status from the same database, so a
+poll returns the same answer whichever uvicorn worker it lands on and
+survives restarts. Jobs are executed by ingestion_worker processes.
+"""
+
+import json
+import os
+import threading
+import time
+import uuid
+from typing import Optional
+
+import tracing
+from shared_utils import connect_sqlite, get_data_path
+
+JOB_DB_PATH = get_data_path("JOB_DB_PATH", "jobs.sqlite3")
+UPLOAD_DIR = get_data_path("UPLOAD_DIR", "uploads")
+os.makedirs(UPLOAD_DIR, exist_ok=True)
+
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+JOB_RETRY_BACKOFF_SECONDS = float(os.getenv("JOB_RETRY_BACKOFF_SECONDS", "5"))
+# Workers heartbeat their running job; one silent for JOB_STALE_SECONDS is assumed orphaned
+JOB_HEARTBEAT_SECONDS = float(os.getenv("JOB_HEARTBEAT_SECONDS", "15"))
+JOB_STALE_SECONDS = float(os.getenv("JOB_STALE_SECONDS", "120"))
+
+# Job status values
+PENDING = "pending"
+PROCESSING = "processing"
+DONE = "done"
+ERROR = "error"
+CANCELLED = "cancelled"
+
+
+class JobCancelled(Exception):
+    """Raised inside a running job once cancellation has been requested."""
+
+
+_conn = None
+_conn_pid = None
+_lock = threading.Lock()
+
+
+def _get_conn():
+    # One connection per process; never reuse one inherited across fork
+    global _conn, _conn_pid
+    if _conn is None or _conn_pid != os.getpid():
+        _conn = connect_sqlite(JOB_DB_PATH)
+        _conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            " id TEXT PRIMARY KEY, kind TEXT NOT NULL, status TEXT NOT NULL,"
+            " step TEXT, progress REAL DEFAULT 0, details TEXT, payload TEXT, result TEXT, error TEXT,"
+            " attempts INTEGER DEFAULT 0, max_attempts INTEGER NOT NULL,"
+            " cancel_requested INTEGER DEFAULT 0, worker TEXT,"
+            " next_run_at REAL NOT NULL, created_at REAL NOT NULL, updated_at REAL NOT NULL)"
+        )
+        _conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_claim ON jobs (status, next_run_at)")
+        _conn.commit()
+        _conn_pid = os.getpid()
+    return _conn
+
+
+_COLUMNS = [
+    "id", "kind", "status", "step", "progress", "details", "payload", "result", "error",
+    "attempts", "max_attempts", "cancel_requested", "worker", "next_run_at",
+    "created_at", "updated_at",
+]
+
+
+def _row_to_job(row) -> dict:
+    job = dict(zip(_COLUMNS, row))
+    job["details"] = json.loads(job["details"]) if job["details"] else {}
+    job["payload"] = json.loads(job["payload"]) if job["payload"] else {}
+    job["result"] = json.loads(job["result"]) if job["result"] else None
+    job["cancel_requested"] = bool(job["cancel_requested"])
+    return job
+
+
+def enqueue(kind: str, payload: dict, max_attempts: int = JOB_MAX_ATTEMPTS, job_id: Optional[str] = None) -> str:
+    job_id = job_id or str(uuid.uuid4())
+    now = time.time()
+    # The worker continues the enqueuing request's trace
+    trace = tracing.inject()
+    if trace:
+        payload = {**payload, "_trace": trace}
+    with _lock:
+        conn = _get_conn()
+        conn.execute(
+            "INSERT INTO jobs (id, kind, status, step, payload, max_attempts, next_run_at, created_at, updated_at)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (job_id, kind, PENDING, "Queued", json.dumps(payload), max_attempts, now, now, now),
+        )
+        conn.commit()
+    return job_id
+
+
+def get_job(job_id: str) -> Optional[dict]:
+    with _lock:
+        row = _get_conn().execute(f"SELECT {', '.join(_COLUMNS)} FROM jobs WHERE id = ?", (job_id,)).fetchone()
+    return _row_to_job(row) if row else None
+
+
+def update_job(job_id: str, step: Optional[str] = None, progress: Optional[float] = None, **extra):
+    """Record progress for a running job. Raises JobCancelled if a cancel was requested."""
+    fields = {"updated_at": time.time()}
+    if step is not None:
+        fields["step"] = step
+    if progress is not None:
+        fields["progress"] = progress
+    if extra:
+        # Free-form progress details (e.g. chunks done/total) are merged, not replaced
+        job = get_job(job_id)
+        details = dict((job or {}).get("details") or {})
+        details.update(extra)
+        fields["details"] = json.dumps(details)
+    assignments = ", ".join(f"{name} = ?" for name in fields)
+    with _lock:
+        conn = _get_conn()
+        conn.execute(f"UPDATE jobs SET {assignments} WHERE id = ?", (*fields.values(), job_id))
+        conn.commit()
+        row = conn.execute("SELECT cancel_requested FROM jobs WHERE id = ?", (job_id,)).fetchone()
+    if row and row[0]:
+        raise JobCancelled(job_id)
+
+
+def claim_next(worker: str, kinds: Optional[list] = None) -> Optional[dict]:
+    """Atomically move the oldest runnable pending job to processing and return it."""
+    now = time.time()
+    kind_filter = ""
+    params: list = [PENDING, now]
+    if kinds:
+        kind_filter = f" AND kind IN ({','.join('?' * len(kinds))})"
+        params.extend(kinds)
+    with _lock:
+        conn = _get_conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                f"SELECT id FROM jobs WHERE status = ? AND next_run_at <= ?{kind_filter}"
+                " ORDER BY created_at LIMIT 1",
+                params,
+            ).fetchone()
+            if row is None:
+                conn.execute("COMMIT")
+                return None
+            conn.execute(
+                "UPDATE jobs SET status = ?, worker = ?, attempts = attempts + 1, updated_at = ? WHERE id = ?",
+                (PROCESSING, worker, now, row[0]),
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+    return get_job(row[0])
+
+
+def complete(job_id: str, result: dict):
+    with _lock:
+        conn = _get_conn()
+        conn.execute(
+            "UPDATE jobs SET status = ?, step = ?, progress = 1, result = ?, error = NULL, updated_at = ? WHERE id = ?",
+            (DONE, "Complete", json.dumps(result), time.time(), job_id),
+        )
+        conn.commit()
+
+
+def fail(job_id: str, error: str) -> str:
+    """Schedule a retry with exponential backoff, or mark the job failed. Returns the new status."""
+    job = get_job(job_id)
+    if job is None:
+        return ERROR
+    now = time.time()
+    if job["attempts"] < job["max_attempts"] and not job["cancel_requested"]:
+        delay = JOB_RETRY_BACKOFF_SECONDS * (2 ** (job["attempts"] - 1))
+        status, step, next_run_at = PENDING, f"Retrying in {int(delay)}s (attempt {job['attempts']} failed)", now + delay
+    else:
+        status, step, next_run_at = ERROR, "Failed", job["next_run_at"]
+    with _lock:
+        conn = _get_conn()
+        conn.execute(
+            "UPDATE jobs SET status = ?, step = ?, error = ?, next_run_at = ?, updated_at = ? WHERE id = ?",
+            (status, step, error, next_run_at, now, job_id),
+        )
+        conn.commit()
+    return status
+
+
+def mark_cancelled(job_id: str):
+    with _lock:
+        conn = _get_conn()
+        conn.execute(
+            "UPDATE jobs SET status = ?, step = ?, updated_at = ? WHERE id = ?",
+            (CANCELLED, "Cancelled", time.time(), job_id),
+        )
+        conn.commit()
+
+
+def request_cancel(job_id: str) -> Optional[str]:
+    """Cancel a pending job immediately, or flag a running one. Returns the resulting status."""
+    with _lock:
+        conn = _get_conn()
+        conn.execute(
+            "UPDATE jobs SET status = ?, step = ?, cancel_requested = 1, updated_at = ? WHERE id = ? AND status = ?",
+            (CANCELLED, "Cancelled", time.time(), job_id, PENDING),
+        )
+        conn.execute(
+            "UPDATE jobs SET cancel_requested = 1, updated_at = ? WHERE id = ? AND status = ?",
+            (time.time(), job_id, PROCESSING),
+        )
+        conn.commit()
+    job = get_job(job_id)
+    return job["status"] if job else None
+
+
+def heartbeat(job_id: str):
+    """Show a running job is still owned by a live worker."""
+    with _lock:
+        conn = _get_conn()
+        conn.execute("UPDATE jobs SET updated_at = ? WHERE id = ? AND status = ?", (time.time(), job_id, PROCESSING))
+        conn.commit()
+
+
+def requeue_stale(worker: Optional[str] = None) -> int:
+    """
+    Return processing jobs abandoned by crashed workers to the queue: those of
+    `worker` when given (known dead), else any without a recent heartbeat.
+    A job that has used all its attempts (e.g. it keeps crashing its worker) fails instead.
+    """
+    now = time.time()
+    owner_filter, params = ("worker = ?", [worker]) if worker else ("updated_at < ?", [now - JOB_STALE_SECONDS])
+    with _lock:
+        conn = _get_conn()
+        cursor = conn.execute(
+            "UPDATE jobs SET"
+            " status = CASE WHEN attempts >= max_attempts THEN ? ELSE ? END,"
+            " step = CASE WHEN attempts >= max_attempts THEN ? ELSE ? END,"
+            " error = CASE WHEN attempts >= max_attempts THEN ? ELSE error END,"
+            f" updated_at = ? WHERE status = ? AND {owner_filter}",
+            (ERROR, PENDING, "Failed", "Requeued after worker loss", "Worker lost while running the job",
+             now, PROCESSING, *params),
+        )
+        conn.commit()
+    return cursor.rowcount
@@ -0,0 +1,395 @@
+"""
+LLM client layer shared by every module that talks to Gemini.
+Modules get their model from get_model(name) and call it through
+generate_content_async / stream_content_async, which add a per-model
+concurrency limit, the shared rate budget, a timeout, retries of rate limits
+and transient errors, and latency/token accounting (stats(), on /health).
+
+LLM_BACKEND:
+  gemini  google.generativeai, configured once; one model object per name is
+          reused, so its async client and connections are too
+  fake    local and deterministic, for offline load tests: JSON requests get
+          schema-valid canned JSON, text requests canned prose, after
+          FAKE_LLM_LATENCY_MS plus FAKE_LLM_MS_PER_1K_TOKENS of prompt
+"""
+
+import asyncio
+import datetime
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+import uuid
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional
+
+import tracing
+from concurrency import BACKEND_LIMITS, get_limit, is_rate_limited, limit, with_rate_limit_retry
+
+LLM_BACKEND = os.getenv("LLM_BACKEND", "gemini").lower()  # gemini | fake
+LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", "120"))  # 0 disables
+FAKE_LLM_LATENCY_MS = float(os.getenv("FAKE_LLM_LATENCY_MS", "300"))
+FAKE_LLM_MS_PER_1K_TOKENS = float(os.getenv("FAKE_LLM_MS_PER_1K_TOKENS", "10"))
+FAKE_LLM_STREAM_CHUNKS = int(os.getenv("FAKE_LLM_STREAM_CHUNKS", "8"))
+FAKE_LLM_CHUNK_MS = float(os.getenv("FAKE_LLM_CHUNK_MS", "20"))
+
+
+def _parse_model_limits(value: str) -> Dict[str, int]:
+    limits = {}
+    for item in value.split(","):
+        name, _, count = item.partition("=")
+        if name.strip() and count.strip():
+            limits[name.strip()] = int(count)
+    return limits
+
+
+# Per-model in-flight calls, e.g. "gemini-2.5-flash=8,gemini-2.0-flash=4"; unlisted models
+# get GEMINI_MAX_CONCURRENCY. All models together stay under the "gemini" limit.
+LLM_MODEL_LIMITS = _parse_model_limits(os.getenv("LLM_MODEL_LIMITS", ""))
+
+_models: Dict[str, Any] = {}
+_models_lock = threading.Lock()
+_configured = False
+_schemas: Dict[str, Any] = {}
+_stats: Dict[str, dict] = {}
+_stats_lock = threading.Lock()
+
+
+def _configure():
+    global _configured
+    if not _configured:
+        import google.generativeai as genai
+        genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
+        _configured = True
+
+
+def get_model(name: str = "gemini-2.5-flash"):
+    """The process-wide model object for `name` on the configured backend."""
+    model = _models.get(name)
+    if model is None:
+        with _models_lock:
+            model = _models.get(name)
+            if model is None:
+                if LLM_BACKEND == "fake":
+                    model = FakeModel(name)
+                else:
+                    import google.generativeai as genai
+                    _configure()
+                    model = genai.GenerativeModel(name)
+                _models[name] = model
+    return model
+
+
+def model_name(model) -> str:
+    return str(getattr(model, "model_name", "gemini")).split("/")[-1]
+
+
+def register_schema(schema):
+    """Make a pydantic response schema known to the fake backend ("Return JSON matching <Name> schema")."""
+    _schemas[schema.__name__] = schema
+    return schema
+
+
+# --- Calls ---
+
+def _limit_key(name: str) -> str:
+    key = f"gemini:{name}"
+    if key not in BACKEND_LIMITS:
+        BACKEND_LIMITS[key] = LLM_MODEL_LIMITS.get(name, get_limit("gemini"))
+    return key
+
+
+def is_transient(error: Exception) -> bool:
+    """Timeouts and server-side errors worth retrying."""
+    if isinstance(error, asyncio.TimeoutError):
+        return True
+    try:
+        from google.api_core import exceptions as api_exceptions
+        if isinstance(error, (api_exceptions.ServiceUnavailable, api_exceptions.InternalServerError,
+                              api_exceptions.DeadlineExceeded)):
+            return True
+    except ImportError:
+        pass
+    return getattr(error, "code", None) in (500, 503, 504)
+
+
+def is_retryable(error: Exception) -> bool:
+    return is_rate_limited(error) or is_transient(error)
+
+
+async def _with_timeout(awaitable):
+    if LLM_TIMEOUT_SECONDS > 0:
+        return await asyncio.wait_for(awaitable, LLM_TIMEOUT_SECONDS)
+    return await awaitable
+
+
+async def generate_content_async(model, *args, **kwargs):
+    """model.generate_content_async under the model's limits, timeout and retry policy."""
+    name = model_name(model)
+    attempts = 0
+
+    async def attempt():
+        nonlocal attempts
+        attempts += 1
+        return await _with_timeout(model.generate_content_async(*args, **kwargs))
+
+    started = time.perf_counter()
+    try:
+        with tracing.span("llm.generate", model=name) as current:
+            async with limit(_limit_key(name)), limit("gemini"):
+                response = await with_rate_limit_retry(attempt, retryable=is_retryable)
+            current.set(attempts=attempts)
+    except Exception as e:
+        _record(name, started, attempts, error=e)
+        raise
+    _record(name, started, attempts, usage=getattr(response, "usage_metadata", None))
+    return response
+
+
+async def stream_content_async(model, *args, **kwargs):
+    """Stream output as text chunks, holding the model's slots until the stream ends."""
+    name = model_name(model)
+    attempts = 0
+    usage = None
+    error = None
+
+    async def attempt():
+        nonlocal attempts
+        attempts += 1
+        return await _with_timeout(model.generate_content_async(*args, stream=True, **kwargs))
+
+    started = time.perf_counter()
+    async with limit(_limit_key(name)), limit("gemini"):
+        try:
+            # Only opening the stream is retried; tokens already sent cannot be taken back
+            response = await with_rate_limit_retry(attempt, retryable=is_retryable)
+            async for chunk in response:
+                usage = getattr(chunk, "usage_metadata", None) or usage
+                try:
+                    text = chunk.text
+                except ValueError:
+                    # Chunks without text parts (e.g. safety or finish metadata)
+                    continue
+                if text:
+                    yield text
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            _record(name, started, attempts, usage=usage, error=error)
+
+
+def _record(name: str, started: float, attempts: int, usage=None, error: Optional[Exception] = None):
+    latency_ms = (time.perf_counter() - started) * 1000
+    with _stats_lock:
+        entry = _stats.setdefault(name, {
+            "calls": 0, "errors": 0, "timeouts": 0, "retries": 0, "latency_ms": 0.0, "max_latency_ms": 0.0,
+            "prompt_tokens": 0, "output_tokens": 0, "cached_tokens": 0,
+        })
+        entry["calls"] += 1
+        entry["retries"] += max(0, attempts - 1)
+        entry["latency_ms"] += latency_ms
+        entry["max_latency_ms"] = max(entry["max_latency_ms"], latency_ms)
+        if error is not None:
+            entry["errors"] += 1
+            if isinstance(error, asyncio.TimeoutError):
+                entry["timeouts"] += 1
+        if usage is not None:
+            entry["prompt_tokens"] += getattr(usage, "prompt_token_count", 0) or 0
+            entry["output_tokens"] += getattr(usage, "candidates_token_count", 0) or 0
+            entry["cached_tokens"] += getattr(usage, "cached_content_token_count", 0) or 0
+
+
+def stats() -> dict:
+    with _stats_lock:
+        models = {
+            name: {
+                **{k: v for k, v in entry.items() if k != "latency_ms"},
+                "avg_latency_ms": round(entry["latency_ms"] / entry["calls"], 1) if entry["calls"] else None,
+                "max_latency_ms": round(entry["max_latency_ms"], 1),
+            }
+            for name, entry in _stats.items()
+        }
+    return {"backend": LLM_BACKEND, "timeout_seconds": LLM_TIMEOUT_SECONDS, "models": models}
+
+
+# --- Files and context caches ---
+
+def upload_file(file, mime_type: Optional[str] = None):
+    if LLM_BACKEND == "fake":
+        return SimpleNamespace(name=f"files/fake-{uuid.uuid4().hex[:12]}", state=SimpleNamespace(name="ACTIVE"))
+    import google.generativeai as genai
+    _configure()
+    return genai.upload_file(file, mime_type=mime_type)
+
+
+def get_file(name: str):
+    if LLM_BACKEND == "fake":
+        return SimpleNamespace(name=name, state=SimpleNamespace(name="ACTIVE"))
+    import google.generativeai as genai
+    _configure()
+    return genai.get_file(name)
+
+
+def create_cached_content(name: str, display_name: str, instruction: str, contents: List[str], ttl_seconds: int):
+    if LLM_BACKEND == "fake":
+        return FakeCachedContent(name, display_name, instruction, contents, ttl_seconds)
+    from google.generativeai import caching
+    _configure()
+    return caching.CachedContent.create(
+        model=name,
+        display_name=display_name,
+        system_instruction=instruction,
+        contents=contents,
+        ttl=datetime.timedelta(seconds=ttl_seconds),
+    )
+
+
+def model_from_cached_content(cached):
+    if LLM_BACKEND == "fake":
+        return FakeModel(model_name(cached), cached_prefix=cached.text)
+    import google.generativeai as genai
+    return genai.GenerativeModel.from_cached_content(cached_content=cached)
+
+
+def list_cached_contents():
+    if LLM_BACKEND == "fake":
+        return list(_fake_caches.values())
+    from google.generativeai import caching
+    _configure()
+    return list(caching.CachedContent.list())
+
+
+# --- Fake backend ---
+
+_fake_caches: Dict[str, "FakeCachedContent"] = {}
+FAKE_TEXT = (
+    "Based on excerpt 1, the company sells a subscription product to mid-market customers. "
+    "Based on excerpt 2, revenue grew year over year with improving gross margins. "
+    "The deck names the founding team and a focused go-to-market plan; "
+    "additional details may exist in other sections of the pitch deck."
+)
+
+
+def _estimate_tokens(text: str) -> int:
+    return len(text) // 4
+
+
+def _prompt_text(contents) -> str:
+    if isinstance(contents, str):
+        return contents
+    if isinstance(contents, (list, tuple)):
+        return "\n".join(part for part in contents if isinstance(part, str))
+    return ""
+
+
+def _json_mode(generation_config) -> bool:
+    if isinstance(generation_config, dict):
+        return generation_config.get("response_mime_type") == "application/json"
+    return getattr(generation_config, "response_mime_type", None) == "application/json"
+
+
+def _example_from_schema(schema: dict, defs: dict, title: str = "value"):
+    if "$ref" in schema:
+        return _example_from_schema(defs[schema["$ref"].split("/")[-1]], defs, title)
+    if "anyOf" in schema:
+        options = [s for s in schema["anyOf"] if s.get("type") != "null"]
+        return _example_from_schema(options[0], defs, title) if options else None
+    kind = schema.get("type")
+    if kind == "array":
+        return [_example_from_schema(schema.get("items", {}), defs, title)]
+    if kind == "object" or "properties" in schema:
+        properties = schema.get("properties")
+        if not properties:
+            return {"name": f"Fake {title}", "value": "N/A"}
+        return {key: _example_from_schema(prop, defs, prop.get("title", key)) for key, prop in properties.items()}
+    if kind == "integer":
+        return 1
+    if kind == "number":
+        return 1.0
+    if kind == "boolean":
+        return True
+    return f"Fake {title}"
+
+
+def _example_from_template(prompt: str):
+    """First JSON object or array spelled out in the prompt, e.g. research_agent's output formats."""
+    decoder = json.JSONDecoder()
+    for match in re.finditer(r"[\[{]", prompt):
+        try:
+            value, _ = decoder.raw_decode(prompt, match.start())
+        except ValueError:
+            continue
+        if isinstance(value, (dict, list)) and value:
+            if isinstance(value, dict) and "array" in prompt.lower():
+                return [value]
+            return value
+    return None
+
+
+def fake_response_text(prompt: str, json_mode: bool) -> str:
+    if not json_mode:
+        return FAKE_TEXT
+    match = re.search(r"matching (\w+) schema", prompt)
+    if match and match.group(1) in _schemas:
+        schema = _schemas[match.group(1)].model_json_schema()
+        return json.dumps(_example_from_schema(schema, schema.get("$defs", {})))
+    example = _example_from_template(prompt)
+    return json.dumps(example if example is not None else {})
+
+
+class FakeModel:
+    """Stands in for genai.GenerativeModel (generate_content_async, count_tokens)."""
+
+    def __init__(self, name: str, cached_prefix: str = ""):
+        self.model_name = f"models/{name}"
+        self.cached_prefix = cached_prefix
+
+    def count_tokens(self, contents):
+        return SimpleNamespace(total_tokens=_estimate_tokens(self.cached_prefix + _prompt_text(contents)))
+
+    async def generate_content_async(self, contents, generation_config=None, stream=False, **kwargs):
+        prompt = _prompt_text(contents)
+        text = fake_response_text(self.cached_prefix + prompt, _json_mode(generation_config))
+        prompt_tokens = _estimate_tokens(prompt)
+        cached_tokens = _estimate_tokens(self.cached_prefix)
+        usage = SimpleNamespace(
+            prompt_token_count=prompt_tokens + cached_tokens,
+            candidates_token_count=_estimate_tokens(text),
+            cached_content_token_count=cached_tokens,
+        )
+        # Cached tokens cost no prefill time
+        await asyncio.sleep((FAKE_LLM_LATENCY_MS + prompt_tokens / 1000 * FAKE_LLM_MS_PER_1K_TOKENS) / 1000)
+        if stream:
+            return self._stream(text, usage)
+        return SimpleNamespace(text=text, candidates=[SimpleNamespace(finish_reason=1)], usage_metadata=usage)
+
+    async def _stream(self, text: str, usage):
+        size = max(1, -(-len(text) // max(1, FAKE_LLM_STREAM_CHUNKS)))
+        pieces = [text[i:i + size] for i in range(0, len(text), size)]
+        for i, piece in enumerate(pieces):
+            if i:
+                await asyncio.sleep(FAKE_LLM_CHUNK_MS / 1000)
+            yield SimpleNamespace(text=piece, usage_metadata=usage if i == len(pieces) - 1 else None)
+
+
+class FakeCachedContent:
+    """In-process stand-in for caching.CachedContent."""
+
+    def __init__(self, name: str, display_name: str, instruction: str, contents: List[str], ttl_seconds: int):
+        self.name = f"cachedContents/fake-{hashlib.sha256((display_name + uuid.uuid4().hex).encode()).hexdigest()[:12]}"
+        self.model = f"models/{name.split('/')[-1]}"
+        self.model_name = self.model
+        self.display_name = display_name
+        self.text = instruction + "\n\n" + "\n\n".join(contents)
+        self.expire_time = time.time() + ttl_seconds
+        _fake_caches[self.name] = self
+
+    def update(self, ttl=None, **kwargs):
+        if ttl is not None:
+            self.expire_time = time.time() + ttl.total_seconds()
+
+    def delete(self):
+        _fake_caches.pop(self.name, None)
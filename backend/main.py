@@ -1,13 +1,41 @@
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 import auth
+import vector_store
+import concurrency
+import ingestion_worker
+import document_catalog
+import industry_benchmarks
+import tracing
 from ingestion import router as ingestion_router
 from agents import router as agents_router
+from agents_intelligence import router as intelligence_router
 from chat import router as chat_router
 from export import router as export_router
 from documents import router as documents_router
+from metrics import router as metrics_router
 
-app = FastAPI(title="Pitchbook Evaluation API")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Open the shared Chroma client once per worker process
+    vector_store.warmup()
+    added = document_catalog.backfill_from_collection(vector_store.get_vectordb()._collection)
+    if added:
+        print(f"[CATALOG] Backfilled {added} document(s) from the vector store")
+    try:
+        await concurrency.run_blocking("embeddings", industry_benchmarks.load)
+    except Exception as e:
+        print(f"[BENCHMARKS] Startup indexing failed, will retry on first lookup: {e}")
+    if ingestion_worker.INGEST_EMBEDDED_WORKERS:
+        ingestion_worker.start_workers()
+    yield
+    ingestion_worker.stop_workers()
+    concurrency.shutdown()
+    vector_store.close()
+
+app = FastAPI(title="Pitchbook Evaluation API", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -26,9 +54,24 @@ app.add_middleware(
 app.include_router(auth.router, prefix="/auth", tags=["Authentication"])
 app.include_router(ingestion_router, prefix="/api", tags=["Ingestion"])
 app.include_router(agents_router, prefix="/api", tags=["Agents"])
+app.include_router(intelligence_router, prefix="/api", tags=["Research"])
 app.include_router(chat_router, prefix="/api", tags=["Chat"])
 app.include_router(export_router, prefix="/api", tags=["Export"])
 app.include_router(documents_router, prefix="/api", tags=["Documents"])
+app.include_router(metrics_router, tags=["Metrics"])
+
+
+@app.middleware("http")
+async def trace_requests(request: Request, call_next):
+    """Root span per request, named by route template; the trace id is returned in X-Trace-Id."""
+    with tracing.span(f"{request.method} unmatched", path=request.url.path) as current:
+        response = await call_next(request)
+        route = request.scope.get("route")
+        if route is not None:
+            current.name = f"{request.method} {route.path}"
+        current.set(status=response.status_code)
+        response.headers["X-Trace-Id"] = current.trace_id
+        return response
 
 @app.get("/")
 async def root():
@@ -0,0 +1,95 @@
+"""
+/metrics: per-stage latency histograms (from tracing spans), cache hit rates
+and LLM usage, in Prometheus text format or as JSON (?format=json).
+"""
+
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+import analysis_cache
+import chat_cache
+import embedding_cache
+import llm_client
+import tracing
+
+router = APIRouter()
+
+
+def cache_stats() -> dict:
+    """Hits and lookups per cache, from each cache's own counters."""
+    caches = {}
+    analysis = analysis_cache.stats()
+    caches["analysis"] = (analysis["memory_hits"] + analysis["disk_hits"],
+                          analysis["memory_hits"] + analysis["disk_hits"] + analysis["misses"])
+    chat = chat_cache.stats()
+    caches["chat"] = (chat["hits"], chat["lookups"])
+    if embedding_cache.EMBEDDING_CACHE_ENABLED:
+        embeddings = embedding_cache.get_cache().stats()
+        caches["embedding"] = (embeddings["memory_hits"] + embeddings["disk_hits"],
+                               embeddings["memory_hits"] + embeddings["disk_hits"] + embeddings["misses"])
+    return {
+        name: {"hits": hits, "lookups": lookups, "hit_rate": round(hits / lookups, 4) if lookups else 0.0}
+        for name, (hits, lookups) in caches.items()
+    }
+
+
+def _label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"')
+
+
+def render_prometheus(histograms: dict, caches: dict, llm: dict) -> str:
+    lines = [
+        "# HELP pitchiq_stage_duration_ms Latency of traced stages in milliseconds.",
+        "# TYPE pitchiq_stage_duration_ms histogram",
+    ]
+    for stage in sorted(histograms):
+        histogram = histograms[stage]
+        label = _label(stage)
+        cumulative = 0
+        for bound, count in zip(list(tracing.BUCKETS_MS) + ["+Inf"], histogram["buckets"]):
+            cumulative += count
+            lines.append(f'pitchiq_stage_duration_ms_bucket{{stage="{label}",le="{bound}"}} {cumulative}')
+        lines.append(f'pitchiq_stage_duration_ms_sum{{stage="{label}"}} {histogram["sum"]:.3f}')
+        lines.append(f'pitchiq_stage_duration_ms_count{{stage="{label}"}} {histogram["count"]}')
+    lines += ["# HELP pitchiq_stage_errors_total Traced stages that raised.", "# TYPE pitchiq_stage_errors_total counter"]
+    lines += [f'pitchiq_stage_errors_total{{stage="{_label(s)}"}} {h["errors"]}' for s, h in sorted(histograms.items())]
+
+    lines += ["# HELP pitchiq_cache_hits_total Cache hits.", "# TYPE pitchiq_cache_hits_total counter"]
+    lines += [f'pitchiq_cache_hits_total{{cache="{name}"}} {c["hits"]}' for name, c in caches.items()]
+    lines += ["# HELP pitchiq_cache_lookups_total Cache lookups.", "# TYPE pitchiq_cache_lookups_total counter"]
+    lines += [f'pitchiq_cache_lookups_total{{cache="{name}"}} {c["lookups"]}' for name, c in caches.items()]
+    lines += ["# HELP pitchiq_cache_hit_rate Cache hits per lookup.", "# TYPE pitchiq_cache_hit_rate gauge"]
+    lines += [f'pitchiq_cache_hit_rate{{cache="{name}"}} {c["hit_rate"]}' for name, c in caches.items()]
+
+    lines += ["# HELP pitchiq_llm_calls_total LLM calls per model.", "# TYPE pitchiq_llm_calls_total counter"]
+    lines += [f'pitchiq_llm_calls_total{{model="{_label(m)}"}} {s["calls"]}' for m, s in llm["models"].items()]
+    lines += ["# HELP pitchiq_llm_tokens_total LLM tokens per model and kind.", "# TYPE pitchiq_llm_tokens_total counter"]
+    for model, s in llm["models"].items():
+        for kind in ("prompt", "output", "cached"):
+            lines.append(f'pitchiq_llm_tokens_total{{model="{_label(model)}",kind="{kind}"}} {s[f"{kind}_tokens"]}')
+    return "\n".join(lines) + "\n"
+
+
+@router.get("/metrics")
+async def get_metrics(format: str = "prometheus"):
+    histograms = tracing.collect()
+    caches = cache_stats()
+    llm = llm_client.stats()
+    if format == "json":
+        return {
+            "stages": {
+                stage: {
+                    "count": h["count"],
+                    "errors": h["errors"],
+                    "avg_ms": round(h["sum"] / h["count"], 2) if h["count"] else None,
+                    "p50_ms": tracing.percentile(h, 50),
+                    "p95_ms": tracing.percentile(h, 95),
+                    "p99_ms": tracing.percentile(h, 99),
+                    "buckets_ms": dict(zip([str(b) for b in tracing.BUCKETS_MS] + ["+Inf"], h["buckets"])),
+                }
+                for stage, h in sorted(histograms.items())
+            },
+            "caches": caches,
+            "llm": llm,
+        }
+    return PlainTextResponse(render_prometheus(histograms, caches, llm), media_type="text/plain; version=0.0.4")
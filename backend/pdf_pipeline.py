@@ -0,0 +1,123 @@
+"""
+Page-range-parallel PDF extraction and chunking.
+Large pitch books are split into page ranges that are parsed with pypdf and
+chunked in a process pool; results are merged back in page order with the
+same per-page metadata PyPDFLoader produces, so output is deterministic.
+"""
+
+import atexit
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterator, List, Optional, Tuple
+
+from langchain_core.documents import Document
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+from pypdf import PdfReader
+
+CHUNK_SIZE = 1500
+CHUNK_OVERLAP = 300
+
+PDF_PARSE_WORKERS = int(os.getenv("PDF_PARSE_WORKERS", str(os.cpu_count() or 2)))
+PDF_PAGES_PER_TASK = int(os.getenv("PDF_PAGES_PER_TASK", "16"))
+# Smaller documents are parsed inline; the pool only pays off on long decks
+PDF_PARALLEL_MIN_PAGES = int(os.getenv("PDF_PARALLEL_MIN_PAGES", "48"))
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def make_text_splitter() -> RecursiveCharacterTextSplitter:
+    # Split text with overlap to preserve context
+    return RecursiveCharacterTextSplitter(
+        chunk_size=CHUNK_SIZE,
+        chunk_overlap=CHUNK_OVERLAP,
+        length_function=len,
+        is_separator_regex=False,
+    )
+
+
+def count_pages(file_path: str) -> int:
+    return len(PdfReader(file_path).pages)
+
+
+def parse_page_range(file_path: str, start: int, end: int) -> List[Document]:
+    """Extract and chunk pages [start, end). Runs inside pool workers."""
+    reader = PdfReader(file_path)
+    splitter = make_text_splitter()
+    total_pages = len(reader.pages)
+    chunks: List[Document] = []
+    for page_index in range(start, min(end, total_pages)):
+        text = reader.pages[page_index].extract_text() or ""
+        metadata = {
+            "source": file_path,
+            "page": page_index,
+            "page_label": reader.page_labels[page_index] if page_index < len(reader.page_labels) else str(page_index + 1),
+            "total_pages": total_pages,
+        }
+        chunks.extend(splitter.split_documents([Document(page_content=text, metadata=metadata)]))
+    return chunks
+
+
+def page_ranges(total_pages: int, pages_per_task: int = PDF_PAGES_PER_TASK) -> List[Tuple[int, int]]:
+    return [(start, min(start + pages_per_task, total_pages)) for start in range(0, total_pages, pages_per_task)]
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ProcessPoolExecutor(
+                    max_workers=PDF_PARSE_WORKERS,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+                atexit.register(shutdown_pool)
+    return _pool
+
+
+def shutdown_pool():
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def iter_range_chunks(file_path: str, total_pages: Optional[int] = None,
+                      workers: Optional[int] = None) -> Iterator[Tuple[int, List[Document]]]:
+    """
+    Yield (pages parsed so far, chunks of the range) for each page range, in page order.
+    At most 2 x workers ranges are in flight, so finished ranges are consumed
+    as soon as they are next in order instead of piling up in memory.
+    """
+    total_pages = count_pages(file_path) if total_pages is None else total_pages
+    workers = workers or PDF_PARSE_WORKERS
+    ranges = page_ranges(total_pages)
+
+    if workers <= 1 or total_pages < PDF_PARALLEL_MIN_PAGES:
+        for start, end in ranges:
+            yield end, parse_page_range(file_path, start, end)
+        return
+
+    pool = _get_pool()
+    window = max(2, workers * 2)
+    in_flight = []
+    next_range = 0
+    while next_range < len(ranges) or in_flight:
+        while next_range < len(ranges) and len(in_flight) < window:
+            start, end = ranges[next_range]
+            in_flight.append((end, pool.submit(parse_page_range, file_path, start, end)))
+            next_range += 1
+        end, future = in_flight.pop(0)
+        yield end, future.result()
+
+
+def extract_chunks(file_path: str, workers: Optional[int] = None) -> Tuple[List[Document], int]:
+    """Parse and chunk a whole PDF. Returns (chunks in page order, page count)."""
+    total_pages = count_pages(file_path)
+    chunks: List[Document] = []
+    for _, range_chunks in iter_range_chunks(file_path, total_pages, workers):
+        chunks.extend(range_chunks)
+    return chunks, total_pages
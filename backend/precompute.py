@@ -0,0 +1,116 @@
+"""
+Post-ingest precompute of the standard analyses (and optionally research).
+When enabled, a finished ingestion queues a "precompute" job. A worker runs
+the company/market/financial/risk analyses with bounded concurrency and
+writes them into the analysis cache, so the analyst's first view of a freshly
+uploaded deck is a cache hit. Progress is mirrored into the ingestion job's
+details under "precompute".
+"""
+
+import asyncio
+import os
+from typing import List, Optional
+
+import job_queue
+from concurrency import run_sync
+
+INGEST_PRECOMPUTE_ANALYSES = os.getenv("INGEST_PRECOMPUTE_ANALYSES", "0") == "1"
+INGEST_PRECOMPUTE_RESEARCH = os.getenv("INGEST_PRECOMPUTE_RESEARCH", "0") == "1"
+PRECOMPUTE_CONCURRENCY = int(os.getenv("PRECOMPUTE_CONCURRENCY", "2"))
+PRECOMPUTE_ANALYSIS_TYPES = ["company", "market", "financial", "risk"]
+
+
+def enqueue_for(document_id: str, ingest_job_id: Optional[str] = None) -> str:
+    """Queue the precompute job for a freshly ingested document."""
+    job_id = job_queue.enqueue("precompute", {
+        "document_id": document_id,
+        "ingest_job_id": ingest_job_id,
+        "analysis_types": PRECOMPUTE_ANALYSIS_TYPES,
+        "research": INGEST_PRECOMPUTE_RESEARCH,
+    })
+    if ingest_job_id:
+        _mirror(ingest_job_id, {"job_id": job_id, "status": job_queue.PENDING, "done": 0,
+                                "total": len(PRECOMPUTE_ANALYSIS_TYPES) + int(INGEST_PRECOMPUTE_RESEARCH)})
+    return job_id
+
+
+def _mirror(ingest_job_id: str, state: dict):
+    """Show precompute progress on the ingestion job the user is polling (it is already done)."""
+    try:
+        job_queue.update_job(ingest_job_id, precompute=state)
+    except job_queue.JobCancelled:
+        pass
+    except Exception as e:
+        print(f"[PRECOMPUTE] Could not update ingestion job {ingest_job_id}: {e}")
+
+
+async def precompute_document(job_id: str, document_id: str, ingest_job_id: Optional[str] = None,
+                              analysis_types: Optional[List[str]] = None, research: bool = False) -> dict:
+    import agents
+    import analysis_cache
+
+    analysis_types = [t for t in (analysis_types or PRECOMPUTE_ANALYSIS_TYPES) if t in agents.ANALYSIS_TASKS]
+    total = len(analysis_types) + int(research)
+    state = {"job_id": job_id, "status": job_queue.PROCESSING, "done": 0, "total": total, "cached": [], "failed": []}
+
+    def report(name: str, ok: bool):
+        state["done"] += 1
+        (state["cached"] if ok else state["failed"]).append(name)
+        job_queue.update_job(job_id, step=f"Precomputed {state['done']}/{total}", progress=state["done"] / total,
+                             done=state["done"], cached=state["cached"], failed=state["failed"])
+        if ingest_job_id:
+            _mirror(ingest_job_id, dict(state))
+
+    job_queue.update_job(job_id, step="Retrieving context...", progress=0.0, total=total)
+    if ingest_job_id:
+        _mirror(ingest_job_id, dict(state))
+
+    # Types already cached for this version (e.g. a user got there first) are skipped by get_or_compute
+    results_by_type = await agents.retrieve_for_types(document_id, analysis_types)
+    semaphore = asyncio.Semaphore(PRECOMPUTE_CONCURRENCY)
+
+    async def analyze(analysis_type: str):
+        async def compute() -> dict:
+            validated = await agents.run_analysis(document_id, analysis_type, results_by_type[analysis_type])
+            return validated.model_dump()
+
+        async with semaphore:
+            try:
+                await analysis_cache.get_or_compute(agents.analysis_cache_key(document_id, analysis_type), compute)
+                report(analysis_type, True)
+            except job_queue.JobCancelled:
+                raise
+            except Exception as e:
+                print(f"[PRECOMPUTE] {analysis_type} failed for {document_id}: {e}")
+                report(analysis_type, False)
+
+    async def research_task():
+        import research_store
+        async with semaphore:
+            try:
+                await research_store.ensure_research(document_id)
+                report("research", True)
+            except job_queue.JobCancelled:
+                raise
+            except Exception as e:
+                print(f"[PRECOMPUTE] research failed for {document_id}: {e}")
+                report("research", False)
+
+    tasks = [analyze(t) for t in analysis_types] + ([research_task()] if research else [])
+    await asyncio.gather(*tasks)
+
+    state["status"] = job_queue.DONE
+    if ingest_job_id:
+        _mirror(ingest_job_id, dict(state))
+    return {"document_id": document_id, "cached": state["cached"], "failed": state["failed"]}
+
+
+def run_precompute_job(job: dict) -> dict:
+    """Job handler entry point (runs inside an ingestion worker process)."""
+    payload = job["payload"]
+    try:
+        return run_sync(precompute_document(job["id"], **payload))
+    except job_queue.JobCancelled:
+        if payload.get("ingest_job_id"):
+            _mirror(payload["ingest_job_id"], {"job_id": job["id"], "status": job_queue.CANCELLED})
+        raise
@@ -3,24 +3,33 @@ Competitive Research Agent for PitchIQ
 Automatically researches companies and competitors when pitch decks are uploaded.
 """
 
-import os
 import json
 import asyncio
-from typing import Dict, List, Optional
-import google.generativeai as genai
+from typing import Dict, List, Optional, Tuple
+import llm_client
+import tracing
+from concurrency import limit
+from llm_client import generate_content_async
 from dotenv import load_dotenv
 
 load_dotenv()
 
-# Configure Gemini
-genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
-model = genai.GenerativeModel('gemini-2.0-flash')
+model = llm_client.get_model('gemini-2.0-flash')
+
+# Sections a report is useless without; see CompetitiveResearchAgent.research_company
+REQUIRED_SECTIONS = ("overview", "synthesis")
+
+
+class ResearchFailed(Exception):
+    """Research came back without one of its REQUIRED_SECTIONS (e.g. a rate limit or timeout)."""
 
 
 class CompetitiveResearchAgent:
     """
     Agent that performs competitive intelligence research on companies
     using web search and AI synthesis.
+    All Gemini calls are async and share the process-wide rate budget and
+    retry policy in llm_client.py.
     """
     
     def __init__(self):
@@ -35,24 +44,45 @@ class CompetitiveResearchAgent:
             industry: Industry sector (for context)
             
         Returns:
-            Dict containing research findings
+            Dict containing research findings. Sections whose call failed hold
+            placeholder content and are listed in "failed_sections".
         """
         print(f"[RESEARCH] Researching: {company_name} ({industry})")
+        failed = []
         
-        # Compile research tasks
-        tasks = [
-            self._get_company_overview(company_name, industry),
-            self._find_competitors(company_name, industry),
-            self._get_recent_news(company_name),
-        ]
-        
-        # Run research in parallel
-        overview, competitors, news = await asyncio.gather(*tasks)
-        
-        # Synthesize findings
-        synthesis = await self._synthesize_research(
-            company_name, overview, competitors, news
-        )
+        with tracing.span("research.company", company=company_name, industry=industry) as current:
+            # Compile research tasks
+            tasks = [
+                self._get_company_overview(company_name, industry),
+                self._find_competitors(company_name, industry),
+                self._get_recent_news(company_name),
+            ]
+            
+            # Run research in parallel (the three calls overlap on the async client)
+            overview, competitors, news = await asyncio.gather(*tasks, return_exceptions=True)
+            for section, result in (("overview", overview), ("competitors", competitors), ("recent_news", news)):
+                if not isinstance(result, Exception) and isinstance(result, BaseException):
+                    raise result
+                if isinstance(result, Exception):
+                    print(f"[RESEARCH] {section} failed for {company_name}: {result}")
+                    failed.append(section)
+            if isinstance(overview, BaseException):
+                overview = f"Error fetching overview: {str(overview)}"
+            if isinstance(competitors, BaseException):
+                competitors = []
+            if isinstance(news, BaseException):
+                news = []
+            
+            # Synthesize findings
+            try:
+                synthesis = await self._synthesize_research(
+                    company_name, overview, competitors, news
+                )
+            except Exception as e:
+                print(f"[RESEARCH] synthesis failed for {company_name}: {e}")
+                failed.append("synthesis")
+                synthesis = f"Unable to synthesize research: {str(e)}"
+            current.set(failed=",".join(failed))
         
         return {
             "company_name": company_name,
@@ -61,9 +91,27 @@ class CompetitiveResearchAgent:
             "competitors": competitors,
             "recent_news": news,
             "synthesis": synthesis,
+            "failed_sections": failed,
             "timestamp": self._get_timestamp()
         }
     
+    async def research_companies(self, companies: List[Tuple[str, str]]) -> List[Dict]:
+        """
+        Research a batch of (company_name, industry) pairs concurrently.
+        At most RESEARCH_MAX_CONCURRENCY companies are in flight at once;
+        results come back in input order, failures as {"company_name", "error"}.
+        """
+        async def research_one(company_name: str, industry: str) -> Dict:
+            async with limit("research"):
+                try:
+                    return await self.research_company(company_name, industry)
+                except Exception as e:
+                    print(f"[RESEARCH] Failed for {company_name}: {e}")
+                    return {"company_name": company_name, "industry": industry, "error": str(e)}
+
+        return await asyncio.gather(*(research_one(name, industry) for name, industry in companies))
+    
+    @tracing.traced("research.overview")
     async def _get_company_overview(self, company_name: str, industry: str) -> str:
         """Get company overview using Gemini's grounding (web search)."""
         prompt = f"""
@@ -78,12 +126,10 @@ class CompetitiveResearchAgent:
         Be concise (2-3 paragraphs max).
         """
         
-        try:
-            response = self.model.generate_content(prompt)
-            return response.text
-        except Exception as e:
-            return f"Error fetching overview: {str(e)}"
+        response = await generate_content_async(self.model, prompt)
+        return response.text
     
+    @tracing.traced("research.competitors")
     async def _find_competitors(self, company_name: str, industry: str) -> List[Dict]:
         """Identify key competitors using Gemini."""
         prompt = f"""
@@ -100,22 +146,19 @@ class CompetitiveResearchAgent:
         Return ONLY a JSON array of competitors, nothing else.
         """
         
-        try:
-            generation_config = {"response_mime_type": "application/json"}
-            response = self.model.generate_content(prompt, generation_config=generation_config)
-            competitors = json.loads(response.text)
-            
-            # Ensure it's a list
-            if isinstance(competitors, dict) and "competitors" in competitors:
-                return competitors["competitors"]
-            elif isinstance(competitors, list):
-                return competitors
-            else:
-                return []
-        except Exception as e:
-            print(f"Error finding competitors: {e}")
+        generation_config = {"response_mime_type": "application/json"}
+        response = await generate_content_async(self.model, prompt, generation_config=generation_config)
+        competitors = json.loads(response.text)
+        
+        # Ensure it's a list
+        if isinstance(competitors, dict) and "competitors" in competitors:
+            return competitors["competitors"]
+        elif isinstance(competitors, list):
+            return competitors
+        else:
             return []
     
+    @tracing.traced("research.news")
     async def _get_recent_news(self, company_name: str) -> List[Dict]:
         """Get recent news about the company."""
         prompt = f"""
@@ -139,22 +182,19 @@ class CompetitiveResearchAgent:
         Return ONLY valid JSON.
         """
         
-        try:
-            generation_config = {"response_mime_type": "application/json"}
-            response = self.model.generate_content(prompt, generation_config=generation_config)
-            news = json.loads(response.text)
-            
-            # Handle different response formats
-            if isinstance(news, dict) and "news" in news:
-                return news["news"]
-            elif isinstance(news, list):
-                return news
-            else:
-                return []
-        except Exception as e:
-            print(f"Error fetching news: {e}")
+        generation_config = {"response_mime_type": "application/json"}
+        response = await generate_content_async(self.model, prompt, generation_config=generation_config)
+        news = json.loads(response.text)
+        
+        # Handle different response formats
+        if isinstance(news, dict) and "news" in news:
+            return news["news"]
+        elif isinstance(news, list):
+            return news
+        else:
             return []
     
+    @tracing.traced("research.synthesize")
     async def _synthesize_research(
         self, 
         company_name: str, 
@@ -185,11 +225,8 @@ class CompetitiveResearchAgent:
         4. Investment attractiveness (qualitative assessment)
         """
         
-        try:
-            response = self.model.generate_content(prompt)
-            return response.text
-        except Exception as e:
-            return f"Unable to synthesize research: {str(e)}"
+        response = await generate_content_async(self.model, prompt)
+        return response.text
     
     def _get_timestamp(self) -> str:
         """Get current timestamp."""
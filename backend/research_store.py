@@ -0,0 +1,225 @@
+"""
+Competitive research report store.
+Reports from CompetitiveResearchAgent are chunked, embedded and upserted into
+the main collection under source f"{document_id}_research", so they can be
+retrieved alongside deck content. A SQLite row per document keeps the full
+report and its chunk IDs: looking up a document's research is a primary-key
+read, and a report is only regenerated once it is older than RESEARCH_TTL_SECONDS.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+from langchain_core.documents import Document
+
+import bm25_index
+import document_catalog
+from concurrency import limit, run_blocking
+from document_catalog import CATALOG_DB_PATH, RESEARCH_SOURCE_SUFFIX
+from pdf_pipeline import make_text_splitter
+from shared_utils import connect_sqlite
+from vector_store import get_vectordb_for_source, mark_written
+
+RESEARCH_TTL_SECONDS = int(os.getenv("RESEARCH_TTL_SECONDS", str(7 * 24 * 3600)))
+
+_conn = None
+_conn_pid = None
+_lock = threading.Lock()
+_in_flight: Dict[str, asyncio.Future] = {}
+
+
+def _get_conn():
+    global _conn, _conn_pid
+    if _conn is None or _conn_pid != os.getpid():
+        _conn = connect_sqlite(CATALOG_DB_PATH)
+        _conn.execute(
+            "CREATE TABLE IF NOT EXISTS research_reports ("
+            " document_id TEXT PRIMARY KEY, company_name TEXT, industry TEXT, report TEXT NOT NULL,"
+            " chunk_ids TEXT NOT NULL, created_at REAL NOT NULL, updated_at REAL NOT NULL)"
+        )
+        _conn.commit()
+        _conn_pid = os.getpid()
+    return _conn
+
+
+def research_source(document_id: str) -> str:
+    return f"{document_id}{RESEARCH_SOURCE_SUFFIX}"
+
+
+def get_report(document_id: str) -> Optional[dict]:
+    """Stored report for a document (fresh or stale), by primary key."""
+    with _lock:
+        row = _get_conn().execute(
+            "SELECT company_name, industry, report, chunk_ids, created_at, updated_at FROM research_reports WHERE document_id = ?",
+            (document_id,),
+        ).fetchone()
+    if row is None:
+        return None
+    return {
+        "document_id": document_id,
+        "company_name": row[0],
+        "industry": row[1],
+        "report": row[2],
+        "chunk_ids": json.loads(row[3]),
+        "created_at": row[4],
+        "updated_at": row[5],
+        "stale": is_stale(row[5]),
+    }
+
+
+def is_stale(updated_at: float) -> bool:
+    return time.time() - updated_at > RESEARCH_TTL_SECONDS
+
+
+def stale_documents() -> List[str]:
+    with _lock:
+        rows = _get_conn().execute(
+            "SELECT document_id FROM research_reports WHERE updated_at < ? ORDER BY updated_at",
+            (time.time() - RESEARCH_TTL_SECONDS,),
+        ).fetchall()
+    return [row[0] for row in rows]
+
+
+def store_report(document_id: str, company_name: str, industry: str, report: str) -> dict:
+    """
+    Chunk, embed and upsert a report. Chunks whose text is unchanged since
+    the previous report keep their vectors; only new text is embedded.
+    """
+    source = research_source(document_id)
+    now = time.time()
+    timestamp = datetime.fromtimestamp(now, timezone.utc).isoformat()
+    previous = get_report(document_id)
+    previous_ids = set(previous["chunk_ids"]) if previous else set()
+    created_at = previous["created_at"] if previous else now
+
+    docs = []
+    for index, text in enumerate(make_text_splitter().split_text(report)):
+        chunk_id = document_catalog.chunk_id(source, index, text)
+        if any(doc.id == chunk_id for doc in docs):
+            continue
+        docs.append(Document(id=chunk_id, page_content=text, metadata={
+            "source": source,
+            "document_id": document_id,
+            "type": "research",
+            "company_name": company_name,
+            "industry": industry,
+            "chunk_index": index,
+            "created_at": datetime.fromtimestamp(created_at, timezone.utc).isoformat(),
+            "updated_at": timestamp,
+        }))
+
+    vectordb = get_vectordb_for_source(source)
+    new_docs = [doc for doc in docs if doc.id not in previous_ids]
+    kept_docs = [doc for doc in docs if doc.id in previous_ids]
+    if new_docs:
+        vectordb.add_documents(new_docs, ids=[doc.id for doc in new_docs])
+    if kept_docs:
+        vectordb._collection.update(ids=[doc.id for doc in kept_docs], metadatas=[doc.metadata for doc in kept_docs])
+    bm25_index.add_chunks(docs)
+
+    chunk_ids = [doc.id for doc in docs]
+    stale_ids = list(previous_ids - set(chunk_ids))
+    if stale_ids:
+        vectordb.delete(ids=stale_ids)
+        bm25_index.delete_chunks(stale_ids)
+    mark_written()
+
+    with _lock:
+        conn = _get_conn()
+        conn.execute(
+            "INSERT OR REPLACE INTO research_reports (document_id, company_name, industry, report, chunk_ids, created_at, updated_at)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (document_id, company_name, industry, report, json.dumps(chunk_ids), created_at, now),
+        )
+        conn.commit()
+    print(f"[RESEARCH] Stored report for {document_id}: {len(new_docs)} new, {len(kept_docs)} kept, {len(stale_ids)} removed chunks")
+    return get_report(document_id)
+
+
+async def ensure_research(document_id: str, company_name: Optional[str] = None,
+                          industry: Optional[str] = None, force: bool = False) -> dict:
+    """
+    Return the document's research report, running the research agent only
+    when there is none yet or it is past its TTL. Concurrent callers for the
+    same document share one run.
+    """
+    existing = get_report(document_id)
+    if existing and not existing["stale"] and not force:
+        return existing
+
+    future = _in_flight.get(document_id)
+    if future is not None:
+        return await asyncio.shield(future)
+
+    future = asyncio.get_running_loop().create_future()
+    _in_flight[document_id] = future
+    try:
+        entry = document_catalog.get_document(document_id) or {}
+        company_name = company_name or (existing or {}).get("company_name") or _company_from_document(entry.get("name") or document_id)
+        industry = industry or (existing or {}).get("industry") or entry.get("industry") or "Unknown"
+
+        from research_agent import REQUIRED_SECTIONS, CompetitiveResearchAgent, ResearchFailed
+        agent = CompetitiveResearchAgent()
+        research = await agent.research_company(company_name, industry)
+        # A transient failure must not become the deck's report (or its chat context) until the TTL
+        missing = [s for s in research["failed_sections"] if s in REQUIRED_SECTIONS]
+        if missing:
+            raise ResearchFailed(f"Research for {company_name} failed: {', '.join(missing)}")
+        report = agent.format_research_report(research)
+        stored = await run_blocking("chroma", store_report, document_id, company_name, industry, report)
+        future.set_result(stored)
+        return stored
+    except asyncio.CancelledError:
+        future.cancel()
+        raise
+    except Exception as e:
+        future.set_exception(e)
+        # Nobody else may be waiting; don't log "exception never retrieved"
+        future.exception()
+        raise
+    finally:
+        _in_flight.pop(document_id, None)
+
+
+def _company_from_document(name: str) -> str:
+    """Best-effort company name from an uploaded file name ("Acme_Pitch_Deck.pdf" -> "Acme")."""
+    stem = os.path.splitext(os.path.basename(name))[0].replace("_", " ").replace("-", " ")
+    for marker in (" pitch", " deck", " investor", " presentation", " teaser", " cim"):
+        cut = stem.lower().find(marker)
+        if cut > 0:
+            stem = stem[:cut]
+    return stem.strip() or name
+
+
+async def refresh_stale(max_reports: Optional[int] = None) -> List[str]:
+    """Re-research every report past its TTL (bounded by the research concurrency limit)."""
+    document_ids = stale_documents()[:max_reports]
+
+    async def refresh(document_id: str):
+        async with limit("research"):
+            await ensure_research(document_id, force=True)
+
+    results = await asyncio.gather(*(refresh(d) for d in document_ids), return_exceptions=True)
+    for document_id, result in zip(document_ids, results):
+        if isinstance(result, Exception):
+            print(f"[RESEARCH] Refresh failed for {document_id}: {result}")
+    return document_ids
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Maintain competitive research reports")
+    parser.add_argument("--refresh-stale", action="store_true", help="re-research reports older than RESEARCH_TTL_SECONDS")
+    parser.add_argument("--document-id", help="research (or refresh) one document")
+    parser.add_argument("--force", action="store_true")
+    args = parser.parse_args()
+    if args.document_id:
+        entry = asyncio.run(ensure_research(args.document_id, force=args.force))
+        print(entry["report"])
+    if args.refresh_stale:
+        print(f"[RESEARCH] Refreshed {len(asyncio.run(refresh_stale()))} report(s)")
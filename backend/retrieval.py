@@ -0,0 +1,83 @@
+"""
+Hybrid retrieval: dense vector search fused with the BM25 keyword index.
+Both rankings are combined with Reciprocal Rank Fusion, so chunks that match
+exact terms or figures surface even when their embedding is only loosely
+similar to the query. RETRIEVAL_MODE=vector restores pure vector search.
+"""
+
+import os
+from typing import Dict, List, Optional
+
+from langchain_core.documents import Document
+
+import bm25_index
+import tracing
+import vector_store
+from shared_utils import embed_queries
+
+RETRIEVAL_MODE = os.getenv("RETRIEVAL_MODE", "hybrid").lower()  # vector | hybrid
+RRF_K = int(os.getenv("RETRIEVAL_RRF_K", "60"))
+# Each ranker contributes this many candidates per requested result
+HYBRID_CANDIDATE_FACTOR = int(os.getenv("RETRIEVAL_CANDIDATE_FACTOR", "2"))
+
+
+def rrf_fuse(rankings: List[List[str]], k: int, rrf_k: int = RRF_K) -> List[str]:
+    """Reciprocal Rank Fusion over several ranked ID lists; returns the top-k IDs."""
+    scores: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, chunk_id in enumerate(ranking):
+            scores[chunk_id] = scores.get(chunk_id, 0.0) + 1.0 / (rrf_k + rank + 1)
+    return sorted(scores, key=scores.get, reverse=True)[:k]
+
+
+def _lexical_source(where: Optional[dict], collection_name: Optional[str]):
+    """
+    The keyword index only covers the main collection and only knows the
+    `source` field; returns (usable, source) for a Chroma where-filter.
+    """
+    if collection_name not in (None, vector_store.DEFAULT_COLLECTION):
+        return False, None
+    if not where:
+        return True, None
+    if set(where) == {"source"} and isinstance(where["source"], str):
+        return True, where["source"]
+    return False, None
+
+
+def _fuse(query: str, dense: List[Document], k: int, source: Optional[str],
+          where: Optional[dict], collection_name: Optional[str]) -> List[Document]:
+    with tracing.span("retrieval.keyword_search"):
+        lexical = bm25_index.search(query, k=k * HYBRID_CANDIDATE_FACTOR, source=source)
+    if not lexical:
+        return dense[:k]
+    by_id = {doc.id: doc for doc in dense}
+    fused_ids = rrf_fuse([list(by_id), [chunk_id for chunk_id, _ in lexical]], k)
+    missing = [chunk_id for chunk_id in fused_ids if chunk_id not in by_id]
+    by_id.update(vector_store.get_documents(missing, collection_name, where=where))
+    return [by_id[chunk_id] for chunk_id in fused_ids if chunk_id in by_id]
+
+
+def search_by_vectors(queries: List[str], vectors: List[List[float]], k: int, where: Optional[dict] = None,
+                      collection_name: Optional[str] = None) -> List[List[Document]]:
+    """Hybrid search for callers that already embedded their queries."""
+    usable, source = _lexical_source(where, collection_name)
+    with tracing.span("retrieval.vector_search", queries=len(vectors)):
+        if RETRIEVAL_MODE != "hybrid" or not usable:
+            return vector_store.search_by_vectors(vectors, k, where=where, collection_name=collection_name)
+        dense = vector_store.search_by_vectors(vectors, k * HYBRID_CANDIDATE_FACTOR, where=where,
+                                               collection_name=collection_name)
+    return [_fuse(query, docs, k, source, where, collection_name) for query, docs in zip(queries, dense)]
+
+
+def search_many(queries: List[str], k: int, where: Optional[dict] = None,
+                collection_name: Optional[str] = None) -> List[List[Document]]:
+    """Drop-in replacement for vector_store.search_many with hybrid ranking."""
+    if not queries:
+        return []
+    with tracing.span("retrieval.embed", queries=len(queries)):
+        vectors = embed_queries(queries)
+    return search_by_vectors(queries, vectors, k, where=where, collection_name=collection_name)
+
+
+def search(query: str, k: int, where: Optional[dict] = None, collection_name: Optional[str] = None) -> List[Document]:
+    return search_many([query], k, where=where, collection_name=collection_name)[0]
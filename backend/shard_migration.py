@@ -0,0 +1,80 @@
+"""
+Split the global chunk collection into per-document shards.
+Copies stored vectors as-is (no re-embedding) into the shard that
+vector_store.shard_for_source() routes each source to, verifies per-shard
+counts, and optionally deletes the copied chunks from the global collection.
+Run with the API stopped, then start it with VECTOR_STORAGE_MODE=per_document.
+
+    python shard_migration.py --dry-run
+    python shard_migration.py --delete-source
+"""
+
+import argparse
+from collections import Counter, defaultdict
+from typing import Dict, List
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+import vector_store
+
+
+def migrate(page_size: int = 1000, delete_source: bool = False, dry_run: bool = False) -> Dict[str, int]:
+    vector_store.VECTOR_STORAGE_MODE = "per_document"
+    source_collection = vector_store.get_vectordb(vector_store.DEFAULT_COLLECTION)._collection
+    copied: Counter = Counter()
+    copied_ids: List[str] = []
+
+    offset = 0
+    while True:
+        batch = source_collection.get(include=["documents", "metadatas", "embeddings"], limit=page_size, offset=offset)
+        if not len(batch["ids"]):
+            break
+        offset += len(batch["ids"])
+
+        per_shard = defaultdict(lambda: {"ids": [], "embeddings": [], "documents": [], "metadatas": []})
+        for chunk_id, vector, text, meta in zip(batch["ids"], batch["embeddings"], batch["documents"], batch["metadatas"]):
+            source = (meta or {}).get("source")
+            if not source:
+                continue
+            shard = per_shard[vector_store.shard_for_source(source)]
+            shard["ids"].append(chunk_id)
+            shard["embeddings"].append(list(vector))
+            shard["documents"].append(text)
+            shard["metadatas"].append(meta)
+            copied[source] += 1
+
+        for shard_name, rows in per_shard.items():
+            copied_ids.extend(rows["ids"])
+            if not dry_run:
+                vector_store.get_vectordb(shard_name)._collection.upsert(**rows)
+        print(f"[SHARDS] {offset} chunks scanned, {len(copied)} documents")
+
+    if dry_run:
+        return dict(copied)
+
+    # Every chunk must be present in its shard before anything is deleted
+    per_shard_expected: Counter = Counter()
+    for source, count in copied.items():
+        per_shard_expected[vector_store.shard_for_source(source)] += count
+    for shard_name, expected in per_shard_expected.items():
+        actual = vector_store.get_vectordb(shard_name)._collection.count()
+        if actual < expected:
+            raise RuntimeError(f"Shard {shard_name} holds {actual} chunks, expected at least {expected}; nothing deleted")
+
+    if delete_source:
+        for start in range(0, len(copied_ids), page_size):
+            source_collection.delete(ids=copied_ids[start:start + page_size])
+        print(f"[SHARDS] Removed {len(copied_ids)} chunks from the global collection")
+    return dict(copied)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Split the global vector collection into per-document shards")
+    parser.add_argument("--page-size", type=int, default=1000)
+    parser.add_argument("--delete-source", action="store_true", help="remove migrated chunks from the global collection")
+    parser.add_argument("--dry-run", action="store_true", help="only report what would be copied")
+    args = parser.parse_args()
+    result = migrate(args.page_size, args.delete_source, args.dry_run)
+    print(f"[SHARDS] {'Would copy' if args.dry_run else 'Copied'} {sum(result.values())} chunks across {len(result)} documents")
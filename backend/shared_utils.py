@@ -1,13 +1,40 @@
 import os
-from langchain_google_genai import GoogleGenerativeAIEmbeddings
+import sqlite3
+import embedding_backends
+
+# Vector space of the configured EMBEDDING_BACKEND
+EMBEDDING_MODEL = embedding_backends.model_id()
 
 _embeddings = None
 
+
+def get_data_path(env_var: str, name: str) -> str:
+    """Resolve a storage path: env var > /mnt/data > local fallback."""
+    return os.getenv(env_var) or (f"/mnt/data/{name}" if os.path.exists("/mnt/data") else f"./{name}")
+
+
+def connect_sqlite(path: str) -> sqlite3.Connection:
+    """Open a SQLite database shared between threads (WAL, relaxed fsync)."""
+    conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+
 def get_embeddings():
     global _embeddings
     if _embeddings is None:
-        _embeddings = GoogleGenerativeAIEmbeddings(
-            model="models/gemini-embedding-001",
-            google_api_key=os.getenv("GOOGLE_API_KEY"),
-        )
+        base = embedding_backends.create_embeddings()
+        from embedding_cache import EMBEDDING_CACHE_ENABLED, CachedEmbeddings, get_cache
+        _embeddings = CachedEmbeddings(base, EMBEDDING_MODEL, get_cache()) if EMBEDDING_CACHE_ENABLED else base
     return _embeddings
+
+
+def embed_queries(texts):
+    """Embed several search queries in a single batched request."""
+    embeddings = get_embeddings()
+    try:
+        return embeddings.embed_documents(texts, task_type="RETRIEVAL_QUERY")
+    except TypeError:
+        # Backends without task types embed queries and documents the same way
+        return embeddings.embed_documents(texts)
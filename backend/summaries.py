@@ -0,0 +1,174 @@
+"""
+Precomputed per-document section summaries.
+An optional ingestion stage condenses a deck into a hierarchy of summaries:
+page groups -> topics (company/market/financial/risk) -> whole document.
+Analysis and chat prompts can then use these compact summaries in place of,
+or ahead of, up to 18 raw 1500-character chunks.
+"""
+
+import asyncio
+import os
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+import llm_client
+from llm_client import generate_content_async
+from document_catalog import CATALOG_DB_PATH
+from shared_utils import connect_sqlite
+
+# Build summaries at ingest time (costs one Gemini call per page group + topics)
+INGEST_BUILD_SUMMARIES = os.getenv("INGEST_BUILD_SUMMARIES", "0") == "1"
+SUMMARY_PAGES_PER_GROUP = int(os.getenv("SUMMARY_PAGES_PER_GROUP", "10"))
+# How prompts use summaries: chunks (off) | hybrid (summary ahead of fewer chunks) | summaries (summary only)
+ANALYSIS_CONTEXT_MODE = os.getenv("ANALYSIS_CONTEXT_MODE", "chunks")
+CHAT_CONTEXT_MODE = os.getenv("CHAT_CONTEXT_MODE", "chunks")
+
+TOPICS = {
+    "company": "company overview, mission, management team, founders, products and business model",
+    "market": "market size (TAM/SAM/SOM), growth rates, drivers, competitors and market share",
+    "financial": "revenue, margins, EBITDA, valuation, unit economics (LTV/CAC), burn rate, runway, projections",
+    "risk": "key risks (market, operational, regulatory, financial) and stated mitigants",
+}
+
+model = llm_client.get_model('gemini-2.5-flash')
+
+_conn = None
+_conn_pid = None
+_lock = threading.Lock()
+
+
+def _get_conn():
+    global _conn, _conn_pid
+    if _conn is None or _conn_pid != os.getpid():
+        _conn = connect_sqlite(CATALOG_DB_PATH)
+        _conn.execute(
+            "CREATE TABLE IF NOT EXISTS summaries ("
+            " source TEXT NOT NULL, level TEXT NOT NULL, key TEXT NOT NULL, text TEXT NOT NULL,"
+            " file_hash TEXT, created_at REAL NOT NULL, PRIMARY KEY (source, level, key))"
+        )
+        _conn.commit()
+        _conn_pid = os.getpid()
+    return _conn
+
+
+def get_summaries(source: str, file_hash: Optional[str] = None) -> Dict[str, Dict[str, str]]:
+    """Return {level: {key: text}} for a document, ignoring summaries of an older file version."""
+    with _lock:
+        rows = _get_conn().execute(
+            "SELECT level, key, text, file_hash FROM summaries WHERE source = ?", (source,)
+        ).fetchall()
+    result: Dict[str, Dict[str, str]] = {}
+    for level, key, text, row_hash in rows:
+        if file_hash and row_hash != file_hash:
+            continue
+        result.setdefault(level, {})[key] = text
+    return result
+
+
+def _replace_summaries(source: str, file_hash: str, rows: List[tuple]):
+    now = time.time()
+    with _lock:
+        conn = _get_conn()
+        conn.execute("DELETE FROM summaries WHERE source = ?", (source,))
+        conn.executemany(
+            "INSERT INTO summaries (source, level, key, text, file_hash, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+            [(source, level, key, text, file_hash, now) for level, key, text in rows],
+        )
+        conn.commit()
+
+
+async def _summarize(prompt: str) -> str:
+    response = await generate_content_async(model, prompt, generation_config={"temperature": 0.1})
+    return response.text.strip()
+
+
+async def build_document_summaries(source: str, file_hash: str, collection,
+                                   on_progress: Optional[Callable[[int, int], None]] = None) -> Dict[str, Dict[str, str]]:
+    """
+    Build and store the summary hierarchy for one ingested document.
+    Chunk text is read back from the collection grouped by page; page groups
+    are summarized concurrently, then topics, then the whole document.
+    """
+    existing = get_summaries(source, file_hash)
+    if existing.get("document"):
+        return existing
+
+    data = collection.get(where={"source": source}, include=["documents", "metadatas"])
+    pages: Dict[int, List[str]] = {}
+    for text, meta in zip(data["documents"], data["metadatas"]):
+        page = int((meta or {}).get("page", 0) or 0)
+        pages.setdefault(page, []).append(text)
+    if not pages:
+        return {}
+
+    last_page = max(pages)
+    groups = []
+    for start in range(0, last_page + 1, SUMMARY_PAGES_PER_GROUP):
+        end = min(start + SUMMARY_PAGES_PER_GROUP, last_page + 1)
+        text = "\n\n".join(chunk for page in range(start, end) for chunk in pages.get(page, []))
+        if text.strip():
+            groups.append((f"pages {start + 1}-{end}", text))
+
+    total_steps = len(groups) + len(TOPICS) + 1
+    done = 0
+
+    def progress():
+        if on_progress:
+            on_progress(done, total_steps)
+
+    async def summarize_group(label: str, text: str) -> str:
+        nonlocal done
+        summary = await _summarize(
+            f"Summarize {label} of a pitch deck as dense factual bullet points.\n"
+            "Preserve every number, metric, date, name and claim exactly; omit filler.\n\n"
+            f"PAGES:\n{text}"
+        )
+        done += 1
+        progress()
+        return summary
+
+    group_summaries = await asyncio.gather(*(summarize_group(label, text) for label, text in groups))
+    group_block = "\n\n".join(f"[{label}]\n{summary}" for (label, _), summary in zip(groups, group_summaries))
+
+    async def summarize_topic(topic: str, focus: str) -> str:
+        nonlocal done
+        summary = await _summarize(
+            f"From these section summaries of a pitch deck, extract everything about: {focus}.\n"
+            "Use bullet points, keep exact figures and cite the page range in brackets. "
+            "Write 'Not covered' if the deck says nothing about it.\n\n"
+            f"SECTION SUMMARIES:\n{group_block}"
+        )
+        done += 1
+        progress()
+        return summary
+
+    topic_summaries = await asyncio.gather(*(summarize_topic(t, f) for t, f in TOPICS.items()))
+    topic_block = "\n\n".join(f"[{t}]\n{s}" for t, s in zip(TOPICS, topic_summaries))
+
+    document_summary = await _summarize(
+        "Write a one-page executive summary of this pitch deck from its topic summaries. "
+        "Keep the key figures.\n\n"
+        f"TOPIC SUMMARIES:\n{topic_block}"
+    )
+    done += 1
+    progress()
+
+    rows = [("group", label, summary) for (label, _), summary in zip(groups, group_summaries)]
+    rows += [("topic", t, s) for t, s in zip(TOPICS, topic_summaries)]
+    rows.append(("document", "overview", document_summary))
+    _replace_summaries(source, file_hash, rows)
+    return get_summaries(source, file_hash)
+
+
+def summary_context(source: str, file_hash: Optional[str], topic: Optional[str] = None) -> Optional[str]:
+    """Compact prompt context for a document (and optionally a topic), or None if not built."""
+    summaries = get_summaries(source, file_hash)
+    overview = summaries.get("document", {}).get("overview")
+    if not overview:
+        return None
+    parts = [f"DOCUMENT SUMMARY:\n{overview}"]
+    topic_text = summaries.get("topic", {}).get(topic) if topic else None
+    if topic_text:
+        parts.append(f"{topic.upper()} SUMMARY:\n{topic_text}")
+    return "\n\n".join(parts)
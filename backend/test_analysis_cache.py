@@ -0,0 +1,84 @@
+"""
+Tests for analysis_cache.py single-flight coalescing: callers that go away
+(cancelled requests) must not cancel the computation others are waiting on.
+
+Usage (from backend/):
+    python -m pytest -q test_analysis_cache.py
+"""
+
+import asyncio
+import os
+import shutil
+import tempfile
+
+DATA_DIR = tempfile.mkdtemp(prefix="pitchiq-analysis-cache-")
+os.environ.update({
+    "ANALYSIS_CACHE_PATH": os.path.join(DATA_DIR, "analyses"),
+    "CATALOG_DB_PATH": os.path.join(DATA_DIR, "catalog.sqlite3"),
+})
+
+import pytest
+
+import analysis_cache
+
+
+@pytest.fixture(scope="module", autouse=True)
+def data_dir():
+    yield
+    shutil.rmtree(DATA_DIR, ignore_errors=True)
+
+
+def slow_compute(calls: list, result: dict):
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return result
+    return compute
+
+
+def test_cancelled_leader_does_not_cancel_followers():
+    key = analysis_cache.make_key("leader.pdf", "analysis", "v1")
+    calls = []
+
+    async def scenario():
+        leader = asyncio.create_task(analysis_cache.get_or_compute(key, slow_compute(calls, {"n": 1})))
+        await asyncio.sleep(0)
+        follower = asyncio.create_task(analysis_cache.get_or_compute(key, slow_compute(calls, {"n": 2})))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        return await follower
+
+    assert asyncio.run(scenario()) == ({"n": 1}, False)
+    assert calls == [1]
+    assert analysis_cache.get(key) == {"n": 1}
+    assert not analysis_cache._in_flight
+
+
+def test_computation_is_cached_after_every_caller_left():
+    key = analysis_cache.make_key("abandoned.pdf", "analysis", "v1")
+
+    async def scenario():
+        caller = asyncio.create_task(analysis_cache.get_or_compute(key, slow_compute([], {"n": 3})))
+        await asyncio.sleep(0.01)
+        caller.cancel()
+        await asyncio.sleep(0.1)
+
+    asyncio.run(scenario())
+    assert analysis_cache.get(key) == {"n": 3}
+    assert not analysis_cache._in_flight
+
+
+def test_failure_reaches_every_caller_and_is_not_cached():
+    key = analysis_cache.make_key("failing.pdf", "analysis", "v1")
+
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise ValueError("model error")
+
+    async def scenario():
+        return await asyncio.gather(*(analysis_cache.get_or_compute(key, fail) for _ in range(2)),
+                                    return_exceptions=True)
+
+    assert [type(e) for e in asyncio.run(scenario())] == [ValueError, ValueError]
+    assert analysis_cache.get(key) is None
+    assert not analysis_cache._in_flight
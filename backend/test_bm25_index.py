@@ -0,0 +1,88 @@
+"""
+Tests for bm25_index.py: deck-scoped searches read only that deck's postings,
+indexes built before postings carried a source are migrated in place, and
+--rebuild re-indexes per-document shards.
+
+Usage (from backend/):
+    python -m pytest -q test_bm25_index.py
+"""
+
+import os
+import shutil
+import sqlite3
+import tempfile
+
+DATA_DIR = tempfile.mkdtemp(prefix="pitchiq-bm25-")
+os.environ.update({
+    "EMBEDDING_BACKEND": "hashing",
+    "CHROMA_DB_PATH": os.path.join(DATA_DIR, "chroma_db"),
+    "EMBEDDING_CACHE_PATH": os.path.join(DATA_DIR, "embedding_cache.sqlite3"),
+    "BM25_DB_PATH": os.path.join(DATA_DIR, "keyword_index.sqlite3"),
+})
+
+import pytest
+from langchain_core.documents import Document
+
+import bm25_index
+import vector_store
+
+
+@pytest.fixture(scope="module", autouse=True)
+def data_dir():
+    yield
+    vector_store.close()
+    shutil.rmtree(DATA_DIR, ignore_errors=True)
+
+
+@pytest.fixture(autouse=True)
+def fresh_index(monkeypatch, tmp_path):
+    monkeypatch.setattr(bm25_index, "BM25_DB_PATH", str(tmp_path / "keyword_index.sqlite3"))
+    monkeypatch.setattr(bm25_index, "_conn", None)
+
+
+def chunk(chunk_id: str, source: str, text: str) -> Document:
+    return Document(id=chunk_id, page_content=text, metadata={"source": source})
+
+
+def test_scoped_search_uses_the_source_key():
+    bm25_index.add_chunks([
+        chunk("a1", "a.pdf", "EBITDA margin grew to 23.5%"),
+        chunk("a2", "a.pdf", "Customer acquisition cost"),
+        chunk("b1", "b.pdf", "EBITDA is negative"),
+    ])
+    assert [cid for cid, _ in bm25_index.search("EBITDA", source="a.pdf")] == ["a1"]
+    assert {cid for cid, _ in bm25_index.search("EBITDA")} == {"a1", "b1"}
+
+    plan = bm25_index._get_conn().execute(
+        "EXPLAIN QUERY PLAN SELECT p.chunk_id FROM postings p JOIN chunks c ON c.chunk_id = p.chunk_id"
+        " WHERE p.term IN (?) AND p.source = ?", ["ebitda", "a.pdf"],
+    ).fetchall()
+    # Either the (source, term) key or the term index, which carries the key's source
+    assert "SEARCH p" in plan[0][3] and "source=?" in plan[0][3]
+
+
+def test_index_without_posting_sources_is_migrated():
+    conn = sqlite3.connect(bm25_index.BM25_DB_PATH)
+    conn.execute("CREATE TABLE chunks (chunk_id TEXT PRIMARY KEY, source TEXT NOT NULL, length INTEGER NOT NULL)")
+    conn.execute("CREATE TABLE postings (term TEXT NOT NULL, chunk_id TEXT NOT NULL, tf INTEGER NOT NULL,"
+                 " PRIMARY KEY (term, chunk_id)) WITHOUT ROWID")
+    conn.executemany("INSERT INTO chunks VALUES (?, ?, ?)", [("a1", "a.pdf", 2), ("b1", "b.pdf", 2)])
+    conn.executemany("INSERT INTO postings VALUES (?, ?, ?)", [("ltv", "a1", 1), ("ltv", "b1", 1)])
+    conn.commit()
+    conn.close()
+
+    assert [cid for cid, _ in bm25_index.search("LTV", source="b.pdf")] == ["b1"]
+    bm25_index.delete_chunks(["b1"])
+    assert [cid for cid, _ in bm25_index.search("LTV")] == ["a1"]
+
+
+def test_rebuild_indexes_per_document_shards(monkeypatch):
+    monkeypatch.setattr(vector_store, "VECTOR_STORAGE_MODE", "per_document")
+    for source, text in [("deck-one.pdf", "churn below two percent"), ("deck-two.pdf", "net revenue retention")]:
+        vector_store.get_vectordb_for_source(source).add_documents(
+            [chunk(f"{source}-1", source, text)], ids=[f"{source}-1"])
+
+    assert set(vector_store.shard_collections()) == {
+        vector_store.shard_for_source("deck-one.pdf"), vector_store.shard_for_source("deck-two.pdf")}
+    assert bm25_index.rebuild() == 2
+    assert [cid for cid, _ in bm25_index.search("retention", source="deck-two.pdf")] == ["deck-two.pdf-1"]
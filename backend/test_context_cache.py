@@ -0,0 +1,213 @@
+"""
+Tests for context_cache.py against the fake LLM backend (no network, no API key).
+Ingests synthetic decks into a throwaway data directory with the local hashing
+embeddings, then checks explicit caching, inline fallbacks, TTL extension,
+invalidation on re-ingest, single-flight prefix building (surviving cancelled callers)
+and extra_chunks.
+
+Usage (from backend/):
+    python -m pytest -q test_context_cache.py
+"""
+
+import asyncio
+import os
+import shutil
+import tempfile
+import time
+
+DATA_DIR = tempfile.mkdtemp(prefix="pitchiq-context-cache-")
+os.environ.update({
+    "LLM_BACKEND": "fake",
+    "FAKE_LLM_LATENCY_MS": "1",
+    "EMBEDDING_BACKEND": "hashing",
+    "CONTEXT_CACHE_MODE": "auto",
+    "CONTEXT_CACHE_MIN_TOKENS": "1",
+    "GEMINI_REQUESTS_PER_MINUTE": "0",
+    "CHROMA_DB_PATH": os.path.join(DATA_DIR, "chroma_db"),
+    "JOB_DB_PATH": os.path.join(DATA_DIR, "jobs.sqlite3"),
+    "UPLOAD_DIR": os.path.join(DATA_DIR, "uploads"),
+    "EMBEDDING_CACHE_PATH": os.path.join(DATA_DIR, "embedding_cache.sqlite3"),
+    "ANALYSIS_CACHE_PATH": os.path.join(DATA_DIR, "analyses"),
+    "CATALOG_DB_PATH": os.path.join(DATA_DIR, "catalog.sqlite3"),
+    "BM25_DB_PATH": os.path.join(DATA_DIR, "keyword_index.sqlite3"),
+    "METRICS_DIR": os.path.join(DATA_DIR, "metrics"),
+    "INGEST_PRECOMPUTE_ANALYSES": "0",
+    "INGEST_PRECOMPUTE_RESEARCH": "0",
+    "INGEST_BUILD_SUMMARIES": "0",
+})
+os.makedirs(os.environ["UPLOAD_DIR"], exist_ok=True)
+
+import pytest
+from langchain_core.documents import Document
+
+import agents
+import context_cache
+import document_catalog
+import ingestion
+import job_queue
+import llm_client
+from benchmarks.synthetic_pdf import generate_pitch_deck
+
+DECK = "context-cache-deck.pdf"
+model = llm_client.get_model("gemini-2.5-flash")
+
+
+def ingest(filename: str, pages: int, seed: int = 7):
+    path = generate_pitch_deck(os.path.join(DATA_DIR, f"{seed}-{filename}"), pages, seed=seed)
+    job_id = job_queue.enqueue("ingest", {})
+    ingestion._run_ingestion(job_id, path, filename, "SaaS", "North America", None)
+
+
+def get_prefix(document_id: str = DECK):
+    return asyncio.run(context_cache.get_prefix(document_id, "analysis", agents.SYSTEM_INSTRUCTION, model))
+
+
+@pytest.fixture(scope="module", autouse=True)
+def deck():
+    ingest(DECK, pages=4)
+    yield
+    shutil.rmtree(DATA_DIR, ignore_errors=True)
+
+
+@pytest.fixture(autouse=True)
+def fresh_prefixes():
+    context_cache._prefixes.clear()
+    yield
+    context_cache._prefixes.clear()
+
+
+def test_explicit_prefix_serves_calls_from_the_cache():
+    prefix = get_prefix()
+    assert prefix.explicit
+    assert prefix.cached.name in llm_client._fake_caches
+    assert prefix.text.startswith(agents.SYSTEM_INSTRUCTION.strip())
+
+    calls = context_cache._stats["calls"]["explicit"]
+    response = asyncio.run(context_cache.generate(model, prefix, "Suffix question."))
+    assert context_cache._stats["calls"]["explicit"] == calls + 1
+    # Only the suffix is sent; the prefix comes back as cached tokens
+    assert response.usage_metadata.cached_content_token_count == llm_client._estimate_tokens(prefix.cached.text)
+    assert response.usage_metadata.prompt_token_count - response.usage_metadata.cached_content_token_count \
+        == llm_client._estimate_tokens("Suffix question.")
+
+
+def test_prefix_is_sent_inline_when_cache_creation_fails(monkeypatch):
+    def fail(*args, **kwargs):
+        raise RuntimeError("caching unavailable")
+
+    monkeypatch.setattr(llm_client, "create_cached_content", fail)
+    failures = context_cache._stats["explicit_failures"]
+    prefix = get_prefix()
+    assert not prefix.explicit
+    assert context_cache._stats["explicit_failures"] == failures + 1
+
+    response = asyncio.run(context_cache.generate(model, prefix, "Suffix question."))
+    assert response.usage_metadata.cached_content_token_count == 0
+    assert response.usage_metadata.prompt_token_count == llm_client._estimate_tokens(prefix.text + "Suffix question.")
+
+
+def test_failed_cached_call_falls_back_to_inline(monkeypatch):
+    prefix = get_prefix()
+    assert prefix.explicit
+
+    async def expired(*args, **kwargs):
+        raise ValueError("CachedContent not found")
+
+    monkeypatch.setattr(prefix.cached_model, "generate_content_async", expired)
+    inline_calls = context_cache._stats["calls"]["prefix"]
+    response = asyncio.run(context_cache.generate(model, prefix, "Suffix question."))
+    assert response.text
+    assert not prefix.explicit
+    assert context_cache._stats["calls"]["prefix"] == inline_calls + 1
+
+
+def test_explicit_cache_is_extended_near_expiry():
+    prefix = get_prefix()
+    prefix.expires_at = time.time() + 10
+    prefix.cached.expire_time = time.time() + 10
+
+    assert get_prefix() is prefix
+    assert prefix.expires_at > time.time() + context_cache.CONTEXT_CACHE_TTL_SECONDS - 60
+    assert prefix.cached.expire_time > time.time() + context_cache.CONTEXT_CACHE_TTL_SECONDS - 60
+
+
+def test_prefix_is_rebuilt_and_old_cache_deleted_on_reingest():
+    ingest("reingested.pdf", pages=3, seed=1)
+    old = get_prefix("reingested.pdf")
+    old_cache = old.cached.name
+
+    ingest("reingested.pdf", pages=5, seed=2)
+    assert old_cache not in llm_client._fake_caches
+    assert all(key[0] != "reingested.pdf" for key in context_cache._prefixes)
+
+    new = get_prefix("reingested.pdf")
+    assert new is not old
+    assert new.explicit and new.cached.name != old_cache
+    assert new.core != old.core
+
+
+def test_new_document_version_replaces_prefix_built_by_this_process():
+    # Re-ingested by a worker in another process: only the catalog version moves
+    old = get_prefix()
+    entry = document_catalog.get_file(DECK)
+    document_catalog.record_file(DECK, "other-version", entry["metadata"], entry["chunk_ids"])
+    try:
+        new = get_prefix()
+        assert new is not old
+        assert not old.explicit
+        keys = [key for key in context_cache._prefixes if key[0] == DECK]
+        assert len(keys) == 1 and keys[0][2] == "other-version"
+    finally:
+        document_catalog.record_file(DECK, entry["file_hash"], entry["metadata"], entry["chunk_ids"])
+
+
+def test_concurrent_callers_share_one_build(monkeypatch):
+    builds = []
+    core_chunks = context_cache.core_chunks
+
+    async def counted(document_id):
+        builds.append(document_id)
+        await asyncio.sleep(0.05)
+        return await core_chunks(document_id)
+
+    monkeypatch.setattr(context_cache, "core_chunks", counted)
+
+    async def many():
+        return await asyncio.gather(*(
+            context_cache.get_prefix(DECK, "analysis", agents.SYSTEM_INSTRUCTION, model) for _ in range(5)
+        ))
+
+    prefixes = asyncio.run(many())
+    assert builds == [DECK]
+    assert all(p is prefixes[0] for p in prefixes)
+    assert not context_cache._in_flight
+
+
+def test_cancelled_caller_does_not_cancel_a_shared_build(monkeypatch):
+    core_chunks = context_cache.core_chunks
+
+    async def slow(document_id):
+        await asyncio.sleep(0.05)
+        return await core_chunks(document_id)
+
+    monkeypatch.setattr(context_cache, "core_chunks", slow)
+
+    async def scenario():
+        first = asyncio.create_task(context_cache.get_prefix(DECK, "analysis", agents.SYSTEM_INSTRUCTION, model))
+        await asyncio.sleep(0)
+        second = asyncio.create_task(context_cache.get_prefix(DECK, "analysis", agents.SYSTEM_INSTRUCTION, model))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        return await second
+
+    assert asyncio.run(scenario()).explicit
+    assert not context_cache._in_flight
+
+
+def test_extra_chunks_skips_chunks_already_in_the_prefix():
+    prefix = get_prefix()
+    held = next(iter(prefix.chunk_ids))
+    results = [Document(id=held, page_content="in prefix"), Document(id="new-chunk", page_content="new")]
+
+    assert [doc.id for doc in context_cache.extra_chunks(prefix, results)] == ["new-chunk"]
+    assert context_cache.extra_chunks(None, results) == results
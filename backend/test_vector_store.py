@@ -0,0 +1,52 @@
+"""
+Tests for vector_store.py collection naming: each embedding model gets its own
+Chroma collection, and collections built before names carried a model keep
+serving the model that built them.
+
+Usage (from backend/):
+    python -m pytest -q test_vector_store.py
+"""
+
+import os
+import shutil
+import tempfile
+
+DATA_DIR = tempfile.mkdtemp(prefix="pitchiq-vector-store-")
+os.environ.update({
+    "EMBEDDING_BACKEND": "hashing",
+    "CHROMA_DB_PATH": os.path.join(DATA_DIR, "chroma_db"),
+    "EMBEDDING_CACHE_PATH": os.path.join(DATA_DIR, "embedding_cache.sqlite3"),
+})
+
+import pytest
+
+import vector_store
+from embedding_backends import GEMINI_EMBEDDING_MODEL, LOCAL_EMBEDDING_MODEL
+
+
+@pytest.fixture(scope="module", autouse=True)
+def data_dir():
+    yield
+    vector_store.close()
+    shutil.rmtree(DATA_DIR, ignore_errors=True)
+
+
+def test_historical_collections_keep_their_names():
+    assert vector_store.physical_collection_name(None, GEMINI_EMBEDDING_MODEL) == vector_store.DEFAULT_COLLECTION
+    assert vector_store.physical_collection_name("industry_knowledge", LOCAL_EMBEDDING_MODEL) == "industry_knowledge"
+    assert vector_store.physical_collection_name("industry_knowledge", GEMINI_EMBEDDING_MODEL) \
+        == "industry_knowledge__models-gemini-embedding-001"
+    assert vector_store.physical_collection_name(None, LOCAL_EMBEDDING_MODEL) == "langchain__all-minilm-l6-v2"
+
+
+def test_gemini_does_not_open_the_minilm_industry_collection(monkeypatch):
+    # industry_knowledge as the original ingest script left it: untagged 384-d MiniLM vectors
+    legacy = vector_store.get_client().create_collection("industry_knowledge")
+    legacy.add(ids=["minilm-chunk"], embeddings=[[0.1] * 384], documents=["CAC payback under 12 months"])
+
+    monkeypatch.setattr(vector_store, "EMBEDDING_MODEL", GEMINI_EMBEDDING_MODEL)
+    monkeypatch.setattr(vector_store, "_handles", {})
+    collection = vector_store.get_industry_db()._collection
+    assert collection.name == "industry_knowledge__models-gemini-embedding-001"
+    assert collection.count() == 0
+    assert legacy.count() == 1 and "embedding_model" not in (legacy.metadata or {})
@@ -0,0 +1,136 @@
+"""
+Tests for the ingestion worker pool and its jobs (ingest touches the
+Chroma write marker once per job, not per batch).
+Async job stages run back to back inside one worker process against a fake
+model made loop-bound like the Gemini SDK's cached gRPC-aio client: once used
+on one event loop it fails on any other, so a stage that starts a fresh loop
+per job breaks on the second job. The pool tests check that jobs of lost
+workers go back to the queue and that dead workers are replaced.
+
+Usage (from backend/):
+    python -m pytest -q test_worker_jobs.py
+"""
+
+import asyncio
+import os
+import shutil
+import socket
+import tempfile
+import time
+
+DATA_DIR = tempfile.mkdtemp(prefix="pitchiq-worker-jobs-")
+os.environ.update({
+    "LLM_BACKEND": "fake",
+    "FAKE_LLM_LATENCY_MS": "1",
+    "EMBEDDING_BACKEND": "hashing",
+    "GEMINI_REQUESTS_PER_MINUTE": "0",
+    "CHROMA_DB_PATH": os.path.join(DATA_DIR, "chroma_db"),
+    "JOB_DB_PATH": os.path.join(DATA_DIR, "jobs.sqlite3"),
+    "UPLOAD_DIR": os.path.join(DATA_DIR, "uploads"),
+    "EMBEDDING_CACHE_PATH": os.path.join(DATA_DIR, "embedding_cache.sqlite3"),
+    "ANALYSIS_CACHE_PATH": os.path.join(DATA_DIR, "analyses"),
+    "CATALOG_DB_PATH": os.path.join(DATA_DIR, "catalog.sqlite3"),
+    "BM25_DB_PATH": os.path.join(DATA_DIR, "keyword_index.sqlite3"),
+    "METRICS_DIR": os.path.join(DATA_DIR, "metrics"),
+    "INGEST_PRECOMPUTE_ANALYSES": "0",
+    "INGEST_PRECOMPUTE_RESEARCH": "0",
+    "INGEST_BUILD_SUMMARIES": "0",
+    "INGEST_SUPERVISE_INTERVAL_SECONDS": "0.2",
+})
+os.makedirs(os.environ["UPLOAD_DIR"], exist_ok=True)
+
+import pytest
+
+import ingestion
+import ingestion_worker
+import job_queue
+import llm_client
+import precompute
+from benchmarks.synthetic_pdf import generate_pitch_deck
+
+
+@pytest.fixture(scope="module", autouse=True)
+def data_dir():
+    yield
+    shutil.rmtree(DATA_DIR, ignore_errors=True)
+
+
+@pytest.fixture(autouse=True)
+def loop_bound_model(monkeypatch):
+    bound = {}
+    generate = llm_client.FakeModel.generate_content_async
+
+    async def generate_on_first_loop(self, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        if bound.setdefault(self.model_name, loop) is not loop:
+            raise RuntimeError("Task got Future attached to a different loop")
+        return await generate(self, *args, **kwargs)
+
+    monkeypatch.setattr(llm_client.FakeModel, "generate_content_async", generate_on_first_loop)
+
+
+def ingest(filename: str, seed: int) -> dict:
+    path = generate_pitch_deck(os.path.join(DATA_DIR, filename), 3, seed=seed)
+    job_id = job_queue.enqueue("ingest", {})
+    return ingestion._run_ingestion(job_id, path, filename, "SaaS", "North America", None)
+
+
+def run_queued(kind: str) -> dict:
+    job = job_queue.claim_next("test-worker", kinds=[kind])
+    ingestion_worker.run_job(job)
+    return job_queue.get_job(job["id"])
+
+
+def test_precompute_jobs_back_to_back():
+    for seed, document_id in enumerate(["first.pdf", "second.pdf"]):
+        ingest(document_id, seed)
+        precompute.enqueue_for(document_id)
+        job = run_queued("precompute")
+        assert job["status"] == job_queue.DONE
+        assert job["result"]["failed"] == []
+        assert sorted(job["result"]["cached"]) == sorted(precompute.PRECOMPUTE_ANALYSIS_TYPES)
+
+
+def test_summaries_for_ingests_back_to_back(monkeypatch):
+    monkeypatch.setattr(ingestion.summaries, "INGEST_BUILD_SUMMARIES", True)
+    for seed, document_id in enumerate(["summarized-1.pdf", "summarized-2.pdf"]):
+        assert ingest(document_id, seed)["summaries"] == "built"
+
+
+def test_jobs_of_a_lost_worker_are_requeued_then_failed():
+    job_id = job_queue.enqueue("orphan", {}, max_attempts=2)
+    job_queue.claim_next("lost-worker", kinds=["orphan"])
+    assert job_queue.requeue_stale() == 0  # Still heartbeating
+    assert job_queue.requeue_stale("lost-worker") == 1
+    assert job_queue.get_job(job_id)["status"] == job_queue.PENDING
+
+    job_queue.claim_next("lost-worker", kinds=["orphan"])
+    job_queue._get_conn().execute("UPDATE jobs SET updated_at = 0 WHERE id = ?", (job_id,))
+    assert job_queue.requeue_stale() == 1
+    job = job_queue.get_job(job_id)
+    assert job["status"] == job_queue.ERROR  # Out of attempts: don't crash workers forever
+
+
+def test_dead_worker_is_replaced_and_its_job_requeued():
+    processes = ingestion_worker.start_workers(1)
+    try:
+        dead = processes[0]
+        job_id = job_queue.enqueue("orphan", {})
+        job_queue.claim_next(f"{socket.gethostname()}-{os.getpid()}-w0", kinds=["orphan"])
+        dead.kill()
+        deadline = time.time() + 30
+        while processes[0] is dead and time.time() < deadline:
+            time.sleep(0.1)
+        assert processes[0] is not dead and processes[0].is_alive()
+        assert job_queue.get_job(job_id)["status"] == job_queue.PENDING
+    finally:
+        ingestion_worker.stop_workers()
+    assert not any(process.is_alive() for process in processes)
+
+
+def test_ingest_marks_the_store_written_once(monkeypatch):
+    monkeypatch.setattr(ingestion, "INGEST_EMBED_BATCH_SIZE", 2)
+    marks = []
+    monkeypatch.setattr(ingestion, "mark_written", lambda: marks.append(1))
+    assert ingest("batched.pdf", 5)["chunks_created"] > 2
+    assert marks == [1]
@@ -0,0 +1,289 @@
+"""
+Request tracing and per-stage latency metrics.
+span(name, **attributes) times a block of work. Spans nest through
+contextvars, so they follow awaits, asyncio tasks and run_blocking threads,
+and queued jobs continue the trace of the request that enqueued them
+(inject() / continue_trace()). Every finished span feeds a latency histogram
+per stage name, served with cache hit rates on /metrics (metrics.py).
+
+TRACING_EXPORTER:
+  none  metrics only (default)
+  json  one JSON line per finished span appended to TRACE_LOG_PATH
+  otel  OpenTelemetry spans through the globally configured tracer provider
+        (needs opentelemetry-api plus an SDK/exporter; falls back to none)
+Worker processes flush their histograms to METRICS_DIR after each job, so
+/metrics on the API also covers ingestion stages.
+"""
+
+import functools
+import json
+import os
+import secrets
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+from shared_utils import get_data_path
+
+TRACING_EXPORTER = os.getenv("TRACING_EXPORTER", "none").lower()  # none | json | otel
+TRACE_LOG_PATH = get_data_path("TRACE_LOG_PATH", "traces.jsonl")
+METRICS_DIR = get_data_path("METRICS_DIR", "metrics")
+# Histogram bucket upper bounds, milliseconds
+BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000)
+
+
+@dataclass
+class Span:
+    name: str
+    trace_id: str
+    span_id: str
+    parent_id: Optional[str] = None
+    start: float = 0.0
+    attributes: Dict[str, Any] = field(default_factory=dict)
+    duration_ms: float = 0.0
+    error: Optional[str] = None
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+
+_current: ContextVar[Optional[Span]] = ContextVar("pitchiq_span", default=None)
+_log_lock = threading.Lock()
+_tracer = None
+
+
+def _otel_tracer():
+    global _tracer
+    if _tracer is None:
+        try:
+            from opentelemetry import trace
+            _tracer = trace.get_tracer("pitchiq")
+        except ImportError:
+            print("[TRACING] opentelemetry is not installed; spans are not exported")
+            _tracer = False
+    return _tracer or None
+
+
+def current_trace_id() -> Optional[str]:
+    current = _current.get()
+    return current.trace_id if current else None
+
+
+@contextmanager
+def span(name: str, **attributes) -> Iterator[Span]:
+    """Time a stage of work as a child of the current span (or a new trace)."""
+    parent = _current.get()
+    current = Span(
+        name=name,
+        trace_id=parent.trace_id if parent else secrets.token_hex(16),
+        span_id=secrets.token_hex(8),
+        parent_id=parent.span_id if parent else None,
+        start=time.time(),
+        attributes=attributes,
+    )
+    otel_cm = otel_span = None
+    tracer = _otel_tracer() if TRACING_EXPORTER == "otel" else None
+    if tracer is not None:
+        otel_cm = tracer.start_as_current_span(name)
+        otel_span = otel_cm.__enter__()
+        context = otel_span.get_span_context()
+        current.trace_id, current.span_id = format(context.trace_id, "032x"), format(context.span_id, "016x")
+    token = _current.set(current)
+    started = time.perf_counter()
+    try:
+        yield current
+    except BaseException as e:
+        current.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        current.duration_ms = (time.perf_counter() - started) * 1000
+        try:
+            _current.reset(token)
+        except ValueError:
+            # Finished in another context (e.g. a generator resumed elsewhere)
+            _current.set(parent)
+        if otel_span is not None:
+            otel_span.update_name(current.name)
+            for key, value in current.attributes.items():
+                otel_span.set_attribute(key, _attribute(value))
+            if current.error:
+                from opentelemetry.trace import Status, StatusCode
+                otel_span.set_status(Status(StatusCode.ERROR, current.error))
+            otel_cm.__exit__(None, None, None)
+        _finish(current)
+
+
+def traced(name: str):
+    """Decorator form of span() for async functions."""
+    def decorator(fn):
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            with span(name):
+                return await fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def traced_iter(name: str, iterable: Iterable) -> Iterator:
+    """Yield from `iterable`, timing each step that produces an item (e.g. a lazy parser)."""
+    iterator = iter(iterable)
+    while True:
+        with span(name) as current:
+            try:
+                item = next(iterator)
+            except StopIteration:
+                current.set(exhausted=True)
+                return
+        yield item
+
+
+def inject() -> dict:
+    """Trace context of the current span, for a job payload or other process."""
+    current = _current.get()
+    if current is None:
+        return {}
+    carrier = {"trace_id": current.trace_id, "span_id": current.span_id}
+    if TRACING_EXPORTER == "otel" and _otel_tracer() is not None:
+        from opentelemetry.propagate import inject as otel_inject
+        otel_inject(carrier)
+    return carrier
+
+
+@contextmanager
+def continue_trace(carrier: Optional[dict]):
+    """Parent spans opened in this block on the remote span described by `carrier`."""
+    if not carrier or "trace_id" not in carrier:
+        yield
+        return
+    remote = Span(name="remote", trace_id=carrier["trace_id"], span_id=carrier["span_id"])
+    token = _current.set(remote)
+    otel_token = None
+    if TRACING_EXPORTER == "otel" and _otel_tracer() is not None:
+        from opentelemetry import context
+        from opentelemetry.propagate import extract
+        otel_token = context.attach(extract(carrier))
+    try:
+        yield
+    finally:
+        _current.reset(token)
+        if otel_token is not None:
+            from opentelemetry import context
+            context.detach(otel_token)
+
+
+def _attribute(value):
+    return value if isinstance(value, (str, bool, int, float)) else str(value)
+
+
+def _finish(current: Span):
+    observe(current.name, current.duration_ms, error=current.error is not None)
+    if TRACING_EXPORTER != "json":
+        return
+    record = {
+        "trace_id": current.trace_id,
+        "span_id": current.span_id,
+        "parent_id": current.parent_id,
+        "name": current.name,
+        "start": current.start,
+        "duration_ms": round(current.duration_ms, 3),
+        "attributes": {k: _attribute(v) for k, v in current.attributes.items()},
+        "error": current.error,
+        "pid": os.getpid(),
+    }
+    try:
+        with _log_lock, open(TRACE_LOG_PATH, "a") as f:
+            f.write(json.dumps(record) + "\n")
+    except OSError as e:
+        print(f"[TRACING] Could not write span: {e}")
+
+
+# --- Histograms ---
+
+_histograms: Dict[str, dict] = {}
+_metrics_lock = threading.Lock()
+
+
+def observe(stage: str, duration_ms: float, error: bool = False):
+    with _metrics_lock:
+        histogram = _histograms.get(stage)
+        if histogram is None:
+            histogram = _histograms[stage] = {"buckets": [0] * (len(BUCKETS_MS) + 1), "sum": 0.0, "count": 0, "errors": 0}
+        index = next((i for i, bound in enumerate(BUCKETS_MS) if duration_ms <= bound), len(BUCKETS_MS))
+        histogram["buckets"][index] += 1
+        histogram["sum"] += duration_ms
+        histogram["count"] += 1
+        histogram["errors"] += int(error)
+
+
+def snapshot() -> Dict[str, dict]:
+    """This process's histograms (per-bucket counts, not cumulative)."""
+    with _metrics_lock:
+        return {stage: {**h, "buckets": list(h["buckets"])} for stage, h in _histograms.items()}
+
+
+def flush_metrics():
+    """Publish this process's histograms for the API's /metrics (called by workers after each job)."""
+    try:
+        os.makedirs(METRICS_DIR, exist_ok=True)
+        path = os.path.join(METRICS_DIR, f"{os.getpid()}.json")
+        with open(path + ".tmp", "w") as f:
+            json.dump(snapshot(), f)
+        os.replace(path + ".tmp", path)
+    except OSError as e:
+        print(f"[TRACING] Could not flush metrics: {e}")
+
+
+def _alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+        return True
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+
+
+def collect() -> Dict[str, dict]:
+    """Histograms of this process merged with those flushed by live worker processes."""
+    merged = snapshot()
+    if not os.path.isdir(METRICS_DIR):
+        return merged
+    for filename in os.listdir(METRICS_DIR):
+        pid_text, ext = os.path.splitext(filename)
+        if ext != ".json" or not pid_text.isdigit() or int(pid_text) == os.getpid():
+            continue
+        path = os.path.join(METRICS_DIR, filename)
+        if not _alive(int(pid_text)):
+            try:
+                os.unlink(path)
+            except OSError:
+                pass
+            continue
+        try:
+            with open(path) as f:
+                flushed = json.load(f)
+        except (OSError, ValueError):
+            continue
+        for stage, histogram in flushed.items():
+            target = merged.setdefault(stage, {"buckets": [0] * (len(BUCKETS_MS) + 1), "sum": 0.0, "count": 0, "errors": 0})
+            target["buckets"] = [a + b for a, b in zip(target["buckets"], histogram["buckets"])]
+            for key in ("sum", "count", "errors"):
+                target[key] += histogram[key]
+    return merged
+
+
+def percentile(histogram: dict, pct: float) -> Optional[float]:
+    """Upper bucket bound holding the pct-th observation (None past the last bound or when empty)."""
+    if not histogram["count"]:
+        return None
+    rank = pct / 100 * histogram["count"]
+    seen = 0
+    bounds: List[Optional[float]] = list(BUCKETS_MS) + [None]
+    for bound, count in zip(bounds, histogram["buckets"]):
+        seen += count
+        if seen >= rank:
+            return bound
+    return None
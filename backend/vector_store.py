@@ -0,0 +1,282 @@
+"""
+Process-wide ChromaDB registry.
+Owns a single persistent client per process and hands out cached LangChain
+handles per collection, so routers never reopen the SQLite file or rebuild
+the HNSW segment on each request.
+
+VECTOR_STORAGE_MODE picks the layout of deck chunks:
+  global        one collection for every deck, searches filter on `source`
+  per_document  one shard collection per deck (its research report included),
+                so a deck-scoped search only touches that deck's vectors
+shard_for_source() is the routing layer; shard_migration.py moves existing
+data from the global collection into shards.
+"""
+
+import hashlib
+import os
+import re
+import threading
+from typing import Dict, List, Optional
+
+import chromadb
+from langchain_chroma import Chroma
+from langchain_core.documents import Document
+from shared_utils import EMBEDDING_MODEL, get_data_path, get_embeddings, embed_queries
+from embedding_backends import GEMINI_EMBEDDING_MODEL, LOCAL_EMBEDDING_MODEL
+import tracing
+
+# Persistent storage path
+VECTOR_DB_DIR = get_data_path("CHROMA_DB_PATH", "chroma_db")
+os.makedirs(VECTOR_DB_DIR, exist_ok=True)
+
+# Collection names
+DEFAULT_COLLECTION = "langchain"  # langchain_chroma's default, kept for existing data
+INDUSTRY_COLLECTION = "industry_knowledge"
+SHARD_PREFIX = "doc-"
+# Model that built each collection before names carried one (Gemini for the rest)
+_UNSUFFIXED_MODELS = {INDUSTRY_COLLECTION: LOCAL_EMBEDDING_MODEL}
+
+VECTOR_STORAGE_MODE = os.getenv("VECTOR_STORAGE_MODE", "global").lower()  # global | per_document
+
+# Ingestion workers write from other processes, and Chroma's local readers do
+# not see those writes. Writers touch this marker; readers reopen the client
+# when it has moved since they last looked.
+WRITE_MARKER_PATH = os.path.join(VECTOR_DB_DIR, ".last_write")
+
+_client = None
+_handles: Dict[str, Chroma] = {}
+_lock = threading.Lock()
+_seen_marker = None
+
+
+def _marker_mtime() -> int:
+    try:
+        return os.stat(WRITE_MARKER_PATH).st_mtime_ns
+    except OSError:
+        return 0
+
+
+def mark_written():
+    """Record a write to the store so other processes reopen their client before their next read."""
+    global _seen_marker
+    before = _marker_mtime()
+    with open(WRITE_MARKER_PATH, "a"):
+        os.utime(WRITE_MARKER_PATH, None)
+    # Only skip our own reopen if nobody else wrote since we last looked
+    if before == _seen_marker:
+        _seen_marker = _marker_mtime()
+
+
+def _refresh_if_stale():
+    global _client, _seen_marker
+    marker = _marker_mtime()
+    if marker == _seen_marker:
+        return
+    with _lock:
+        if marker == _seen_marker:
+            return
+        client = _client
+        _handles.clear()
+        _client = None
+        _seen_marker = marker
+    if client is not None:
+        client.clear_system_cache()
+
+
+def get_client():
+    """Return the process-wide persistent Chroma client."""
+    global _client
+    if _client is None:
+        with _lock:
+            if _client is None:
+                _client = chromadb.PersistentClient(path=VECTOR_DB_DIR)
+    return _client
+
+
+def physical_collection_name(collection_name: Optional[str] = None, model: Optional[str] = None) -> str:
+    """
+    Chroma collection holding `collection_name` for an embedding model.
+    The model that originally built a collection keeps its historical name
+    (MiniLM for industry_knowledge, Gemini otherwise); other models get a
+    suffixed collection so vectors of different spaces/dimensions never share one.
+    """
+    name = collection_name or DEFAULT_COLLECTION
+    model = model or EMBEDDING_MODEL
+    if model == _UNSUFFIXED_MODELS.get(name, GEMINI_EMBEDDING_MODEL):
+        return name
+    return f"{name}__{re.sub(r'[^a-z0-9]+', '-', model.lower()).strip('-')}"
+
+
+def _check_embedding_model(collection):
+    """Refuse collections built by another embedding model; tag untagged (pre-existing) ones on first use."""
+    tag = (collection.metadata or {}).get("embedding_model")
+    if tag == EMBEDDING_MODEL:
+        return
+    if tag is None:
+        sample = collection.get(limit=1, include=["embeddings"])
+        if len(sample["ids"]):
+            stored_dim = len(sample["embeddings"][0])
+            model_dim = len(get_embeddings().embed_query("dimension probe"))
+            if stored_dim != model_dim:
+                raise ValueError(
+                    f"Collection '{collection.name}' holds {stored_dim}-d vectors but {EMBEDDING_MODEL} "
+                    f"produces {model_dim}-d; re-ingest it or switch EMBEDDING_BACKEND"
+                )
+        collection.modify(metadata={**(collection.metadata or {}), "embedding_model": EMBEDDING_MODEL})
+        return
+    raise ValueError(
+        f"Collection '{collection.name}' was built with {tag}, but EMBEDDING_BACKEND uses {EMBEDDING_MODEL}"
+    )
+
+
+def get_vectordb(collection_name: Optional[str] = None) -> Chroma:
+    """Return the cached LangChain handle for a collection (default collection if omitted)."""
+    name = collection_name or DEFAULT_COLLECTION
+    _refresh_if_stale()
+    handle = _handles.get(name)
+    if handle is None:
+        client = get_client()
+        with _lock:
+            handle = _handles.get(name)
+            if handle is None:
+                with tracing.span("vector_store.open", collection=name):
+                    handle = Chroma(
+                        client=client,
+                        collection_name=physical_collection_name(name),
+                        embedding_function=get_embeddings(),
+                        collection_metadata={"embedding_model": EMBEDDING_MODEL},
+                    )
+                    _check_embedding_model(handle._collection)
+                _handles[name] = handle
+    return handle
+
+
+def shard_for_source(source: str) -> str:
+    """Logical collection holding a document's chunks (research reports live with their deck)."""
+    if VECTOR_STORAGE_MODE != "per_document":
+        return DEFAULT_COLLECTION
+    from document_catalog import RESEARCH_SOURCE_SUFFIX
+    if source.endswith(RESEARCH_SOURCE_SUFFIX):
+        source = source[:-len(RESEARCH_SOURCE_SUFFIX)]
+    return SHARD_PREFIX + hashlib.sha256(source.encode("utf-8")).hexdigest()[:24]
+
+
+def get_vectordb_for_source(source: str) -> Chroma:
+    """Handle for the collection a document is written to (creates its shard if needed)."""
+    return get_vectordb(shard_for_source(source))
+
+
+def shard_collections() -> List[str]:
+    """Logical names of the per-document shards stored for the current embedding model."""
+    shards = []
+    for collection in get_client().list_collections():
+        name = collection.name.split("__", 1)[0]
+        if name.startswith(SHARD_PREFIX) and physical_collection_name(name) == collection.name:
+            shards.append(name)
+    return sorted(shards)
+
+
+def route(where: Optional[dict], collection_name: Optional[str]) -> Optional[str]:
+    """Collection to search: an explicit name wins, else the shard implied by a `source` filter."""
+    if collection_name is not None or VECTOR_STORAGE_MODE != "per_document":
+        return collection_name
+    source = (where or {}).get("source")
+    return shard_for_source(source) if isinstance(source, str) else DEFAULT_COLLECTION
+
+
+def collection_exists(collection_name: Optional[str]) -> bool:
+    """True if the collection is already open or stored; reads never create empty shards."""
+    name = collection_name or DEFAULT_COLLECTION
+    _refresh_if_stale()
+    if name in _handles:
+        return True
+    try:
+        get_client().get_collection(physical_collection_name(name))
+        return True
+    except Exception:
+        return False
+
+
+def get_industry_db() -> Chroma:
+    return get_vectordb(INDUSTRY_COLLECTION)
+
+
+def search_many(queries: List[str], k: int, where: Optional[dict] = None,
+                collection_name: Optional[str] = None) -> List[List[Document]]:
+    """
+    Run several similarity searches with one batched embedding call and one
+    multi-query Chroma request. Returns one result list per query; each
+    Document carries its Chroma chunk ID in `id`.
+    """
+    if not queries:
+        return []
+    return search_by_vectors(embed_queries(queries), k, where=where, collection_name=collection_name)
+
+
+def search_by_vectors(vectors: List[List[float]], k: int, where: Optional[dict] = None,
+                      collection_name: Optional[str] = None) -> List[List[Document]]:
+    """search_many for callers that already hold the query embeddings."""
+    if not vectors:
+        return []
+    collection_name = route(where, collection_name)
+    if collection_name and collection_name.startswith(SHARD_PREFIX) and not collection_exists(collection_name):
+        return [[] for _ in vectors]  # Nothing ingested for this document
+    collection = get_vectordb(collection_name)._collection
+    result = collection.query(
+        query_embeddings=vectors,
+        n_results=k,
+        where=where or None,
+        include=["documents", "metadatas"],
+    )
+    per_query = []
+    for ids, texts, metadatas in zip(result["ids"], result["documents"], result["metadatas"]):
+        per_query.append(_to_documents(ids, texts, metadatas))
+    return per_query
+
+
+def get_documents(ids: List[str], collection_name: Optional[str] = None,
+                  where: Optional[dict] = None) -> Dict[str, Document]:
+    """Fetch stored chunks by ID, keyed by ID (missing IDs are simply absent)."""
+    if not ids:
+        return {}
+    collection_name = route(where, collection_name)
+    if collection_name and collection_name.startswith(SHARD_PREFIX) and not collection_exists(collection_name):
+        return {}
+    result = get_vectordb(collection_name)._collection.get(ids=list(ids), include=["documents", "metadatas"])
+    return {doc.id: doc for doc in _to_documents(result["ids"], result["documents"], result["metadatas"])}
+
+
+def _to_documents(ids, texts, metadatas) -> List[Document]:
+    return [
+        Document(id=chunk_id, page_content=text or "", metadata=meta or {})
+        for chunk_id, text, meta in zip(ids, texts, metadatas)
+    ]
+
+
+def warmup():
+    """Open the client and the known collections ahead of the first request."""
+    # Industry benchmarks are served from an in-process index (industry_benchmarks.py)
+    for name in (DEFAULT_COLLECTION,):
+        try:
+            get_vectordb(name)._collection.count()
+        except Exception as e:
+            print(f"[VECTOR_STORE] Warmup failed for '{name}': {e}")
+    print(f"[VECTOR_STORE] Ready at {VECTOR_DB_DIR} ({len(_handles)} collections)")
+
+
+def close():
+    """Drop cached handles and release the client's system resources."""
+    global _client
+    with _lock:
+        client = _client
+        _handles.clear()
+        _client = None
+    if client is None:
+        return
+    try:
+        if hasattr(client, "close"):
+            client.close()
+        else:
+            client.clear_system_cache()
+    except Exception as e:
+        print(f"[VECTOR_STORE] Close failed: {e}")